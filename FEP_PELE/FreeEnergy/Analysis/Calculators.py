@@ -3,6 +3,7 @@
 
 # Python imports
 import math
+import numpy as np
 
 
 # FEP_PELE imports
@@ -17,48 +18,129 @@ __maintainer__ = "Marti Municoy"
 __email__ = "marti.municoy@bsc.es"
 
 
-def calculateThermodynamicAverage(energies, temperature=300):
-    result = 0.
+def _logSumExp(values, axis=None):
+    max_values = np.max(values, axis=axis, keepdims=True)
+    max_values[~np.isfinite(max_values)] = 0.
+
+    return np.squeeze(max_values, axis=axis) + \
+        np.log(np.sum(np.exp(values - max_values), axis=axis))
+
+
+def calculateLogThermodynamicAverage(energies, temperature=300,
+                                     weights=None):
+    # log <exp(-E/kBT)>, evaluated with the log-sum-exp trick so large
+    # energies neither overflow nor underflow. Weights are the
+    # multiplicities of the energies
     beta = float(1 / co.BOLTZMANN_CONSTANT_IN_KCAL_MOL / temperature)
 
-    #print(energies)
+    exponents = - beta * np.asarray(energies, dtype=float)
+
+    if (weights is None):
+        weights = np.ones(len(exponents))
+    weights = np.asarray(weights, dtype=float)
 
-    for energy in energies:
-        #print(math.exp(energy), ' ', end='')
-        result += math.exp(- energy * beta)
-    #print()
+    kept = weights > 0
 
-    result /= len(energies)
+    return float(_logSumExp(exponents[kept] + np.log(weights[kept])) -
+                 np.log(np.sum(weights[kept])))
 
-    return result
+
+def calculateThermodynamicAverage(energies, temperature=300, weights=None):
+    # Averages beyond the float range become inf instead of raising, free
+    # energies should be obtained with exponentialAveraging instead
+    with np.errstate(over='ignore'):
+        return float(np.exp(calculateLogThermodynamicAverage(
+            energies, temperature, weights)))
 
 
 def zwanzigEquation(thermodynamicAverage, temperature=300):
     kBT = co.BOLTZMANN_CONSTANT_IN_KCAL_MOL * temperature
-    return - kBT * math.log(thermodynamicAverage)
 
+    with np.errstate(divide='ignore'):
+        return float(- kBT * np.log(thermodynamicAverage))
+
+
+def exponentialAveraging(energies, temperature=300, weights=None):
+    kBT = co.BOLTZMANN_CONSTANT_IN_KCAL_MOL * temperature
+    return - kBT * calculateLogThermodynamicAverage(energies, temperature,
+                                                    weights)
+
+
+def groupedExponentialAveraging(energies, groups, number_of_groups,
+                                temperature=300, weights=None):
+    # Zwanzig equation for every group of energies at once, groups is the
+    # group index of each energy
+    kBT = co.BOLTZMANN_CONSTANT_IN_KCAL_MOL * temperature
+
+    exponents = - np.asarray(energies, dtype=float) / kBT
+    groups = np.asarray(groups, dtype=int)
+
+    if (weights is None):
+        weights = np.ones(len(exponents))
+    weights = np.asarray(weights, dtype=float)
 
-def calculateMean(values):
-    result = 0.
+    max_exponents = np.full(number_of_groups, -np.inf)
+    np.maximum.at(max_exponents, groups[weights > 0],
+                  exponents[weights > 0])
 
-    for value in values:
-        result += float(value)
+    sums = np.bincount(groups, weights=weights *
+                       np.exp(exponents - max_exponents[groups]),
+                       minlength=number_of_groups)
+    counts = np.bincount(groups, weights=weights,
+                         minlength=number_of_groups)
 
-    return result / len(values)
+    return - kBT * (max_exponents + np.log(sums / counts))
+
+
+def calculateMean(values, weights=None):
+    return float(np.average(np.asarray(list(values), dtype=float),
+                            weights=weights))
 
 
 def calculateStandardDeviation(values):
+    values = np.asarray(list(values), dtype=float)
+
     if (len(values) == 1):
         return 0
 
-    mean = calculateMean(values)
+    return float(np.std(values, ddof=1))
+
+
+def calculateWeightedStandardDeviation(values, weights=None):
+    values = np.asarray(values, dtype=float)
+
+    if (len(values) < 2):
+        return 0.
+
+    mean = np.average(values, weights=weights)
+
+    return float(np.sqrt(np.average((values - mean) ** 2, weights=weights)))
+
+
+def calculateOverlap(energies, temperature=300, weights=None):
+    # Effective fraction of the samples that contribute to the exponential
+    # average, (sum w)^2 / (N sum w^2) with w = exp(-E/kBT). It is 1 when
+    # the two states overlap completely and 1/N when a single sample
+    # dominates the average
+    beta = float(1 / co.BOLTZMANN_CONSTANT_IN_KCAL_MOL / temperature)
+
+    exponents = - beta * np.asarray(energies, dtype=float)
+
+    if (weights is None):
+        weights = np.ones(len(exponents))
+    weights = np.asarray(weights, dtype=float)
 
-    summatory = 0.
+    kept = weights > 0
+    if (not np.any(kept)):
+        return 0.
 
-    for value in values:
-        summatory += math.pow(value - mean, 2)
+    exponents = exponents[kept]
+    weights = weights[kept]
 
-    return math.sqrt(summatory / (len(values) - 1))
+    factors = np.exp(exponents - np.max(exponents))
+
+    return float(np.sum(weights * factors) ** 2 /
+                 np.sum(weights * factors ** 2) / np.sum(weights))
 
 
 def calculateStandardDeviationOfMean(values):
@@ -68,8 +150,269 @@ def calculateStandardDeviationOfMean(values):
 
 
 def squaredSum(values):
-    summatory = 0.
-    for value in values:
-        summatory += math.pow(value, 2)
+    values = np.asarray(list(values), dtype=float)
+
+    return float(np.sqrt(np.sum(values ** 2)))
+
+
+def _logFermi(values):
+    # log(1 / (1 + exp(x)))
+    return - np.logaddexp(0., values)
+
+
+def bennettAcceptanceRatio(forward_energies, reverse_energies,
+                           temperature=300, forward_weights=None,
+                           reverse_weights=None):
+    # Free energy change from state 0 to state 1, where forward energies
+    # are the dEs (1 - 0) of the models sampled at state 0 and reverse
+    # energies the dEs (0 - 1) of the ones sampled at state 1. It returns
+    # the free energy change and its asymptotic standard deviation
+    kBT = co.BOLTZMANN_CONSTANT_IN_KCAL_MOL * temperature
+
+    forward_works = np.asarray(forward_energies, dtype=float) / kBT
+    reverse_works = np.asarray(reverse_energies, dtype=float) / kBT
+
+    if (forward_weights is None):
+        forward_weights = np.ones(len(forward_works))
+    if (reverse_weights is None):
+        reverse_weights = np.ones(len(reverse_works))
+    forward_weights = np.asarray(forward_weights, dtype=float)
+    reverse_weights = np.asarray(reverse_weights, dtype=float)
+
+    n_forward = np.sum(forward_weights)
+    n_reverse = np.sum(reverse_weights)
+    log_ratio = math.log(n_forward / n_reverse)
+
+    def imbalance(delta):
+        return np.sum(forward_weights *
+                      np.exp(_logFermi(log_ratio + forward_works - delta))) - \
+            np.sum(reverse_weights *
+                   np.exp(_logFermi(- log_ratio + reverse_works + delta)))
+
+    # The imbalance grows monotonically with the free energy change, so
+    # it is bracketed and bisected
+    margin = co.ESTIMATORS_BRACKET_MARGIN + abs(log_ratio)
+    lower = min(np.min(forward_works), np.min(- reverse_works)) - margin
+    upper = max(np.max(forward_works), np.max(- reverse_works)) + margin
+
+    for iteration in range(0, co.ESTIMATORS_MAX_ITERATIONS):
+        if (upper - lower < co.ESTIMATORS_TOLERANCE):
+            break
+
+        delta = (lower + upper) / 2.
+
+        if (imbalance(delta) > 0):
+            upper = delta
+        else:
+            lower = delta
+
+    delta = (lower + upper) / 2.
+
+    forward_fermi = np.exp(_logFermi(log_ratio + forward_works - delta))
+    reverse_fermi = np.exp(_logFermi(- log_ratio + reverse_works + delta))
+
+    variance = (np.average(forward_fermi ** 2, weights=forward_weights) /
+                np.average(forward_fermi, weights=forward_weights) ** 2 -
+                1.) / n_forward + \
+        (np.average(reverse_fermi ** 2, weights=reverse_weights) /
+         np.average(reverse_fermi, weights=reverse_weights) ** 2 -
+         1.) / n_reverse
+
+    return float(kBT * delta), kBT * math.sqrt(max(variance, 0.))
+
+
+def multistateBennettAcceptanceRatio(energies, states, temperature=300,
+                                     weights=None):
+    # Free energy change from the first to the last state, where energies
+    # is a (samples x states) array with the energy of every sample at
+    # every state and states is the state each sample was drawn from. It
+    # returns the free energy change and its asymptotic standard deviation
+    kBT = co.BOLTZMANN_CONSTANT_IN_KCAL_MOL * temperature
+
+    reduced_energies = np.asarray(energies, dtype=float) / kBT
+    states = np.asarray(states, dtype=int)
+    number_of_states = reduced_energies.shape[1]
+
+    if (weights is None):
+        weights = np.ones(len(reduced_energies))
+    weights = np.asarray(weights, dtype=float)
+
+    counts = np.bincount(states, weights=weights, minlength=number_of_states)
+
+    with np.errstate(divide='ignore'):
+        log_counts = np.log(counts)
+        log_weights = np.log(weights)
+
+    # Self-consistent iteration of the reduced free energies
+    free_energies = np.zeros(number_of_states)
+
+    for iteration in range(0, co.ESTIMATORS_MAX_ITERATIONS):
+        log_denominators = _logSumExp(log_counts + free_energies -
+                                      reduced_energies, axis=1)
+
+        new_free_energies = - _logSumExp(
+            log_weights[:, np.newaxis] - reduced_energies -
+            log_denominators[:, np.newaxis], axis=0)
+        new_free_energies -= new_free_energies[0]
+
+        converged = np.max(np.abs(new_free_energies - free_energies)) < \
+            co.ESTIMATORS_TOLERANCE
+
+        free_energies = new_free_energies
+
+        if (converged):
+            break
+
+    log_denominators = _logSumExp(log_counts + free_energies -
+                                  reduced_energies, axis=1)
+
+    # Asymptotic covariance of the reduced free energies. The inverted
+    # matrix is singular, so its null singular value must be discarded
+    # even when rounding errors make it slightly larger than zero
+    state_weights = np.exp(free_energies - reduced_energies -
+                           log_denominators[:, np.newaxis])
+    overlap = np.dot((state_weights * weights[:, np.newaxis]).T,
+                     state_weights)
+    covariance = np.dot(overlap, np.linalg.pinv(
+        np.identity(number_of_states) - np.dot(np.diag(counts), overlap),
+        rcond=co.ESTIMATORS_SINGULAR_TOLERANCE))
+
+    variance = covariance[0, 0] + covariance[-1, -1] - 2 * covariance[0, -1]
+
+    return float(kBT * free_energies[-1]), \
+        kBT * math.sqrt(max(variance, 0.))
+
+
+def bootstrapExponentialAveraging(energies, units, number_of_units,
+                                  number_of_samples, temperature=300,
+                                  weights=None, seed=None):
+    # Zwanzig equation for bootstrap resamples of the units, which are
+    # trajectories or blocks of them given by the unit index of each
+    # energy. Units are reduced to two sums once, so every resample only
+    # costs a product of its unit counts
+    kBT = co.BOLTZMANN_CONSTANT_IN_KCAL_MOL * temperature
+
+    exponents = - np.asarray(energies, dtype=float) / kBT
+    units = np.asarray(units, dtype=int)
+
+    if (weights is None):
+        weights = np.ones(len(exponents))
+    weights = np.asarray(weights, dtype=float)
+
+    max_exponent = np.max(exponents[weights > 0])
+
+    sums = np.bincount(units, weights=weights *
+                       np.exp(exponents - max_exponent),
+                       minlength=number_of_units)
+    counts = np.bincount(units, weights=weights, minlength=number_of_units)
+
+    random_state = np.random.default_rng(seed)
+
+    # Resamples are drawn in chunks to bound the memory of the index arrays
+    chunk_size = max(1, int(co.BOOTSTRAP_CHUNK_ELEMENTS / number_of_units))
+    log_averages = []
+
+    for first_sample in range(0, number_of_samples, chunk_size):
+        chunk = min(chunk_size, number_of_samples - first_sample)
+
+        indices = random_state.integers(0, number_of_units,
+                                        (chunk, number_of_units))
+        indices += np.arange(chunk)[:, np.newaxis] * number_of_units
+        unit_counts = np.bincount(
+            indices.ravel(), minlength=chunk * number_of_units).reshape(
+            chunk, number_of_units)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            log_averages.append(np.log(np.dot(unit_counts, sums) /
+                                       np.dot(unit_counts, counts)))
+
+    return - kBT * (max_exponent + np.concatenate(log_averages))
+
+
+def calculateConfidenceInterval(samples,
+                                level=co.BOOTSTRAP_CONFIDENCE_LEVEL):
+    # Percentile interval of bootstrap samples, level is a percentage
+    samples = np.asarray(samples, dtype=float)
+    samples = samples[np.isfinite(samples)]
+
+    lower, upper = np.percentile(samples, [(100. - level) / 2.,
+                                           (100. + level) / 2.])
+
+    return float(lower), float(upper)
+
+
+def calculateStatisticalInefficiency(values):
+    # g = 1 + 2 sum (1 - t / N) C(t), where the normalized autocorrelation
+    # function C(t) is obtained with an FFT and summed until it first
+    # drops to zero
+    values = np.asarray(values, dtype=float)
+    n_values = len(values)
+
+    if (n_values < 2):
+        return 1.
+
+    fluctuations = values - np.mean(values)
+    variance = np.mean(fluctuations ** 2)
+
+    if (variance == 0):
+        return 1.
+
+    transform = np.fft.rfft(fluctuations, 2 * n_values)
+    autocorrelation = np.fft.irfft(transform * np.conjugate(transform))[
+        1:n_values] / (n_values - np.arange(1, n_values)) / variance
+
+    negatives = np.flatnonzero(autocorrelation <= 0)
+    if (len(negatives) > 0):
+        autocorrelation = autocorrelation[:negatives[0]]
+
+    times = np.arange(1, len(autocorrelation) + 1)
+
+    return max(1., 1. + 2. * float(np.sum((1. - times / n_values) *
+                                          autocorrelation)))
+
+
+def detectEquilibration(values):
+    # The equilibration cut-off is the origin that maximizes the number of
+    # uncorrelated values left, N_eff = (N - t0) / g. It returns the
+    # cut-off and the statistical inefficiency from it onwards
+    values = np.asarray(values, dtype=float)
+    n_values = len(values)
+
+    if (n_values < 2):
+        return 0, 1.
+
+    origins = np.unique(np.linspace(0, n_values - 2,
+                                    co.EQUILIBRATION_ORIGINS).astype(int))
+    inefficiencies = np.array([calculateStatisticalInefficiency(
+        values[origin:]) for origin in origins])
+
+    best = int(np.argmax((n_values - origins) / inefficiencies))
+
+    return int(origins[best]), float(inefficiencies[best])
+
+
+def getDecorrelatedIndices(values, multiplicities):
+    # Values are accepted models that last for their multiplicity in the
+    # actual time series. Equilibration and statistical inefficiency are
+    # obtained from the accepted models, so the time series is never
+    # expanded. Models are then picked once every inefficiency, in PELE
+    # steps, by striding over their accumulated multiplicities
+    multiplicities = np.asarray(multiplicities, dtype=int)
+    model_ids = np.flatnonzero(multiplicities > 0)
+
+    if (len(model_ids) == 0):
+        return np.zeros(0, dtype=int)
+
+    values = np.asarray(values, dtype=float)[model_ids]
+    multiplicities = multiplicities[model_ids]
+
+    origin, inefficiency = detectEquilibration(values)
+
+    ends = np.cumsum(multiplicities)
+    first_step = ends[origin] - multiplicities[origin]
+    step_inefficiency = inefficiency * (ends[-1] - first_step) / \
+        (len(values) - origin)
+
+    steps = np.arange(first_step, ends[-1], step_inefficiency)
 
-    return math.sqrt(summatory)
+    return np.unique(model_ids[np.searchsorted(ends, steps, side='right')])
@@ -1,16 +1,35 @@
 # -*- coding: utf-8 -*-
 
 
+# Python imports
+import numpy as np
+from multiprocessing import Pool
+
+
 # FEP_PELE imports
-from .Calculators import calculateThermodynamicAverage
-from .Calculators import zwanzigEquation
+from .Calculators import groupedExponentialAveraging
 from .Calculators import calculateStandardDeviationOfMean
+from .Calculators import calculateStandardDeviation
+from .Calculators import bootstrapExponentialAveraging
+from .Calculators import calculateConfidenceInterval
 from .Calculators import calculateMean
 from .Calculators import squaredSum
+from .Calculators import bennettAcceptanceRatio
+from .Calculators import multistateBennettAcceptanceRatio
 from .Plotters import dEDistributionPlot, dEVariationPlot
 
 from FEP_PELE.FreeEnergy.Constants import SAMPLING_METHODS_DICT as METHODS_DICT
 from FEP_PELE.FreeEnergy.Constants import DIRECTION_LABELS
+from FEP_PELE.FreeEnergy.Constants import ESTIMATORS_DICT
+from FEP_PELE.FreeEnergy.Constants import DEF_ESTIMATOR
+from FEP_PELE.FreeEnergy.Constants import BOOTSTRAP_CONFIDENCE_LEVEL
+from FEP_PELE.FreeEnergy.Constants import BOOTSTRAP_SEED
+from FEP_PELE.FreeEnergy.EnergyMatrix import getLambdaKey
+
+from FEP_PELE.Tools.LambdaFolder import getReportMetrics
+from FEP_PELE.Tools.LambdaFolder import getMultiplicities
+
+from FEP_PELE.Utils.InOut import isThereAFile
 
 
 # Script information
@@ -21,14 +40,64 @@ __maintainer__ = "Marti Municoy"
 __email__ = "marti.municoy@bsc.es"
 
 
+# Function definitions
+def bootstrapLambdaFolder(arguments):
+    # Bootstrap samples of the free energy change of a lambda folder. It
+    # lives at module level so it can be sent to a pool of processes
+    energies_by_file, number_of_samples, block_size, temperature, seed = \
+        arguments
+
+    energies = []
+    units = []
+    weights = []
+    number_of_units = 0
+
+    for values, multiplicities in energies_by_file.values():
+        if (len(values) == 0):
+            continue
+
+        # Whole trajectories are resampled, unless blocks of consecutive
+        # models are requested
+        if (block_size is None):
+            units.append(np.full(len(values), number_of_units))
+            number_of_units += 1
+        else:
+            units.append(np.arange(len(values)) // block_size +
+                         number_of_units)
+            number_of_units += int(np.ceil(len(values) / block_size))
+
+        energies.append(values)
+        weights.append(multiplicities)
+
+    if (number_of_units == 0):
+        return np.full(number_of_samples, np.nan)
+
+    return bootstrapExponentialAveraging(
+        np.concatenate(energies), np.concatenate(units), number_of_units,
+        number_of_samples, temperature, weights=np.concatenate(weights),
+        seed=seed)
+
+
+# Class definitions
 class FEPAnalysis(object):
     def __init__(self, lambda_folders, sampling_method, divisions=10,
-                 temperature=298.15):
+                 temperature=298.15, estimator=DEF_ESTIMATOR,
+                 bootstrap_samples=0, block_size=None, processes=1,
+                 sampled_steps=None):
         self.lambda_folders = lambda_folders
         self.sampling_method = sampling_method
         self.divisions = divisions
         self.temperature = temperature
+        self.estimator = estimator
+        self.bootstrap_samples = bootstrap_samples
+        self.block_size = block_size
+        self.processes = processes
+        self.sampled_steps = sampled_steps
+        self.energies = dict((lambda_folder,
+                              lambda_folder.getDeltaEnergyValuesByFile())
+                             for lambda_folder in self.lambda_folders)
         self.averages = self._calculateAverages()
+        self.bootstrap = self._calculateBootstrap()
 
     def _calculateAverages(self):
         # TODO!!!
@@ -38,26 +107,48 @@ class FEPAnalysis(object):
         averages = {}
 
         for lambda_folder in self.lambda_folders:
-            energies = lambda_folder.getDeltaEnergyValuesByFile()
+            energies = self.energies[lambda_folder]
+
+            divisions = min(self.divisions, len(energies))
 
-            sub_energies = [[] for i in range(0, min(self.divisions,
-                                                     len(energies)))]
+            if (divisions == 0):
+                averages[lambda_folder] = []
+                continue
 
-            for file_index, file_energies in enumerate(energies.values()):
-                sub_index = file_index % self.divisions
-                sub_energies[sub_index] += file_energies
+            values, multiplicities = zip(*energies.values())
 
-            averages[lambda_folder] = []
+            # Files are distributed among divisions, which are then all
+            # averaged by a single grouped reduction
+            groups = [np.full(len(file_values), file_index % divisions)
+                      for file_index, file_values in enumerate(values)]
 
-            for sub_energy in sub_energies:
-                average = zwanzigEquation(
-                    calculateThermodynamicAverage(sub_energy,
-                                                  self.temperature),
-                    self.temperature)
-                averages[lambda_folder].append(average)
+            averages[lambda_folder] = list(groupedExponentialAveraging(
+                np.concatenate(values), np.concatenate(groups), divisions,
+                self.temperature, weights=np.concatenate(multiplicities)))
 
         return averages
 
+    def _calculateBootstrap(self):
+        # Windows are resampled independently, either here or spread over
+        # a pool of processes
+        if (self.bootstrap_samples < 1):
+            return None
+
+        arguments = [(self.energies[lambda_folder], self.bootstrap_samples,
+                      self.block_size, self.temperature,
+                      (BOOTSTRAP_SEED, index))
+                     for index, lambda_folder in
+                     enumerate(self.lambda_folders)]
+
+        if ((self.processes > 1) and (len(arguments) > 1)):
+            with Pool(min(self.processes, len(arguments))) as pool:
+                samples = pool.map(bootstrapLambdaFolder, arguments)
+        else:
+            samples = [bootstrapLambdaFolder(argument)
+                       for argument in arguments]
+
+        return dict(zip(self.lambda_folders, samples))
+
     def getDeltaEnergies(self):
         energies = {}
 
@@ -71,11 +162,35 @@ class FEPAnalysis(object):
         stdevs = {}
 
         for lambda_folder in self.lambda_folders:
-            stdevs[lambda_folder] = calculateStandardDeviationOfMean(
-                self.averages[lambda_folder])
+            if (self.bootstrap is not None):
+                samples = self.bootstrap[lambda_folder]
+                stdevs[lambda_folder] = calculateStandardDeviation(
+                    samples[np.isfinite(samples)])
+            else:
+                stdevs[lambda_folder] = calculateStandardDeviationOfMean(
+                    self.averages[lambda_folder])
 
         return stdevs
 
+    def getConfidenceIntervals(self, level=BOOTSTRAP_CONFIDENCE_LEVEL):
+        intervals = {}
+
+        for lambda_folder in self.lambda_folders:
+            intervals[lambda_folder] = calculateConfidenceInterval(
+                self.bootstrap[lambda_folder], level)
+
+        return intervals
+
+    def _getSummedConfidenceInterval(self, lambda_folders, factors,
+                                     level=BOOTSTRAP_CONFIDENCE_LEVEL):
+        # Resamples of all windows are added up, so the interval of the
+        # total change does not assume them to be normal
+        samples = sum(self.bootstrap[lambda_folder] * factor
+                      for lambda_folder, factor in zip(lambda_folders,
+                                                       factors))
+
+        return calculateConfidenceInterval(samples, level)
+
     def _DWSResults(self):
         energies = self.getDeltaEnergies()
         stdevs = self.getStandardDeviations()
@@ -106,14 +221,169 @@ class FEPAnalysis(object):
         return sum(direct_e), squaredSum(direct_sd), \
             sum(reverse_e), squaredSum(reverse_sd),
 
+    def _getReverseFolder(self, lambda_folder):
+        for other_folder in self.lambda_folders:
+            if ((other_folder.type == lambda_folder.type) and
+                    (other_folder.window == lambda_folder.window) and
+                    (other_folder.initial_lambda ==
+                     lambda_folder.final_lambda) and
+                    (other_folder.final_lambda ==
+                     lambda_folder.initial_lambda)):
+                return other_folder
+
+        return None
+
+    def _BARResults(self, lambda_folders=None):
+        # Windows sampled from both ends, like the ones of double-ended
+        # sampling, are solved with BAR. The rest of them fall back to
+        # exponential averaging
+        if (lambda_folders is None):
+            lambda_folders = self.lambda_folders
+
+        energies = []
+        stdevs = []
+        paired_folders = set()
+
+        for lambda_folder in lambda_folders:
+            if (lambda_folder.direction != DIRECTION_LABELS["FORWARD"]):
+                continue
+
+            reverse_folder = self._getReverseFolder(lambda_folder)
+
+            if (reverse_folder is None):
+                continue
+
+            forward_energies, forward_weights = \
+                lambda_folder.getDeltaEnergyValues()
+            reverse_energies, reverse_weights = \
+                reverse_folder.getDeltaEnergyValues()
+
+            energy, stdev = bennettAcceptanceRatio(
+                forward_energies, reverse_energies, self.temperature,
+                forward_weights, reverse_weights)
+
+            energies.append(energy)
+            stdevs.append(stdev)
+            paired_folders.update((id(lambda_folder), id(reverse_folder)))
+
+        unpaired_folders = [lambda_folder for lambda_folder in lambda_folders
+                            if id(lambda_folder) not in paired_folders]
+
+        if (len(unpaired_folders) > 0):
+            print("  - FEPAnalysis Warning: " +
+                  "{} lambda folders ".format(len(unpaired_folders)) +
+                  "have no reverse counterpart, exponential averaging is " +
+                  "used for them")
+
+        zwanzig_energies = self.getDeltaEnergies()
+        zwanzig_stdevs = self.getStandardDeviations()
+
+        for lambda_folder in unpaired_folders:
+            energies.append(zwanzig_energies[lambda_folder] *
+                            lambda_folder.direction_factor)
+            stdevs.append(zwanzig_stdevs[lambda_folder])
+
+        return sum(energies), squaredSum(stdevs)
+
+    def _getMBARData(self, lambda_folders):
+        # Energies of all the sampled models at all the sampled lambdas, which
+        # are only available when the energy matrix is complete
+        lambda_folder = lambda_folders[0]
+        energy_matrix = lambda_folder.energy_matrix
+
+        if (energy_matrix is None):
+            return None
+
+        window = lambda_folder.window
+        sampled_lambdas = energy_matrix.getSampledLambdas(window)
+        path = lambda_folder.path + '../'
+
+        # Each sampled lambda may have run a different number of steps
+        total_PELE_steps = dict(
+            (getLambdaKey(folder.initial_lambda), folder.total_PELE_steps)
+            for folder in lambda_folders)
+        if (self.sampled_steps is not None):
+            total_PELE_steps.update(self.sampled_steps.get(window, {}))
+
+        energies = []
+        states = []
+        weights = []
+
+        for state, sampled_lambda in enumerate(sampled_lambdas):
+            if (getLambdaKey(sampled_lambda) not in total_PELE_steps):
+                return None
+
+            for report in energy_matrix.getReports(window, sampled_lambda):
+                report_path = path + getLambdaKey(sampled_lambda) + '/' + \
+                    report
+
+                if (not isThereAFile(report_path)):
+                    return None
+
+                steps = getReportMetrics(report_path)[0]
+
+                report_energies = [energy_matrix.getCells(
+                    window, sampled_lambda, evaluated_lambda, report)[0]
+                    for evaluated_lambda in sampled_lambdas]
+
+                for evaluated_energies in report_energies:
+                    if (len(evaluated_energies) != len(steps)):
+                        return None
+
+                energies.append(np.transpose(report_energies))
+                states.append(np.full(len(steps), state))
+                weights.append(getMultiplicities(
+                    steps, total_PELE_steps[getLambdaKey(sampled_lambda)]))
+
+        if (len(energies) == 0):
+            return None
+
+        return np.concatenate(energies), np.concatenate(states), \
+            np.concatenate(weights)
+
+    def _MBARResults(self):
+        # Each window type is solved at once with MBAR when all its models
+        # were evaluated at all its lambdas, otherwise BAR is used
+        lambda_folders_by_window = {}
+        for lambda_folder in self.lambda_folders:
+            lambda_folders_by_window.setdefault(
+                (lambda_folder.type, lambda_folder.window), []).append(
+                lambda_folder)
+
+        energies = []
+        stdevs = []
+
+        for (lambda_type, window), lambda_folders in \
+                lambda_folders_by_window.items():
+            data = self._getMBARData(lambda_folders)
+
+            if (data is None):
+                print("  - FEPAnalysis Warning: no complete energy matrix " +
+                      "was found for {} lambdas, ".format(lambda_type) +
+                      "BAR is used instead of MBAR")
+                energy, stdev = self._BARResults(lambda_folders)
+            else:
+                energy, stdev = multistateBennettAcceptanceRatio(
+                    data[0], data[1], self.temperature, data[2])
+
+            energies.append(energy)
+            stdevs.append(stdev)
+
+        return sum(energies), squaredSum(stdevs)
+
     def getResults(self):
-        if (self.sampling_method == METHODS_DICT["DOUBLE_WIDE"]):
+        if (self.estimator == ESTIMATORS_DICT["BAR"]):
+            return self._BARResults()
+        elif (self.estimator == ESTIMATORS_DICT["MBAR"]):
+            return self._MBARResults()
+        elif (self.sampling_method == METHODS_DICT["DOUBLE_WIDE"]):
             return self._DWSResults()
         elif (self.sampling_method == METHODS_DICT["DOUBLE_ENDED"]):
             return self._DESResults()
 
     def printResults(self):
-        if (self.sampling_method == METHODS_DICT["DOUBLE_WIDE"]):
+        if ((self.estimator != ESTIMATORS_DICT["ZWANZIG"]) or
+                (self.sampling_method == METHODS_DICT["DOUBLE_WIDE"])):
             dE, stdev = self.getResults()
 
             print("  - Prediction " +
@@ -121,6 +391,14 @@ class FEPAnalysis(object):
             print("  - Error " +
                   "{:.3f} kcal/mol".format(stdev))
 
+            if ((self.bootstrap is not None) and
+                    (self.estimator == ESTIMATORS_DICT["ZWANZIG"])):
+                self._printConfidenceIntervals()
+                self._printConfidenceInterval(
+                    "Prediction", self.lambda_folders,
+                    [lambda_folder.direction_factor
+                     for lambda_folder in self.lambda_folders])
+
         elif (self.sampling_method == METHODS_DICT["DOUBLE_ENDED"]):
             d_dE, d_stdev, r_dE, r_stdev = self.getResults()
 
@@ -134,6 +412,43 @@ class FEPAnalysis(object):
             print("  - (Reverse) Error " +
                   "{:.3f} kcal/mol".format(r_stdev))
 
+            if (self.bootstrap is not None):
+                direct_folders = [
+                    lambda_folder for lambda_folder in self.lambda_folders
+                    if (lambda_folder.direction ==
+                        DIRECTION_LABELS["FORWARD"])]
+                reverse_folders = [
+                    lambda_folder for lambda_folder in self.lambda_folders
+                    if (lambda_folder.direction ==
+                        DIRECTION_LABELS["BACKWARDS"])]
+
+                self._printConfidenceIntervals()
+                self._printConfidenceInterval(
+                    "(Direct) Prediction", direct_folders,
+                    [1, ] * len(direct_folders))
+                self._printConfidenceInterval(
+                    "(Reverse) Prediction", reverse_folders,
+                    [1, ] * len(reverse_folders))
+
+    def _printConfidenceIntervals(self):
+        print("  - Bootstrap confidence intervals " +
+              "({:.0f}%, ".format(BOOTSTRAP_CONFIDENCE_LEVEL) +
+              "{} resamples)".format(self.bootstrap_samples))
+
+        intervals = self.getConfidenceIntervals()
+
+        for lambda_folder in sorted(self.lambda_folders):
+            lower, upper = intervals[lambda_folder]
+            print("   - {} {} ".format(lambda_folder.type, lambda_folder) +
+                  "[{:.2f}, {:.2f}] kcal/mol".format(lower, upper))
+
+    def _printConfidenceInterval(self, label, lambda_folders, factors):
+        lower, upper = self._getSummedConfidenceInterval(lambda_folders,
+                                                         factors)
+
+        print("  - {} confidence interval ".format(label) +
+              "[{:.2f}, {:.2f}] kcal/mol".format(lower, upper))
+
     def plotHistogram(self):
         energies = {}
 
@@ -3,6 +3,7 @@
 
 # Python imports
 import sys
+import numpy as np
 import matplotlib.pyplot as plt
 
 
@@ -51,8 +52,7 @@ class dEDistributionPlot(object):
         self.ax.axvspan(average - stdev, average + stdev, alpha=0.5,
                         color='red')
         self.ax.axvline(x=average, linewidth=2, color='r', linestyle="--")
-        self.ax.hist(self.values[self.current_plot], *self.args,
-                     **self.kwargs)
+        self._plotHistogram()
 
         plt.show()
 
@@ -81,6 +81,13 @@ class dEDistributionPlot(object):
                              r'$\sigma = $' +
                              "{:.3f}".format(round(stdev, 3)))
 
+    def _plotHistogram(self):
+        # Values come with their multiplicities, which weight the histogram
+        values, multiplicities = self.values[self.current_plot]
+
+        self.ax.hist(values, *self.args, weights=multiplicities,
+                     **self.kwargs)
+
     def _setAxisLabels(self):
         plt.xlabel(r'$\Delta E$')
         plt.ylabel('Frequency')
@@ -105,8 +112,7 @@ class dEDistributionPlot(object):
             self.ax.axvspan(average - stdev, average + stdev, alpha=0.5,
                             color='red')
             self.ax.axvline(x=average, linewidth=2, color='r', linestyle="--")
-            self.ax.hist(self.values[self.current_plot], *self.args,
-                         **self.kwargs)
+            self._plotHistogram()
 
             plt.draw()
         else:
@@ -127,8 +133,7 @@ class dEDistributionPlot(object):
             self.ax.axvspan(average - stdev, average + stdev, alpha=0.5,
                             color='red')
             self.ax.axvline(x=average, linewidth=2, color='r', linestyle="--")
-            self.ax.hist(self.values[self.current_plot], *self.args,
-                         **self.kwargs)
+            self._plotHistogram()
 
             plt.draw()
         else:
@@ -161,8 +166,7 @@ class dEVariationPlot(object):
 
         self._setTitle()
         self._setAxisLabels()
-        self.ax.plot(self.values[self.current_plot], *self.args,
-                     **self.kwargs)
+        self._plotVariation()
 
         plt.show()
 
@@ -183,6 +187,14 @@ class dEVariationPlot(object):
                        r'$\lambda_{1} =$' +
                        "{}".format(lambda_shift[1]))
 
+    def _plotVariation(self):
+        # Each value is kept during as many steps as its multiplicity
+        values, multiplicities = self.values[self.current_plot]
+        steps = np.cumsum(multiplicities) - multiplicities
+
+        self.ax.plot(steps, values, *self.args, drawstyle='steps-post',
+                     **self.kwargs)
+
     def _setAxisLabels(self):
         plt.ylabel('PELE accepted steps')
         plt.ylabel(r'$\Delta E$')
@@ -202,8 +214,7 @@ class dEVariationPlot(object):
             self._setTitle()
             self._setAxisLabels()
 
-            self.ax.plot(self.values[self.current_plot], *self.args,
-                         **self.kwargs)
+            self._plotVariation()
 
             plt.draw()
         else:
@@ -219,8 +230,7 @@ class dEVariationPlot(object):
             self._setTitle()
             self._setAxisLabels()
 
-            self.ax.plot(self.values[self.current_plot], *self.args,
-                         **self.kwargs)
+            self._plotVariation()
 
             plt.draw()
 
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+
+
+# Python imports
+import math
+import numpy as np
+
+
+# FEP_PELE imports
+from .Calculators import calculateWeightedStandardDeviation
+from .Calculators import calculateOverlap
+
+from FEP_PELE.FreeEnergy import Constants as co
+
+
+# Script information
+__author__ = "Marti Municoy"
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Marti Municoy"
+__email__ = "marti.municoy@bsc.es"
+
+
+# Class definitions
+class ScheduleOptimizer(object):
+    # It redistributes the lambdas of a pilot run so every new window spans
+    # the same thermodynamic length, which is the dE deviation along lambda.
+    # Windows get denser where the pilot ones overlapped poorly and sparser
+    # where they were redundant
+    def __init__(self, lambda_folders, temperature=298.15,
+                 target_deviation=co.DEF_SCHEDULE_TARGET_DEVIATION):
+        self.lambda_folders = lambda_folders
+        self.temperature = temperature
+        self.target_deviation = target_deviation
+        self.statistics = self._calculateStatistics()
+
+    def _calculateStatistics(self):
+        statistics = {}
+
+        for lambda_folder in self.lambda_folders:
+            energies, multiplicities = lambda_folder.getDeltaEnergyValues()
+
+            if (len(energies) == 0):
+                print("  - ScheduleOptimizer Warning: no dE values were " +
+                      "found in {}".format(lambda_folder.path))
+                continue
+
+            statistics[lambda_folder] = (
+                calculateWeightedStandardDeviation(energies, multiplicities),
+                calculateOverlap(energies, self.temperature, multiplicities),
+                int(np.sum(multiplicities)))
+
+        return statistics
+
+    def getLength(self, lambda_folder):
+        # For gaussian dEs the overlap is exp(-(sigma / kBT)^2), so it is
+        # turned into an equivalent deviation and the largest of both is
+        # kept. This way, heavy tails that spoil the overlap are not missed
+        deviation, overlap, samples = self.statistics[lambda_folder]
+        kBT = co.BOLTZMANN_CONSTANT_IN_KCAL_MOL * self.temperature
+
+        return max(deviation,
+                   kBT * math.sqrt(max(0., - math.log(overlap))))
+
+    def _getDensities(self, bounds, lambda_type):
+        densities = np.zeros(len(bounds) - 1)
+        counts = np.zeros(len(bounds) - 1)
+
+        for lambda_folder in self.statistics:
+            if (lambda_folder.type != lambda_type):
+                continue
+
+            start, end = sorted((round(lambda_folder.initial_lambda, 5),
+                                 round(lambda_folder.final_lambda, 5)))
+
+            # Intervals covered by several windows get their mean density
+            covered = (bounds[:-1] >= start) & (bounds[1:] <= end)
+            densities[covered] += self.getLength(lambda_folder) / \
+                (end - start)
+            counts[covered] += 1
+
+        covered = counts > 0
+
+        if (not np.any(covered)):
+            return None
+
+        densities[covered] /= counts[covered]
+
+        if (np.max(densities) == 0):
+            densities[covered] = 1.
+
+        # A floor keeps windows from growing without limit where dEs
+        # vanish
+        densities[covered] = np.maximum(
+            densities[covered],
+            co.SCHEDULE_MIN_DENSITY_FRACTION * np.max(densities))
+
+        # Intervals that no window covered have no density
+        densities[~covered] = np.nan
+
+        return densities
+
+    def _getCoveredRuns(self, densities):
+        # First and last intervals of each run of consecutive intervals
+        # with a density
+        runs = []
+
+        for index, density in enumerate(densities):
+            if (np.isnan(density)):
+                continue
+
+            if ((len(runs) > 0) and (runs[-1][1] == index - 1)):
+                runs[-1][1] = index
+            else:
+                runs.append([index, index])
+
+        return runs
+
+    def getWindowVariance(self, length, samples):
+        # Variance of the Zwanzig estimate of a window whose dEs are
+        # gaussian with the given deviation
+        kBT = co.BOLTZMANN_CONSTANT_IN_KCAL_MOL * self.temperature
+
+        return kBT ** 2 * np.expm1((length / kBT) ** 2) / samples
+
+    def getOptimizedLambdas(self, lambdas, lambda_type):
+        # The end points of the pilot schedule are kept, as well as its
+        # order. It also returns the expected error of the free energy,
+        # assuming that new windows get as many samples as the pilot ones
+        descending = lambdas[0] > lambdas[-1]
+
+        bounds = np.unique(np.round(lambdas, 5))
+        for lambda_folder in self.statistics:
+            if (lambda_folder.type == lambda_type):
+                bounds = np.union1d(bounds, np.round(
+                    (lambda_folder.initial_lambda,
+                     lambda_folder.final_lambda), 5))
+        bounds = bounds[(bounds >= min(lambdas)) & (bounds <= max(lambdas))]
+
+        densities = None
+        if (len(bounds) > 1):
+            densities = self._getDensities(bounds, lambda_type)
+
+        if (densities is None):
+            print("  - ScheduleOptimizer Warning: no {} ".format(lambda_type) +
+                  "windows were found, its schedule is kept")
+            return list(lambdas), None
+
+        # Intervals that no window covered keep their pilot spacing
+        values = bounds[[0, -1]]
+        for start, end, density in zip(bounds[:-1], bounds[1:], densities):
+            if (np.isnan(density)):
+                print("  - ScheduleOptimizer Warning: no {} ".format(
+                    lambda_type) + "window covers lambdas from " +
+                    "{} to {}, its pilot spacing is kept ".format(start, end) +
+                    "and it is not included in the error estimate")
+                values = np.union1d(values, (start, end))
+
+        samples = np.mean([self.statistics[lambda_folder][2]
+                           for lambda_folder in self.statistics
+                           if (lambda_folder.type == lambda_type)])
+        span = bounds[-1] - bounds[0]
+        variance = 0.
+
+        for first, last in self._getCoveredRuns(densities):
+            run_bounds = bounds[first:last + 2]
+
+            lengths = np.concatenate(([0., ], np.cumsum(
+                densities[first:last + 1] * np.diff(run_bounds))))
+
+            number_of_windows = max(
+                1, int(math.ceil(co.SCHEDULE_MIN_WINDOWS *
+                                 (run_bounds[-1] - run_bounds[0]) / span)),
+                int(math.ceil(lengths[-1] / self.target_deviation)))
+
+            values = np.union1d(values, np.interp(
+                np.linspace(0., lengths[-1], number_of_windows + 1), lengths,
+                run_bounds))
+
+            # All the new windows of a run span the same length
+            variance += number_of_windows * self.getWindowVariance(
+                lengths[-1] / number_of_windows, samples)
+
+        values = np.unique(np.round(values, co.SCHEDULE_DECIMALS))
+
+        if (descending):
+            values = values[::-1]
+
+        return [float(value) for value in values], float(np.sqrt(variance))
+
+    def printStatistics(self):
+        for lambda_folder in sorted(self.statistics):
+            deviation, overlap, samples = self.statistics[lambda_folder]
+
+            print("  - {} {}: ".format(lambda_folder.type,
+                                       lambda_folder.name) +
+                  "dE deviation {:.3f} kcal/mol, ".format(deviation) +
+                  "overlap {:.3f}".format(overlap))
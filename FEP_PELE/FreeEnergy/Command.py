@@ -8,6 +8,8 @@ import os
 # FEP_PELE imports
 from . import Constants as co
 from .CheckPoint import CheckPoint
+from .EnergyMatrix import EnergyMatrix
+from .EnergyMatrix import getLambdaKey
 from .SamplingMethods.SamplingMethodBuilder import SamplingMethodBuilder
 
 from FEP_PELE.Tools.LambdaFolder import LambdaFolder
@@ -16,16 +18,21 @@ from FEP_PELE.Tools.PDBTools import PDBModifier
 from FEP_PELE.Tools.Math import norm
 
 from FEP_PELE.PELETools import PELEConstants as pele_co
+from FEP_PELE.PELETools.Workspace import PELEWorkspace
+from FEP_PELE.PELETools.PELERunner import getPELERunner
 
 from FEP_PELE.Utils.InOut import printCommandTitle
 from FEP_PELE.Utils.InOut import getFoldersInAPath
 from FEP_PELE.Utils.InOut import getLastFolderFromPath
+from FEP_PELE.Utils.InOut import getPathFromFile
+from FEP_PELE.Utils.InOut import isThereAFile
 from FEP_PELE.Utils.InOut import copyFile
 from FEP_PELE.Utils.InOut import getFileFromPath
 
 from FEP_PELE.TemplateHandler.Templates import TemplateOPLS2005
 from FEP_PELE.TemplateHandler.AlchemicalTemplateCreator import \
     AlchemicalTemplateCreator
+from FEP_PELE.TemplateHandler.TemplateBank import TemplateBank
 from FEP_PELE.TemplateHandler import Lambda
 
 
@@ -65,6 +72,12 @@ class Command(object):
             settings.final_template,
             settings.atom_links)
 
+        self._templateBank = TemplateBank(
+            self._alchemicalTemplateCreator,
+            settings.general_path + co.TEMPLATE_BANK_FOLDER)
+
+        self._workspaces = {}
+
         smBuilder = SamplingMethodBuilder(settings)
         self._s_method = smBuilder.createSamplingMethod()
 
@@ -90,6 +103,10 @@ class Command(object):
     def alchemicalTemplateCreator(self):
         return self._alchemicalTemplateCreator
 
+    @property
+    def templateBank(self):
+        return self._templateBank
+
     @property
     def sampling_method(self):
         return self._s_method
@@ -178,27 +195,76 @@ class Command(object):
 
         return output
 
-    def _createAlchemicalTemplate(self, lambda_, constant_lambda, gap=''):
-        print("{} - Creating alchemical template".format(gap))
+    def _generateTemplateBank(self, lambdas, constant_lambda=None,
+                              include_shifted_lambdas=True):
+        lambda_pairs = []
 
-        path = self.settings.general_path + pele_co.HETEROATOMS_TEMPLATE_PATH
+        for lambda_ in lambdas:
+            ctt_lambda = constant_lambda
+            if (ctt_lambda is None):
+                ctt_lambda = self.getConstantLambda(lambda_)
 
+            lambda_pairs.append((lambda_, ctt_lambda))
+
+            if (include_shifted_lambdas):
+                for shf_lambda in self.sampling_method.getShiftedLambdas(
+                        lambda_):
+                    lambda_pairs.append((shf_lambda, ctt_lambda))
+
+        self.templateBank.generate(lambda_pairs)
+
+    def _getAlchemicalTemplateName(self):
         if (self.alchemicalTemplateCreator.explicit_is_final):
-            path += self.settings.final_template_name
+            return self.settings.final_template_name
         else:
-            path += self.settings.initial_template_name
+            return self.settings.initial_template_name
+
+    def _createAlchemicalTemplate(self, lambda_, constant_lambda, gap=''):
+        print("{} - Creating alchemical template".format(gap))
+
+        path = self.settings.general_path + \
+            pele_co.HETEROATOMS_TEMPLATE_PATH + \
+            self._getAlchemicalTemplateName()
 
         if (constant_lambda is not None):
             print("{}  - Applying {}".format(gap, str(constant_lambda)))
-            self.alchemicalTemplateCreator.applyLambda(constant_lambda)
 
         print("{}  - Applying {}".format(gap, str(lambda_)))
-        self.alchemicalTemplateCreator.applyLambda(lambda_)
 
-        self.alchemicalTemplateCreator.writeAlchemicalTemplate(path)
-        self.alchemicalTemplateCreator.reset()
+        self.templateBank.activate(lambda_, constant_lambda, path)
+
+    def _getWorkspace(self, lambda_, constant_lambda):
+        key = self.templateBank.getKey(lambda_, constant_lambda)
+
+        if (key in self._workspaces):
+            return self._workspaces[key]
+
+        # Each workspace holds its own alchemical template, so PELE runs
+        # for different lambdas can share the same pool of workers
+        template_name = self._getAlchemicalTemplateName()
+
+        workspace = PELEWorkspace(self.settings.general_path,
+                                  self.settings.general_path +
+                                  co.WORKSPACES_FOLDER + key)
+        workspace.build(private_templates=[template_name, ])
+
+        self.templateBank.activate(lambda_, constant_lambda,
+                                   workspace.templates_path + template_name)
+
+        self._workspaces[key] = workspace
+
+        return workspace
+
+    def _getPELERunner(self, executable_path=None, number_of_processors=1):
+        if (executable_path is None):
+            executable_path = self.settings.serial_pele
+
+        return getPELERunner(executable_path,
+                             number_of_processors=number_of_processors,
+                             launcher=self.settings.pele_launcher)
 
-    def _getLambdaFoldersFrom(self, path, lambda_type=Lambda.DUAL_LAMBDA):
+    def _getLambdaFoldersFrom(self, path, lambda_type=Lambda.DUAL_LAMBDA,
+                              energy_matrix=None):
         folders = getFoldersInAPath(path)
 
         selected_folders = []
@@ -229,12 +295,75 @@ class Command(object):
             if (final_lambda > 1) or (final_lambda < 0):
                 continue
 
+            # Splitted windows are stored like their parent folder
+            if (lambda_type == Lambda.DUAL_LAMBDA):
+                window = lambda_type
+                simulation_path = self.settings.simulation_path
+            else:
+                window = getLastFolderFromPath(
+                    getPathFromFile(folder.rstrip('/')))
+                simulation_path = self.settings.simulation_path + window + '/'
+
             selected_folders.append(LambdaFolder(
                 folder, lambda_type=lambda_type,
-                total_PELE_steps=self.settings.total_PELE_steps))
+                total_PELE_steps=self._getSampledSteps(
+                    simulation_path + str(initial_lambda) + '/'),
+                energy_matrix=energy_matrix, window=window))
 
         return sorted(selected_folders)
 
+    def _getSampledSteps(self, simulation_path):
+        # Samplings that converged early record the steps they ran
+        path = simulation_path + co.SAMPLED_STEPS_NAME
+
+        if (not isThereAFile(path)):
+            return self.settings.total_PELE_steps
+
+        with open(path, 'r') as steps_file:
+            return int(steps_file.read())
+
+    def _getSampledStepsByWindow(self, lambda_folders):
+        # Steps run at every sampled lambda of each window, which differ
+        # among the lambdas whose samplings converged early
+        sampled_steps = {}
+
+        for lambda_folder in lambda_folders:
+            window = lambda_folder.window
+
+            if (window in sampled_steps):
+                continue
+
+            simulation_path = self.settings.simulation_path
+            if (window != Lambda.DUAL_LAMBDA):
+                simulation_path += window + '/'
+
+            sampled_steps[window] = {}
+
+            for folder in getFoldersInAPath(simulation_path):
+                try:
+                    lambda_value = float(getLastFolderFromPath(folder))
+                except ValueError:
+                    continue
+
+                sampled_steps[window][getLambdaKey(lambda_value)] = \
+                    self._getSampledSteps(folder)
+
+        return sampled_steps
+
+    def _getEnergyMatrixWindow(self, lambda_type, num=0):
+        if (lambda_type == Lambda.DUAL_LAMBDA):
+            return lambda_type
+
+        return str(num) + '_' + lambda_type
+
+    def _getEnergyMatrix(self):
+        path = self.settings.general_path + co.ENERGY_MATRIX_NAME
+
+        if (not isThereAFile(path)):
+            return None
+
+        return EnergyMatrix(path)
+
     def _getAtomsToMinimize(self):
         fragment_atoms = self.alchemicalTemplateCreator.getFragmentAtomNames()
 
@@ -335,11 +464,9 @@ class Command(object):
         core_atoms = self.alchemicalTemplateCreator.getCoreAtoms()
         template_atoms = self.ligand_template.list_of_atoms
 
-        # Bonds need to be retrived from the current template
-        # (may be modified)
+        # Bonds need to be retrived from the template of these lambdas
         current_template = TemplateOPLS2005(
-            self.settings.general_path + pele_co.HETEROATOMS_TEMPLATE_PATH +
-            getFileFromPath(self.ligand_template.path_to_template))
+            self.templateBank.getTemplatePath(lambda_, constant_lambda))
 
         list_of_bonds = current_template.list_of_bonds
 
@@ -356,8 +483,6 @@ class Command(object):
             lengths.append(bond.eq_dist)
             f_indexes.append(self._getFixedIndex(atom1, atom2, core_atoms))
 
-            self.alchemicalTemplateCreator.reset()
-
         return bonds, lengths, f_indexes
 
     def _getFixedIndex(self, atom1, atom2, core_atoms):
@@ -377,15 +502,22 @@ class Command(object):
         pass
 
     def _getLambdaFolders(self):
+        # Energies are read from the energy matrix, when available, at full
+        # precision
+        energy_matrix = self._getEnergyMatrix()
+
         if (self.settings.splitted_lambdas):
             lambda_folders = self._getLambdaFoldersFrom(
                 self.path + '?_' + Lambda.STERIC_LAMBDA + '/',
-                lambda_type=Lambda.STERIC_LAMBDA)
+                lambda_type=Lambda.STERIC_LAMBDA,
+                energy_matrix=energy_matrix)
             lambda_folders += self._getLambdaFoldersFrom(
                 self.path + '?_' + Lambda.COULOMBIC_LAMBDA + '/',
-                lambda_type=Lambda.COULOMBIC_LAMBDA)
+                lambda_type=Lambda.COULOMBIC_LAMBDA,
+                energy_matrix=energy_matrix)
         else:
-            lambda_folders = self._getLambdaFoldersFrom(self.path)
+            lambda_folders = self._getLambdaFoldersFrom(
+                self.path, energy_matrix=energy_matrix)
 
         return lambda_folders
 
@@ -49,11 +49,16 @@ class ExponentialAveraging(Command):
 
         print("  - {} lambda folders were found".format(len(lambda_folders)))
 
-        print(" - Calculating Free Energy change")
-
-        analysis = FEPAnalysis.FEPAnalysis(lambda_folders,
-                                           self.settings.sampling_method,
-                                           divisions=1)
+        print(" - Calculating Free Energy change with " +
+              "{} estimator".format(self.settings.estimator))
+
+        analysis = FEPAnalysis.FEPAnalysis(
+            lambda_folders, self.settings.sampling_method, divisions=1,
+            estimator=self.settings.estimator,
+            bootstrap_samples=self.settings.bootstrap_samples,
+            block_size=self.settings.bootstrap_block_size,
+            processes=self.settings.number_of_processors,
+            sampled_steps=self._getSampledStepsByWindow(lambda_folders))
 
         analysis.printResults()
 
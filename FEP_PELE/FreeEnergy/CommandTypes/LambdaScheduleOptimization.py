@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+
+
+# Python imports
+import sys
+
+
+# FEP_PELE imports
+from FEP_PELE.FreeEnergy import Constants as co
+from FEP_PELE.FreeEnergy.Command import Command
+from FEP_PELE.FreeEnergy.Analysis.ScheduleOptimizer import ScheduleOptimizer
+
+from FEP_PELE.TemplateHandler import Lambda
+
+from FEP_PELE.Utils.InOut import isThereAPath
+
+
+# Script information
+__author__ = "Marti Municoy"
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Marti Municoy"
+__email__ = "marti.municoy@bsc.es"
+
+
+# Class definitions
+class LambdaScheduleOptimization(Command):
+    # It is meant to follow a short pilot sampling and dE calculation at a
+    # coarse schedule. The optimized schedule is written like an input file,
+    # so it can be loaded back with the LambdaSchedule setting
+    def __init__(self, settings):
+        self._name = co.COMMAND_NAMES_DICT["LAMBDA_SCHEDULE_OPTIMIZATION"]
+        self._label = co.COMMAND_LABELS_DICT["LAMBDA_SCHEDULE_OPTIMIZATION"]
+        Command.__init__(self, settings)
+        self._path = self.settings.calculation_path
+
+    def run(self):
+        self._start()
+
+        if (not isThereAPath(self.path)):
+            print("Error: no lambda calculation was found in the expected " +
+                  "path {}. You need to run ".format(self.path) +
+                  "LambdaSimulation and a Sampling command before " +
+                  "optimizing the lambda schedule. Check your parameters.")
+            sys.exit(1)
+
+        print(" - Retrieving lambda folders from {}".format(self.path))
+
+        lambda_folders = self._getLambdaFolders()
+
+        print("  - {} lambda folders were found".format(len(lambda_folders)))
+
+        print(" - Estimating dE deviations and overlaps of pilot windows")
+
+        optimizer = ScheduleOptimizer(
+            lambda_folders,
+            target_deviation=self.settings.schedule_target_deviation)
+
+        optimizer.printStatistics()
+
+        print(" - Optimizing lambda schedule for a dE deviation of " +
+              "{} kcal/mol per window".format(
+                  self.settings.schedule_target_deviation))
+
+        schedule = []
+        for key, lambda_type, lambdas in self._getPilotLambdas():
+            optimized_lambdas, error = optimizer.getOptimizedLambdas(
+                lambdas, lambda_type)
+
+            print("  - {} lambdas: {} --> {} ".format(
+                lambda_type, len(lambdas), len(optimized_lambdas)) +
+                "[{}]".format(', '.join(str(v) for v in optimized_lambdas)))
+
+            if (error is not None):
+                print("   - Expected error {:.3f} kcal/mol".format(error))
+
+            schedule.append((key, optimized_lambdas))
+
+        path = self.settings.general_path + co.LAMBDA_SCHEDULE_NAME
+
+        self._writeSchedule(path, schedule)
+
+        print(" - Optimized lambda schedule written to {}".format(path))
+
+        self._finish()
+
+    def _getPilotLambdas(self):
+        if (not self.settings.splitted_lambdas):
+            return [(co.CONTROL_FILE_DICT["LAMBDAS"], Lambda.DUAL_LAMBDA,
+                     self.settings.lambdas), ]
+
+        s_lambdas = self.settings.lj_lambdas
+        c_lambdas = self.settings.c_lambdas
+        if (len(s_lambdas) < 1):
+            s_lambdas = self.settings.lambdas
+        if (len(c_lambdas) < 1):
+            c_lambdas = self.settings.lambdas
+
+        return [(co.CONTROL_FILE_DICT["LJ_LAMBDAS"], Lambda.STERIC_LAMBDA,
+                 s_lambdas),
+                (co.CONTROL_FILE_DICT["C_LAMBDAS"], Lambda.COULOMBIC_LAMBDA,
+                 c_lambdas)]
+
+    def _writeSchedule(self, path, schedule):
+        with open(path, 'w') as schedule_file:
+            schedule_file.write("# Lambda schedule optimized for a dE " +
+                                "deviation of {} ".format(
+                                    self.settings.schedule_target_deviation) +
+                                "kcal/mol per window\n")
+
+            for key, lambdas in schedule:
+                schedule_file.write("{} {}\n".format(
+                    key, ','.join(str(v) for v in lambdas)))
@@ -2,7 +2,9 @@
 
 
 # Python imports
+import os
 import sys
+import glob
 import random
 
 
@@ -10,6 +12,7 @@ import random
 from FEP_PELE.FreeEnergy.Command import Command
 from FEP_PELE.FreeEnergy import Constants as co
 from FEP_PELE.FreeEnergy.Constants import SAMPLING_METHODS_DICT as METHODS_DICT
+from FEP_PELE.FreeEnergy.ConvergenceMonitor import ConvergenceMonitor
 
 from FEP_PELE.TemplateHandler import Lambda
 
@@ -17,10 +20,12 @@ from FEP_PELE.Utils.InOut import clear_directory
 from FEP_PELE.Utils.InOut import create_directory
 from FEP_PELE.Utils.InOut import getFileFromPath
 from FEP_PELE.Utils.InOut import writeLambdaTitle
+from FEP_PELE.Utils.InOut import isThereAFile
 
-from FEP_PELE.PELETools.PELERunner import PELERunner
 from FEP_PELE.PELETools.ControlFileCreator import \
     ControlFileFromTemplateCreator
+from FEP_PELE.PELETools import PELEConstants as pele_co
+from FEP_PELE.PELETools.PELEResult import PELEError
 
 
 # Script information
@@ -49,6 +54,9 @@ class LambdasSampling(Command):
         self._finish()
 
     def _run(self):
+        self._generateTemplateBank(self.lambdas,
+                                   include_shifted_lambdas=False)
+
         for lmb in self.lambdas:
             if (self.checkPoint.check((self.name, str(lmb.index) +
                                        str(lmb.type) + str(lmb.value)))):
@@ -84,13 +92,12 @@ class LambdasSampling(Command):
 
         self._writeMinimizationControlFile()
 
-        runner = PELERunner(self.settings.serial_pele,
-                            number_of_processors=1)
+        runner = self._getPELERunner()
 
         try:
             runner.run(self.settings.minimization_path +
                        co.MINIMIZATION_CF_NAME)
-        except SystemExit as exception:
+        except PELEError as exception:
             print("LambdasSimulation error: \n" + str(exception))
             sys.exit(1)
 
@@ -104,18 +111,97 @@ class LambdasSampling(Command):
 
         clear_directory(path)
 
+        # Hidden files are kept by clear_directory, but the steps recorded
+        # by a previous sampling would no longer apply
+        if (isThereAFile(path + co.SAMPLED_STEPS_NAME)):
+            os.remove(path + co.SAMPLED_STEPS_NAME)
+
         self._writeSimulationControlFile(path, control_file_name)
 
-        runner = PELERunner(
+        runner = self._getPELERunner(
             self.settings.mpi_pele,
             number_of_processors=self.settings.number_of_processors)
 
+        # Windows that converge before the step budget runs out are
+        # stopped early. Convergence is not trusted until a minimum of
+        # uncorrelated samples was reached, so short pilot runs might need
+        # a lower MinEffectiveSamples to stop at all
+        if (self.settings.sampling_uncertainty_target is not None):
+            monitor = ConvergenceMonitor(
+                path, self.settings.sampling_uncertainty_target,
+                interval=self.settings.convergence_check_interval,
+                min_effective_samples=self.settings.min_effective_samples)
+        else:
+            monitor = None
+
         try:
-            runner.run(path + control_file_name)
-        except SystemExit as exception:
+            result = runner.run(path + control_file_name, monitor=monitor)
+        except PELEError as exception:
             print("LambdasSimulation error: \n" + str(exception))
             sys.exit(1)
 
+        if (result.stopped):
+            sampled_steps = self._trimSamplingOutput(path)
+
+            print("   Converged after {} PELE steps ".format(sampled_steps) +
+                  "with an uncertainty of " +
+                  "{:.3f} kcal/mol".format(monitor.uncertainty))
+
+            # Later commands weight the last models with the steps that
+            # were actually run
+            with open(path + co.SAMPLED_STEPS_NAME, 'w') as steps_file:
+                steps_file.write(str(sampled_steps))
+
+    def _trimSamplingOutput(self, path):
+        # A stopped PELE run might leave the last model of each trajectory
+        # half written, so reports and trajectories are cut to the models
+        # they both contain. It returns the last step that was kept
+        sampled_steps = 0
+
+        for report_path in glob.glob(path + co.SAMPLING_REPORTS_PATTERN):
+            trajectory_id = report_path.split('_')[-1].split('.')[0]
+            trajectory_path = path + co.SAMPLING_TRAJECTORIES_PREFIX + \
+                trajectory_id + ".pdb"
+
+            with open(report_path, 'r') as report_file:
+                report_lines = report_file.readlines()
+
+            if (isThereAFile(trajectory_path)):
+                with open(trajectory_path, 'r') as trajectory_file:
+                    trajectory_lines = trajectory_file.readlines()
+            else:
+                trajectory_lines = []
+
+            report_lines = report_lines[:1] + \
+                [line for line in report_lines[1:]
+                 if ((line.endswith('\n')) and
+                     (len(line.split()) >=
+                      pele_co.REPORT_TOTAL_ENERGY_COLUMN))]
+            model_ends = [i for i, line in enumerate(trajectory_lines)
+                          if line.startswith("ENDMDL")]
+
+            number_of_models = min(len(report_lines) - 1, len(model_ends))
+
+            # Trajectories without any complete model are dropped
+            if (number_of_models == 0):
+                os.remove(report_path)
+                if (isThereAFile(trajectory_path)):
+                    os.remove(trajectory_path)
+                continue
+
+            with open(report_path, 'w') as report_file:
+                report_file.writelines(report_lines[:number_of_models + 1])
+
+            with open(trajectory_path, 'w') as trajectory_file:
+                trajectory_file.writelines(
+                    trajectory_lines[:model_ends[number_of_models - 1] + 1])
+
+            sampled_steps = max(sampled_steps, int(
+                report_lines[number_of_models].split()[
+                    pele_co.REPORT_STEPS_COLUMN - 1]))
+
+        return sampled_steps
+
     def _writeMinimizationControlFile(self):
         cf_creator = ControlFileFromTemplateCreator(
             self.settings.min_control_file)
@@ -11,9 +11,8 @@ from FEP_PELE.FreeEnergy.Command import Command
 
 from FEP_PELE.TemplateHandler import Lambda
 
-from FEP_PELE.PELETools import PELEConstants as pele_co
 from FEP_PELE.PELETools.SimulationParser import Simulation
-from FEP_PELE.PELETools.PELERunner import PELERunner
+from FEP_PELE.PELETools.PELEResult import PELEError
 from FEP_PELE.PELETools.ControlFileCreator import \
     ControlFileFromTemplateCreator
 
@@ -51,6 +50,8 @@ class SerialdECalculation(Command):
 
         atoms_to_minimize = self._getAtomIdsToMinimize()
 
+        self._generateTemplateBank(self.lambdas)
+
         for lmb in self.lambdas:
             writeLambdaTitle(lmb)
 
@@ -148,17 +149,17 @@ class SerialdECalculation(Command):
             self._PELERecalculatorLoop(lmb, general_path, report)
 
     def _trajectoryWriterLoop(self, report_file):
+        model_names = []
         for model_id in range(0, report_file.trajectory.models.number):
+            model_names.append(self.path + str(self.PID) + '_' +
+                               co.MODELS_FOLDER + str(model_id) + '-' +
+                               report_file.trajectory.name)
 
-            model_name = self.path + str(self.PID) + '_' + co.MODELS_FOLDER + \
-                str(model_id) + '-' + report_file.trajectory.name
-
-            report_file.trajectory.writeModel(model_id, model_name)
+        report_file.trajectory.splitModels(model_names)
 
     def _originalEnergiesCalculator(self, path, report_file):
-        # Define new PELERunner
-        runner = PELERunner(self.settings.serial_pele,
-                            number_of_processors=1)
+        # Get PELERunner
+        runner = self._getPELERunner()
 
         # Save original energies
         energies = []
@@ -187,6 +188,9 @@ class SerialdECalculation(Command):
 
         path = self.path + str(self.PID) + '_' + co.MODELS_FOLDER
 
+        # Get PELERunner
+        runner = self._getPELERunner()
+
         for model_id, active in enumerate(report_file.models):
             # Set initial variables
             file_name = str(model_id) + '-' + report_file.trajectory.name
@@ -194,10 +198,6 @@ class SerialdECalculation(Command):
             logfile_name = path + co.LOGFILE_NAME.format(self.PID)
             minimized_pdb = general_path + file_name
 
-            # Define new PELERunner
-            runner = PELERunner(self.settings.serial_pele,
-                                number_of_processors=1)
-
             # Write recalculation control file
             self._writeRecalculationControlFile(
                 self.settings.pp_control_file,
@@ -218,6 +218,9 @@ class SerialdECalculation(Command):
         rmsds = []
         path = self.path + str(self.PID) + '_' + co.MODELS_FOLDER
 
+        # Get PELERunner
+        runner = self._getPELERunner()
+
         for model_id, active in enumerate(report_file.models):
             # Set initial variables
             file_name = str(model_id) + '-' + report_file.trajectory.name
@@ -225,10 +228,6 @@ class SerialdECalculation(Command):
             shifted_pdb = general_path + file_name
             logfile_name = path + co.LOGFILE_NAME.format(self.PID)
 
-            # Define new PELERunner
-            runner = PELERunner(self.settings.serial_pele,
-                                number_of_processors=1)
-
             # Write recalculation control file
             self._writeRecalculationControlFile(
                 self.settings.sp_control_file,
@@ -305,16 +304,17 @@ class SerialdECalculation(Command):
         path = self.path + str(self.PID) + '_' + co.MODELS_FOLDER
 
         try:
-            output = runner.run(path +
+            result = runner.run(path +
                                 co.SINGLE_POINT_CF_NAME.format(self.PID))
-        except SystemExit as exception:
+        except PELEError as exception:
             print("dECalculation error: \n" + str(exception))
             sys.exit(1)
 
-        for line in output.split('\n'):
-            if line.startswith(pele_co.ENERGY_RESULT_LINE):
-                return float(line.strip().split()[-1])
+        energies = result.getEnergies()
+
+        if (len(energies) > 0):
+            return energies[0]
 
         print("Error: energy calculation failed")
-        print(output)
+        print(result.tail)
         sys.exit(1)
@@ -12,7 +12,7 @@ from FEP_PELE.Utils.InOut import clear_directory
 from FEP_PELE.Utils.InOut import copyFile
 from FEP_PELE.Utils.InOut import getFileFromPath
 from FEP_PELE.PELETools import PELEConstants as pele_co
-from FEP_PELE.PELETools.PELERunner import PELERunner
+from FEP_PELE.PELETools.PELEResult import PELEError
 from FEP_PELE.PELETools.ControlFileCreator import \
     ControlFileFromTemplateCreator
 
@@ -43,8 +43,7 @@ class SolvationFreeEnergyCalculation(Command):
 
         clear_directory(self.settings.minimization_path)
 
-        runner = PELERunner(self.settings.serial_pele,
-                            number_of_processors=1)
+        runner = self._getPELERunner()
 
         copyFile(self.settings.initial_template,
                  pele_co.HETEROATOMS_TEMPLATE_PATH)
@@ -106,23 +105,18 @@ class SolvationFreeEnergyCalculation(Command):
 
     def _calculateEnergy(self, runner):
         try:
-            output = runner.run(self.settings.minimization_path +
+            result = runner.run(self.settings.minimization_path +
                                 co.MINIMIZATION_CF_NAME)
 
-        except SystemExit as exception:
+        except PELEError as exception:
             print("SolvationFreeEnergyCalculation error: \n" + str(exception))
             sys.exit(1)
 
-        for line in output.split('\n'):
-            if line.startswith(pele_co.ENERGY_RESULT_LINE):
-                energy = float(line.strip().split()[-1])
-                break
-            elif line.startswith(pele_co.ENERGY_RESULT_LINE_IN_VACUUM):
-                energy = float(line.strip().split()[-1])
-                break
-        else:
+        # Either the solvated or the vacuum energy, whichever comes first
+        if (result.energy is None):
             print("SolvationFreeEnergyCalculation Error: energy calculation " +
                   "failed")
-            print(output)
+            print(result.tail)
+            sys.exit(1)
 
-        return energy
+        return result.energy
@@ -13,10 +13,9 @@ from FEP_PELE.Utils.InOut import clear_directory
 
 from FEP_PELE.TemplateHandler import Lambda
 
-from FEP_PELE.PELETools.PELERunner import PELERunner
 from FEP_PELE.PELETools.ControlFileCreator import \
     ControlFileFromTemplateCreator
-from FEP_PELE.PELETools import PELEConstants as pele_co
+from FEP_PELE.PELETools.PELEResult import PELEError
 
 
 # Script information
@@ -72,8 +71,7 @@ class UnbounddECalculation(Command):
               "{:.2f} kcal/mol".format(final_energy - initial_energy))
 
     def _run(self, lambda_):
-        runner = PELERunner(self.settings.serial_pele,
-                            number_of_processors=1)
+        runner = self._getPELERunner()
 
         self._createAlchemicalTemplate(lambda_, None)
 
@@ -86,20 +84,20 @@ class UnbounddECalculation(Command):
         self._writeMinimizationControlFile(lambda_, self.path)
 
         try:
-            output = runner.run(self.settings.minimization_path +
+            result = runner.run(self.settings.minimization_path +
                                 co.MINIMIZATION_CF_NAME)
-        except SystemExit as exception:
+        except PELEError as exception:
             print("UnboundLambdasSimulation error: \n" + str(exception))
             sys.exit(1)
 
-        for line in output.split('\n'):
-            if line.startswith(pele_co.ENERGY_RESULT_LINE):
-                energy = float(line.strip().split()[-1])
-                break
-        else:
+        energies = result.getEnergies()
+
+        if (len(energies) == 0):
             print("Error: energy calculation failed")
+            print(result.tail)
+            sys.exit(1)
 
-        return energy
+        return energies[0]
 
     def _writeMinimizationControlFile(self, lambda_, out_path):
         cf_creator = ControlFileFromTemplateCreator(
@@ -2,32 +2,48 @@
 
 
 # Python imports
-import sys
-from multiprocessing import Pool, current_process
-from functools import partial
+import time
+import random
 
 
 # FEP_PELE imports
 from FEP_PELE.FreeEnergy import Constants as co
 from FEP_PELE.FreeEnergy.Command import Command
+from FEP_PELE.FreeEnergy.Scheduler import Scheduler
+from FEP_PELE.FreeEnergy.Scheduler import getWorkerId
+from FEP_PELE.FreeEnergy.Scheduler import runInExecutor
+from FEP_PELE.FreeEnergy.CostModel import CostModel
+from FEP_PELE.FreeEnergy.EnergyCache import EnergyCache
+from FEP_PELE.FreeEnergy.EnergyMatrix import EnergyMatrix
+from FEP_PELE.FreeEnergy.EnergyMatrix import getLambdaKey
+from FEP_PELE.FreeEnergy.Analysis.Calculators import getDecorrelatedIndices
 
 from FEP_PELE.TemplateHandler import Lambda
 
 from FEP_PELE.PELETools import PELEConstants as pele_co
 from FEP_PELE.PELETools.SimulationParser import Simulation
-from FEP_PELE.PELETools.PELERunner import PELERunner
+from FEP_PELE.PELETools.PELEResult import PELEError
 from FEP_PELE.PELETools.ControlFileCreator import \
     ControlFileFromTemplateCreator
+from FEP_PELE.PELETools.ControlFileCreator import \
+    BatchedControlFileFromTemplateCreator
 
 from FEP_PELE.Utils.InOut import create_directory
 from FEP_PELE.Utils.InOut import clear_directory
+from FEP_PELE.Utils.InOut import remove_directory
 from FEP_PELE.Utils.InOut import write_energies_report
 from FEP_PELE.Utils.InOut import join_splitted_models
 from FEP_PELE.Utils.InOut import remove_splitted_models
 from FEP_PELE.Utils.InOut import writeLambdaTitle
+from FEP_PELE.Utils.InOut import writeLambdaStage
 from FEP_PELE.Utils.InOut import copyFile
+from FEP_PELE.Utils.InOut import getFileFromPath
+from FEP_PELE.Utils.InOut import getStructureHash
+from FEP_PELE.Utils.InOut import getFilesHash
 
 from FEP_PELE.Tools.PDBTools import PDBParser
+from FEP_PELE.Tools.LambdaFolder import getMultiplicities
+from FEP_PELE.Tools.Math import lagrangeInterpolation
 
 # Script information
 __author__ = "Marti Municoy"
@@ -50,19 +66,62 @@ class dECalculation(Command):
 
         clear_directory(self.path)
 
+        # The lambda runs only build the task graph, all the PELE work is
+        # then executed by a single scheduler
+        self._scheduler = Scheduler(
+            self.settings.number_of_processors,
+            CostModel(self.settings.general_path + co.TASK_COSTS_NAME),
+            engine=self.settings.execution_engine)
+
+        self._energyCache = EnergyCache(
+            self.settings.general_path + co.ENERGY_CACHE_NAME,
+            self.settings.energy_cache_size)
+        self.energyCache.resetStats()
+
+        self._energyMatrix = EnergyMatrix(
+            self.settings.general_path + co.ENERGY_MATRIX_NAME)
+
         if (self.settings.splitted_lambdas):
             self._run_with_splitted_lambdas()
         else:
             self._run(self.settings.lambdas)
 
+        self.scheduler.run()
+
+        self.energyCache.printStats()
+
+        clear_directory(self.path)
+
         self._finish()
 
+    @property
+    def scheduler(self):
+        return self._scheduler
+
+    @property
+    def energyCache(self):
+        return self._energyCache
+
+    @property
+    def energyMatrix(self):
+        return self._energyMatrix
+
+    def __getstate__(self):
+        # Tasks are sent to the workers together with this command, but
+        # the task graph itself is only needed by the main process
+        state = self.__dict__.copy()
+        state['_scheduler'] = None
+        return state
+
     def _run(self, lambdas, lambdas_type=Lambda.DUAL_LAMBDA, num=0,
              constant_lambda=None):
 
-        lambdas = self.lambdasBuilder.build(lambdas, lambdas_type)
+        lambdas = self.lambdasBuilder.build(lambdas, lambda_type=lambdas_type,
+                                            index=num)
         atoms_to_minimize = self._getAtomIdsToMinimize()
 
+        self._generateTemplateBank(lambdas, constant_lambda)
+
         for lambda_ in lambdas:
             if (self.checkPoint.check((self.name, str(num) +
                                        str(lambda_.type) +
@@ -71,39 +130,10 @@ class dECalculation(Command):
 
             writeLambdaTitle(lambda_)
 
-            clear_directory(self.path + co.MODELS_FOLDER)
-
-            print(" - Splitting PELE models")
             simulation = self._getSimulation(lambda_, num)
 
-            self._splitModels(simulation)
-
-            self._createAlchemicalTemplate(lambda_, constant_lambda)
-
-            self._calculateOriginalEnergies(simulation, lambda_, num)
-
-            clear_directory(self.path)
-
-            for shif_lambda in self.sampling_method.getShiftedLambdas(lambda_):
-                print(" - Applying delta lambda " +
-                      str(round(shif_lambda.value - lambda_.value, 5)))
-
-                self._createAlchemicalTemplate(shif_lambda, constant_lambda,
-                                               gap=' ')
-
-                general_path = self._getGeneralPath(lambda_, num, shif_lambda)
-                clear_directory(general_path)
-
-                self._minimize(simulation, lambdas_type, general_path,
-                               atoms_to_minimize, gap=' ')
-
-                self._dECalculation(simulation, lambda_, shif_lambda,
-                                    general_path, num, gap=' ')
-
-            self.checkPoint.save((self.name, str(num) + str(lambda_.type) +
-                                  str(lambda_.value)))
-
-            clear_directory(self.path)
+            self._addLambdaTasks(simulation, lambda_, num, constant_lambda,
+                                 atoms_to_minimize, lambdas)
 
         return []
 
@@ -121,113 +151,781 @@ class dECalculation(Command):
 
         return simulation
 
-    def _splitModels(self, simulation):
-        with Pool(self.settings.number_of_processors) as pool:
-            pool.map(self._parallelTrajectoryWriterLoop,
-                     simulation.iterateOverReports)
+    def _addLambdaTasks(self, simulation, lambda_, num, constant_lambda,
+                        atoms_to_minimize, lambdas):
+        reports = list(simulation.iterateOverReports)
+        models_path = self._getModelsPath(lambda_, num)
+        clear_directory(models_path)
 
-    def _calculateOriginalEnergies(self, simulation, lambda_, num, gap=''):
-        print("{} - Calculating original energies".format(gap))
+        # Only the cells that are missing in the energy matrix are
+        # calculated, the rest of them come from previous runs
+        window = self._getEnergyMatrixWindow(lambda_.type, num)
+        self._updateEnergyMatrix(window, lambda_, constant_lambda, reports)
 
-        path = self.path
-        if (lambda_.type != Lambda.DUAL_LAMBDA):
-            path += str(num) + '_' + lambda_.type + "/"
-        path += lambda_.folder_name + '/'
+        state_lambdas = self._getStateLambdas(lambda_, lambdas)
 
-        clear_directory(path)
+        if (self._coulombicReconstructionIsEnabled(lambda_)):
+            evaluated_lambdas = co.COULOMBIC_ANCHOR_LAMBDAS
+        else:
+            evaluated_lambdas = [lambda_.value, ] + \
+                [shif_lambda.value for shif_lambda in
+                 self.sampling_method.getShiftedLambdas(lambda_)] + \
+                [state_lambda.value for state_lambda in state_lambdas]
+
+        if (self.settings.decorrelate_models):
+            selected_models = self._getDecorrelatedModels(
+                reports, self._getSampledSteps(simulation.directories[0]))
+        else:
+            selected_models = None
 
-        originalEnergiesCalculator = partial(
-            self._parallelOriginalEnergiesCalculator, path)
+        locations, missing_models = self._getMissingModels(
+            window, lambda_, models_path, reports, evaluated_lambdas,
+            selected_models)
 
-        with Pool(self.settings.number_of_processors) as pool:
-            pool.map(originalEnergiesCalculator,
-                     simulation.iterateOverReports)
+        split_stage = self._addStageTask(
+            (" - Splitting PELE models", ), lambda_)
 
-    def _minimize(self, simulation, lambdas_type, general_path,
-                  atoms_to_minimize, gap=''):
-        if ((self.settings.reminimize) and
-            ((lambdas_type == Lambda.DUAL_LAMBDA) or
-             (lambdas_type == Lambda.STERIC_LAMBDA))):
-            print("{} - Minimizing distances".format(gap))
+        missing_names = set(model_name
+                            for model_names in missing_models.values()
+                            for model_name in model_names)
 
-            parallelLoop = partial(self._parallelPELEMinimizerLoop,
-                                   general_path, atoms_to_minimize)
+        split_tasks = []
+        model_names = []
+        for report in reports:
+            report_names = self._getModelNames(models_path, report)
 
-            with Pool(self.settings.number_of_processors) as pool:
-                pool.map(parallelLoop, simulation.iterateOverReports)
+            if (missing_names.isdisjoint(report_names)):
+                continue
 
+            split_tasks.append(self.scheduler.addTask(
+                self._parallelTrajectoryWriterLoop, (models_path, report),
+                dependencies=[split_stage, ]))
+            model_names += [model_name for model_name in report_names
+                            if model_name in missing_names]
+
+        # Identical models, like the minimized structure that all the
+        # trajectories start from, are only evaluated once
+        duplicates_task = self.scheduler.addTask(
+            self._findDuplicatedModels, (model_names, ),
+            dependencies=[split_stage, ] + split_tasks)
+
+        if (self._coulombicReconstructionIsEnabled(lambda_)):
+            lambda_tasks = self._addCoulombicReconstructionTasks(
+                lambda_, num, constant_lambda, window, reports, locations,
+                missing_models, selected_models, duplicates_task,
+                state_lambdas)
         else:
-            for report in simulation.iterateOverReports:
-                for model_id in range(0, report.trajectory.models.number):
-                    file_name = str(model_id) + '-' + report.trajectory.name
-                    original_pdb = self.path + co.MODELS_FOLDER + file_name
-                    copyFile(original_pdb, general_path)
+            lambda_tasks = self._addExplicitEnergiesTasks(
+                lambda_, num, constant_lambda, atoms_to_minimize, window,
+                reports, locations, missing_models, selected_models,
+                duplicates_task)
+            lambda_tasks += self._addStateEnergiesTasks(
+                lambda_, num, constant_lambda, window, locations,
+                missing_models, duplicates_task, state_lambdas)
+
+        self.scheduler.addTask(self._finishLambda,
+                               (lambda_, num, models_path),
+                               dependencies=lambda_tasks, local=True)
+
+    def _addExplicitEnergiesTasks(self, lambda_, num, constant_lambda,
+                                  atoms_to_minimize, window, reports,
+                                  locations, missing_models, selected_models,
+                                  duplicates_task):
+        # Work is distributed by chunks of models, so parallelism scales
+        # with the number of models instead of the number of reports.
+        # Results are gathered back by report afterwards
+        original_stage = self._addStageTask(
+            (" - Calculating original energies", ), lambda_,
+            dependencies=[duplicates_task, ])
+
+        workspace = self._getWorkspace(lambda_, constant_lambda)
+        path = self._getGeneralPath(lambda_, num)
+        clear_directory(path)
 
-    def _dECalculation(self, simulation, lambda_, shif_lambda, general_path,
-                       num, gap=''):
-        print("{} - Calculating energetic differences".format(gap))
+        cost_key = self.scheduler.cost_model.getKey(self.name, lambda_.type,
+                                                    "original")
 
-        parallelLoop = partial(self._parallelPELERecalculatorLoop,
-                               lambda_, shif_lambda, general_path, num)
+        model_names = missing_models[getLambdaKey(lambda_.value)]
 
-        with Pool(self.settings.number_of_processors) as pool:
-            pool.map(parallelLoop, simulation.iterateOverReports)
+        # Energies written by PELE during the sampling are only reused if
+        # a few of them are reproduced by fresh single points
+        if ((self.settings.reuse_sampling_energies) and
+                (len(model_names) > 0)):
+            sampling_energies_task = self.scheduler.addTask(
+                self._checkSamplingEnergies,
+                (path, reports, locations, model_names, workspace.path,
+                 duplicates_task), dependencies=[original_stage, ],
+                cost_key=cost_key, size=co.SAMPLING_ENERGIES_CHECK_SIZE)
+        else:
+            sampling_energies_task = False
+
+        chunk_tasks = []
+        for chunk in self._getModelChunks(model_names):
+            chunk_tasks.append(self.scheduler.addTask(
+                self._parallelOriginalEnergiesCalculator,
+                (path, chunk, workspace.path, duplicates_task,
+                 sampling_energies_task), dependencies=[original_stage, ],
+                cost_key=cost_key, size=len(chunk)))
+
+        lambda_tasks = [self.scheduler.addTask(
+            self._writeOriginalEnergiesReports,
+            (window, lambda_.value, path, reports, locations, model_names,
+             selected_models, duplicates_task, sampling_energies_task) +
+            tuple(chunk_tasks)), ]
+
+        # Reminimized windows are much more expensive than single points
+        if (self._reminimizationIsRequired(lambda_)):
+            cost_key = self.scheduler.cost_model.getKey(
+                self.name, lambda_.type, "shifted", "reminimized")
+        else:
+            cost_key = self.scheduler.cost_model.getKey(
+                self.name, lambda_.type, "shifted")
+
+        for shif_lambda in self.sampling_method.getShiftedLambdas(lambda_):
+            messages = [" - Applying delta lambda " +
+                        str(round(shif_lambda.value - lambda_.value, 5)), ]
+            if (self._reminimizationIsRequired(lambda_)):
+                messages.append(" - Minimizing distances")
+            messages.append(" - Calculating energetic differences")
+
+            shifted_stage = self._addStageTask(
+                messages, lambda_, dependencies=[duplicates_task, ])
+
+            workspace = self._getWorkspace(shif_lambda, constant_lambda)
+            general_path = self._getGeneralPath(lambda_, num, shif_lambda)
+            clear_directory(general_path)
+
+            model_names = missing_models[getLambdaKey(shif_lambda.value)]
+
+            chunk_tasks = []
+            for chunk in self._getModelChunks(model_names):
+                chunk_tasks.append(self.scheduler.addTask(
+                    self._parallelShiftedLambdaLoop,
+                    (lambda_, general_path, chunk, atoms_to_minimize,
+                     workspace.path, duplicates_task),
+                    dependencies=[shifted_stage, ],
+                    cost_key=cost_key, size=len(chunk)))
+
+            lambda_tasks.append(self.scheduler.addTask(
+                self._writeShiftedEnergiesReports,
+                (window, lambda_.value, shif_lambda.value, general_path,
+                 reports, locations, model_names, selected_models,
+                 duplicates_task) + tuple(chunk_tasks)))
+
+        return lambda_tasks
+
+    def _addStateEnergiesTasks(self, lambda_, num, constant_lambda, window,
+                               locations, missing_models, duplicates_task,
+                               state_lambdas):
+        # Single points of the sampled models at the rest of sampled
+        # lambdas, which are only stored in the energy matrix
+        if (len(state_lambdas) == 0):
+            return []
+
+        state_stage = self._addStageTask(
+            (" - Calculating energies at sampled lambdas", ), lambda_,
+            dependencies=[duplicates_task, ])
+
+        path = self._getGeneralPath(lambda_, num)
+
+        cost_key = self.scheduler.cost_model.getKey(self.name, lambda_.type,
+                                                    "original")
+
+        state_tasks = []
+        for state_lambda in state_lambdas:
+            workspace = self._getWorkspace(state_lambda, constant_lambda)
+
+            model_names = missing_models[getLambdaKey(state_lambda.value)]
+
+            chunk_tasks = []
+            for chunk in self._getModelChunks(model_names):
+                chunk_tasks.append(self.scheduler.addTask(
+                    self._parallelOriginalEnergiesCalculator,
+                    (path, chunk, workspace.path, duplicates_task),
+                    dependencies=[state_stage, ],
+                    cost_key=cost_key, size=len(chunk)))
+
+            state_tasks.append(self.scheduler.addTask(
+                self._storeStateEnergies,
+                (window, lambda_.value, state_lambda.value, locations,
+                 model_names, duplicates_task) + tuple(chunk_tasks)))
+
+        return state_tasks
+
+    def _addCoulombicReconstructionTasks(self, lambda_, num, constant_lambda,
+                                         window, reports, locations,
+                                         missing_models, selected_models,
+                                         duplicates_task, state_lambdas):
+        # Only charges change along Coulombic lambdas, so the energy of each
+        # model is a quadratic polynomial of lambda, which is fully defined
+        # by its energies at three anchor lambdas
+        anchor_stage = self._addStageTask(
+            (" - Calculating energies at anchor lambdas", ), lambda_,
+            dependencies=[duplicates_task, ])
+
+        path = self._getGeneralPath(lambda_, num)
+        clear_directory(path)
 
-    def _parallelTrajectoryWriterLoop(self, report_file):
+        cost_key = self.scheduler.cost_model.getKey(self.name, lambda_.type,
+                                                    "anchor")
+
+        anchor_tasks = []
+        anchor_names = []
+        for anchor_lambda in self.lambdasBuilder.build(
+                co.COULOMBIC_ANCHOR_LAMBDAS, lambda_type=lambda_.type,
+                index=num):
+            workspace = self._getWorkspace(anchor_lambda, constant_lambda)
+
+            model_names = missing_models[getLambdaKey(anchor_lambda.value)]
+            anchor_names.append(model_names)
+
+            chunk_tasks = []
+            for chunk in self._getModelChunks(model_names):
+                chunk_tasks.append(self.scheduler.addTask(
+                    self._parallelOriginalEnergiesCalculator,
+                    (path, chunk, workspace.path, duplicates_task),
+                    dependencies=[anchor_stage, ],
+                    cost_key=cost_key, size=len(chunk)))
+
+            anchor_tasks.append(self.scheduler.addTask(
+                self._mergeEnergies, tuple(chunk_tasks)))
+
+        shifted_paths = []
+        messages = []
+        for shif_lambda in self.sampling_method.getShiftedLambdas(lambda_):
+            messages.append(" - Applying delta lambda " +
+                            str(round(shif_lambda.value - lambda_.value, 5)))
+
+            general_path = self._getGeneralPath(lambda_, num, shif_lambda)
+            clear_directory(general_path)
+
+            shifted_paths.append((shif_lambda.value, general_path))
+
+        shifted_stage = self._addStageTask(messages, lambda_,
+                                           dependencies=anchor_tasks)
+
+        return [self.scheduler.addTask(
+            self._writeReconstructedEnergiesReports,
+            (window, lambda_.value, path, shifted_paths,
+             [state_lambda.value for state_lambda in state_lambdas], reports,
+             locations, anchor_names, selected_models, duplicates_task) +
+            tuple(anchor_tasks), dependencies=[shifted_stage, ]), ]
+
+    def _addStageTask(self, messages, lambda_, dependencies=None):
+        # Stages are announced by the main process once they are ready to
+        # start, as lambdas are not run one after the other anymore
+        return self.scheduler.addTask(
+            writeLambdaStage, (messages, lambda_), dependencies=dependencies,
+            local=True)
+
+    def _getStateLambdas(self, lambda_, lambdas):
+        # MBAR needs the energies of every model at every sampled lambda.
+        # Shifted lambdas that match a sampled one are already evaluated
+        if (self.settings.estimator != co.ESTIMATORS_DICT["MBAR"]):
+            return []
+
+        evaluated_keys = [getLambdaKey(lambda_.value), ] + \
+            [getLambdaKey(shif_lambda.value) for shif_lambda in
+             self.sampling_method.getShiftedLambdas(lambda_)]
+
+        return [state_lambda for state_lambda in lambdas
+                if getLambdaKey(state_lambda.value) not in evaluated_keys]
+
+    def _getModelNames(self, models_path, report_file):
+        model_names = []
         for model_id in range(0, report_file.trajectory.models.number):
+            model_names.append(models_path + str(model_id) + '-' +
+                               report_file.trajectory.name)
+
+        return model_names
+
+    def _getDecorrelatedModels(self, reports, sampled_steps):
+        # Consecutive models are strongly correlated, so only a decorrelated
+        # subset of each equilibrated trajectory is recalculated. The steps
+        # between the models that are kept become their weights
+        selected_models = {}
+        number_of_models = 0
+
+        for report in reports:
+            steps = report.getMetric(pele_co.REPORT_STEPS_COLUMN)
+
+            selected_models[report.name] = set(getDecorrelatedIndices(
+                self._getSamplingEnergies(report),
+                getMultiplicities(steps, sampled_steps)
+            ).tolist())
+
+            number_of_models += len(steps)
+
+        print(" - Decorrelating models: " +
+              "{} ".format(sum(len(model_ids) for model_ids in
+                               selected_models.values())) +
+              "out of {} models are kept".format(number_of_models))
+
+        return selected_models
+
+    def _updateEnergyMatrix(self, window, lambda_, constant_lambda, reports):
+        # Everything that the energies of a whole window type depend on
+        paths = [self.settings.initial_template, self.settings.final_template,
+                 self.settings.sp_control_file]
+        if (self._reminimizationIsRequired(lambda_)):
+            paths.append(self.settings.pp_control_file)
+
+        if (constant_lambda is not None):
+            constant_lambda = (constant_lambda.type, constant_lambda.value)
+
+        self.energyMatrix.setContext(window, getFilesHash(
+            paths, (self.settings.solvent_type, self.settings.atom_links,
+                    self.settings.coulombic_reconstruction,
+                    constant_lambda)))
+
+        for report in reports:
+            self.energyMatrix.setFingerprint(
+                window, lambda_.value, report.name,
+                getFilesHash((report.path + '/' + report.name, )))
+
+    def _getMissingModels(self, window, lambda_, models_path, reports,
+                          evaluated_lambdas, selected_models=None):
+        # Models are located in the energy matrix by their report and index
+        locations = {}
+        missing_models = {}
+
+        for evaluated_lambda in evaluated_lambdas:
+            missing_models[getLambdaKey(evaluated_lambda)] = []
+
+        for report in reports:
+            model_names = self._getModelNames(models_path, report)
+
+            for model_id, model_name in enumerate(model_names):
+                locations[model_name] = (report.name, model_id)
+
+            for evaluated_lambda in evaluated_lambdas:
+                missing_models[getLambdaKey(evaluated_lambda)] += [
+                    model_names[model_id] for model_id in
+                    self.energyMatrix.getMissingModels(
+                        window, lambda_.value, evaluated_lambda, report.name,
+                        len(model_names))
+                    if ((selected_models is None) or
+                        (model_id in selected_models[report.name]))]
+
+        return locations, missing_models
+
+    def _storeCells(self, window, sampled_lambda, evaluated_lambda,
+                    locations, model_names, results, duplicates=None):
+        if (duplicates is None):
+            duplicates = {}
+
+        # Duplicated models whose representative was not calculated in this
+        # run take its cell from the energy matrix
+        cells_by_report = {}
+
+        for model_name in model_names:
+            representative = duplicates.get(model_name, model_name)
+
+            if (representative in results):
+                cell = results[representative]
+            else:
+                cell = self.energyMatrix.getCell(
+                    window, sampled_lambda, evaluated_lambda,
+                    *locations[representative])
+
+            report_name, model_id = locations[model_name]
+            cells_by_report.setdefault(report_name, []).append(
+                (model_id, ) + tuple(cell))
+
+        for report_name, cells in cells_by_report.items():
+            model_ids, energies, rmsds = zip(*cells)
+            self.energyMatrix.addCells(window, sampled_lambda,
+                                       evaluated_lambda, report_name,
+                                       model_ids, energies, rmsds)
+
+    def _writeReportsFromMatrix(self, window, sampled_lambda,
+                                evaluated_lambda, path, reports,
+                                selected_models=None, with_rmsds=False):
+        for report in reports:
+            cells = self.energyMatrix.getCellsByModel(
+                window, sampled_lambda, evaluated_lambda, report.name)
+
+            # Models without a cell, or that were not selected, are
+            # skipped by the report writer
+            if (selected_models is not None):
+                cells = dict((model_id, cell)
+                             for model_id, cell in cells.items()
+                             if model_id in selected_models[report.name])
+
+            energies = [None, ] * (max(cells, default=-1) + 1)
+            rmsds = [None, ] * len(energies)
+            for model_id, (energy, rmsd) in cells.items():
+                energies[model_id] = energy
+                rmsds[model_id] = rmsd
+
+            if (with_rmsds):
+                write_energies_report(path, report, energies, rmsds)
+            else:
+                write_energies_report(path, report, energies)
+
+    def _storeStructures(self, window, sampled_lambda, evaluated_lambda,
+                         locations, model_names, structure_paths,
+                         duplicates=None):
+        if (duplicates is None):
+            duplicates = {}
+
+        # Like their cells, duplicated models take the structure of their
+        # representative
+        structures_by_report = {}
+
+        for model_name in model_names:
+            representative = duplicates.get(model_name, model_name)
+
+            if (representative in structure_paths):
+                with open(structure_paths[representative], 'r') as pdb_file:
+                    structure = pdb_file.read()
+            else:
+                structure = self.energyMatrix.getStructure(
+                    window, sampled_lambda, evaluated_lambda,
+                    *locations[representative])
+
+            if (structure is None):
+                continue
 
-            model_name = self.path + co.MODELS_FOLDER + str(model_id) + \
-                '-' + report_file.trajectory.name
+            report_name, model_id = locations[model_name]
+            structures_by_report.setdefault(report_name, []).append(
+                (model_id, structure))
 
-            report_file.trajectory.writeModel(model_id, model_name)
+        for report_name, structures in structures_by_report.items():
+            model_ids, structures = zip(*structures)
+            self.energyMatrix.addStructures(window, sampled_lambda,
+                                            evaluated_lambda, report_name,
+                                            model_ids, structures)
 
-    def _parallelOriginalEnergiesCalculator(self, path, report_file):
-        pid = current_process().pid
+    def _writeTrajectoryFromMatrix(self, window, sampled_lambda,
+                                   evaluated_lambda, path, report,
+                                   selected_models=None):
+        trajectory_name = "*-" + report.trajectory.name
 
-        # Define new PELERunner
-        runner = PELERunner(self.settings.serial_pele,
-                            number_of_processors=1)
+        # Temporal files of this run are replaced by the structures of the
+        # matrix, so the trajectory has the same models than the report
+        remove_splitted_models(path, trajectory_name)
 
-        # Save original energies
-        energies = []
+        cells = self.energyMatrix.getCellsByModel(
+            window, sampled_lambda, evaluated_lambda, report.name)
+        structures = self.energyMatrix.getStructuresByModel(
+            window, sampled_lambda, evaluated_lambda, report.name)
 
-        for model_id in range(0, report_file.trajectory.models.number):
-            model_name = self.path + co.MODELS_FOLDER + str(model_id) + \
-                '-' + report_file.trajectory.name
+        model_ids = [model_id for model_id in structures
+                     if ((model_id in cells) and
+                         ((selected_models is None) or
+                          (model_id in selected_models[report.name])))]
 
-            logfile_name = path + co.LOGFILE_NAME.format(pid)
+        if (len(model_ids) == 0):
+            return
 
-            # Write recalculation control file
-            self._writeRecalculationControlFile(
-                self.settings.sp_control_file,
-                model_name,
-                self.path + co.SINGLE_POINT_CF_NAME.format(pid),
-                logfile_name=logfile_name)
+        for model_id in model_ids:
+            with open(path + str(model_id) + '-' + report.trajectory.name,
+                      'w') as pdb_file:
+                pdb_file.write(structures[model_id])
+
+        # Write trajectory and clean temporal files
+        join_splitted_models(path, trajectory_name)
+        remove_splitted_models(path, trajectory_name)
+
+    def _getModelChunks(self, model_names):
+        chunk_size = self.settings.sp_batch_size
+
+        return [model_names[i:i + chunk_size]
+                for i in range(0, len(model_names), chunk_size)]
+
+    def _findDuplicatedModels(self, model_names):
+        # Each duplicated model is linked to the first model with the same
+        # structure, which is the only one that is evaluated
+        representatives = {}
+        duplicates = {}
+
+        for model_name in model_names:
+            structure_hash = getStructureHash(model_name)
+
+            if (structure_hash in representatives):
+                duplicates[model_name] = representatives[structure_hash]
+            else:
+                representatives[structure_hash] = model_name
+
+        return duplicates
+
+    def _finishLambda(self, lambda_, num, models_path):
+        remove_directory(models_path)
+
+        self.checkPoint.save((self.name, str(num) + str(lambda_.type) +
+                              str(lambda_.value)))
+
+    def _coulombicReconstructionIsEnabled(self, lambda_):
+        return ((self.settings.coulombic_reconstruction) and
+                (lambda_.type == Lambda.COULOMBIC_LAMBDA))
+
+    def _reminimizationIsRequired(self, lambda_):
+        return ((self.settings.reminimize) and
+                ((lambda_.type == Lambda.DUAL_LAMBDA) or
+                 (lambda_.type == Lambda.STERIC_LAMBDA)))
+
+    def _parallelTrajectoryWriterLoop(self, models_path, report_file):
+        report_file.trajectory.splitModels(
+            self._getModelNames(models_path, report_file))
+
+    async def _parallelOriginalEnergiesCalculator(
+            self, path, model_names, cwd=None, duplicates=None,
+            use_sampling_energies=False):
+        if (use_sampling_energies):
+            return {}
+
+        if (duplicates is None):
+            duplicates = {}
+
+        pid = getWorkerId()
+
+        model_names = [model_name for model_name in model_names
+                       if model_name not in duplicates]
+
+        # Get PELERunner
+        runner = self._getPELERunner()
+
+        energies = await self._calculateEnergies(
+            runner, pid, model_names, path + co.LOGFILE_NAME.format(pid),
+            cwd=cwd)
+
+        return dict(zip(model_names, energies))
+
+    def _writeOriginalEnergiesReports(self, window, lambda_value, path,
+                                      reports, locations, model_names,
+                                      selected_models, duplicates,
+                                      use_sampling_energies, *chunk_energies):
+        results = {}
+
+        if (use_sampling_energies):
+            sampling_energies = {}
+            for report in reports:
+                sampling_energies[report.name] = \
+                    self._getSamplingEnergies(report)
+
+            for model_name in model_names:
+                report_name, model_id = locations[model_name]
+                results[model_name] = (
+                    sampling_energies[report_name][model_id], None)
+            duplicates = {}
+
+        else:
+            for energies_by_model in chunk_energies:
+                for model_name, energy in energies_by_model.items():
+                    results[model_name] = (energy, None)
 
-            # Run PELE and extract energy prediction
-            energies.append(self._getPELEEnergyPrediction(runner, pid))
+        self._storeCells(window, lambda_value, lambda_value, locations,
+                         model_names, results, duplicates)
 
-        write_energies_report(path, report_file, energies)
+        self._writeReportsFromMatrix(window, lambda_value, lambda_value,
+                                     path, reports, selected_models)
+
+    def _storeStateEnergies(self, window, lambda_value, state_value,
+                            locations, model_names, duplicates,
+                            *chunk_energies):
+        energies = self._mergeEnergies(*chunk_energies)
+
+        self._storeCells(window, lambda_value, state_value, locations,
+                         model_names,
+                         dict((model_name, (energy, None))
+                              for model_name, energy in energies.items()),
+                         duplicates)
+
+    def _mergeEnergies(self, *chunk_energies):
+        energies = {}
+        for energies_by_model in chunk_energies:
+            energies.update(energies_by_model)
+
+        return energies
+
+    def _writeReconstructedEnergiesReports(self, window, lambda_value, path,
+                                           shifted_paths, state_values,
+                                           reports, locations, anchor_names,
+                                           selected_models, duplicates,
+                                           *anchor_energies):
+        for anchor_value, model_names, energies in zip(
+                co.COULOMBIC_ANCHOR_LAMBDAS, anchor_names, anchor_energies):
+            self._storeCells(window, lambda_value, anchor_value, locations,
+                             model_names,
+                             dict((model_name, (energy, None))
+                                  for model_name, energy in energies.items()),
+                             duplicates)
+
+        split_names = set(model_name for model_names in anchor_names
+                          for model_name in model_names)
+
+        for report in reports:
+            anchor_cells = [self.energyMatrix.getCellsByModel(
+                window, lambda_value, anchor_value, report.name)
+                for anchor_value in co.COULOMBIC_ANCHOR_LAMBDAS]
+
+            # Only models with energies at all the anchors are
+            # reconstructed
+            model_ids = sorted(set.intersection(
+                *[set(cells) for cells in anchor_cells]))
+
+            if (len(model_ids) == 0):
+                continue
+
+            anchors = [[cells[model_id][0] for model_id in model_ids]
+                       for cells in anchor_cells]
+
+            self.energyMatrix.addCells(
+                window, lambda_value, lambda_value, report.name, model_ids,
+                lagrangeInterpolation(co.COULOMBIC_ANCHOR_LAMBDAS, anchors,
+                                      lambda_value).tolist())
+
+            self._writeReportsFromMatrix(window, lambda_value, lambda_value,
+                                         path, (report, ), selected_models)
+
+            for state_value in state_values:
+                self.energyMatrix.addCells(
+                    window, lambda_value, state_value, report.name,
+                    model_ids,
+                    lagrangeInterpolation(co.COULOMBIC_ANCHOR_LAMBDAS,
+                                          anchors, state_value).tolist())
+
+            # Structures do not change along Coulombic lambdas, and they
+            # are only available for the models that were splitted
+            model_names = [model_name for model_name in locations
+                           if ((model_name in split_names) and
+                               (locations[model_name][0] == report.name))]
+
+            for shifted_value, general_path in shifted_paths:
+                self.energyMatrix.addCells(
+                    window, lambda_value, shifted_value, report.name,
+                    model_ids,
+                    lagrangeInterpolation(co.COULOMBIC_ANCHOR_LAMBDAS,
+                                          anchors, shifted_value).tolist(),
+                    [0., ] * len(model_ids))
+
+                self._storeStructures(
+                    window, lambda_value, shifted_value, locations,
+                    model_names, dict((model_name, model_name)
+                                      for model_name in model_names))
+
+                self._writeReportsFromMatrix(window, lambda_value,
+                                             shifted_value, general_path,
+                                             (report, ), selected_models,
+                                             with_rmsds=True)
+                self._writeTrajectoryFromMatrix(window, lambda_value,
+                                                shifted_value, general_path,
+                                                report, selected_models)
+
+    def _getSamplingEnergies(self, report_file):
+        return report_file.getMetric(
+            pele_co.REPORT_TOTAL_ENERGY_COLUMN).tolist()
+
+    async def _checkSamplingEnergies(self, path, reports, locations,
+                                     model_names, cwd=None,
+                                     duplicates=None):
+        if (duplicates is None):
+            duplicates = {}
+
+        energies_by_report = {}
+        for report in reports:
+            energies_by_report[report.name] = await runInExecutor(
+                self._getSamplingEnergies, report)
+
+        sampling_energies = {}
+        for model_name in model_names:
+            report_name, model_id = locations[model_name]
+            sampling_energies[model_name] = \
+                energies_by_report[report_name][model_id]
+
+        model_names = [model_name for model_name in sampling_energies
+                       if model_name not in duplicates]
+        model_names = random.sample(
+            model_names, min(co.SAMPLING_ENERGIES_CHECK_SIZE,
+                             len(model_names)))
+
+        pid = getWorkerId()
+
+        # Get PELERunner
+        runner = self._getPELERunner()
+
+        energies = await self._calculateEnergies(
+            runner, pid, model_names, path + co.LOGFILE_NAME.format(pid),
+            cwd=cwd)
+
+        for model_name, energy in zip(model_names, energies):
+            if (abs(energy - sampling_energies[model_name]) >
+                    co.SAMPLING_ENERGIES_TOLERANCE):
+                print("  - Warning: sampling energy of " +
+                      "{} ({:.4f}) ".format(getFileFromPath(model_name),
+                                            sampling_energies[model_name]) +
+                      "does not match its single point energy " +
+                      "({:.4f}). Original energies ".format(energy) +
+                      "will be recalculated")
+                return False
+
+        return True
+
+    async def _parallelShiftedLambdaLoop(self, lambda_, general_path,
+                                         model_names, atoms_to_minimize,
+                                         cwd=None, duplicates=None):
+        if (duplicates is None):
+            duplicates = {}
 
-    def _parallelPELEMinimizerLoop(self, general_path, atoms_to_minimize,
-                                   report_file):
         create_directory(general_path)
 
-        pid = current_process().pid
+        model_names = [model_name for model_name in model_names
+                       if model_name not in duplicates]
 
-        for model_id, active in enumerate(report_file.models):
+        if (self._reminimizationIsRequired(lambda_)):
+            await self._parallelPELEMinimizerLoop(general_path, model_names,
+                                                  atoms_to_minimize, cwd=cwd)
+        else:
+            await runInExecutor(self._copyModels, model_names, general_path)
+
+        energies, rmsds = await self._parallelPELERecalculatorLoop(
+            general_path, model_names, cwd=cwd)
+
+        return dict(zip(model_names, zip(energies, rmsds)))
+
+    def _writeShiftedEnergiesReports(self, window, lambda_value,
+                                     shifted_value, general_path, reports,
+                                     locations, model_names, selected_models,
+                                     duplicates, *chunk_results):
+        results = {}
+        for results_by_model in chunk_results:
+            results.update(results_by_model)
+
+        self._storeCells(window, lambda_value, shifted_value, locations,
+                         model_names, results, duplicates)
+
+        # Shifted structures are kept in the energy matrix too, so
+        # trajectories also contain the models of previous runs
+        self._storeStructures(
+            window, lambda_value, shifted_value, locations, model_names,
+            dict((model_name, general_path + getFileFromPath(model_name))
+                 for model_name in results), duplicates)
+
+        for report in reports:
+            # Write trajectories and reports
+            self._writeReportsFromMatrix(window, lambda_value, shifted_value,
+                                         general_path, (report, ),
+                                         selected_models, with_rmsds=True)
+            self._writeTrajectoryFromMatrix(window, lambda_value,
+                                            shifted_value, general_path,
+                                            report, selected_models)
+
+    async def _parallelPELEMinimizerLoop(self, general_path, model_names,
+                                         atoms_to_minimize, cwd=None):
+        pid = getWorkerId()
+
+        # Get PELERunner
+        runner = self._getPELERunner()
+
+        for original_pdb in model_names:
             # Set initial variables
-            file_name = str(model_id) + '-' + report_file.trajectory.name
-            original_pdb = self.path + co.MODELS_FOLDER + file_name
             logfile_name = self.path + co.LOGFILE_NAME.format(pid)
-            minimized_pdb = general_path + file_name
-
-            # Define new PELERunner
-            runner = PELERunner(self.settings.serial_pele,
-                                number_of_processors=1)
+            minimized_pdb = general_path + getFileFromPath(original_pdb)
 
             # Write recalculation control file
-            self._writeRecalculationControlFile(
+            await runInExecutor(
+                self._writeRecalculationControlFile,
                 self.settings.pp_control_file,
                 original_pdb,
                 self.path + co.POST_PROCESSING_CF_NAME.format(pid),
@@ -235,68 +933,41 @@ class dECalculation(Command):
                 trajectory_name=minimized_pdb,
                 atoms_to_minimize=atoms_to_minimize)
 
-            runner.run(self.path + co.POST_PROCESSING_CF_NAME.format(pid))
-
-            self._applyMinimizedDistancesTo(original_pdb, minimized_pdb)
-
-    def _parallelPELERecalculatorLoop(self, lambda_, shifted_lambda,
-                                      general_path, num, report_file):
-        create_directory(general_path)
-
-        pid = current_process().pid
-        energies = []
-        rmsds = []
-
-        for model_id, active in enumerate(report_file.models):
-            # Set initial variables
-            file_name = str(model_id) + '-' + report_file.trajectory.name
-            original_pdb = self.path + co.MODELS_FOLDER + file_name
-            shifted_pdb = general_path + file_name
-            logfile_name = self.path + co.LOGFILE_NAME.format(pid)
+            await runner.runAsync(
+                self.path + co.POST_PROCESSING_CF_NAME.format(pid), cwd=cwd)
 
-            # Define new PELERunner
-            runner = PELERunner(self.settings.serial_pele,
-                                number_of_processors=1)
-
-            # In case bad model was previously removed
-            """
-            if (not active):
-                print("  - Warning: skipping bad model from path: " +
-                      "\'{}\'".format(shifted_pdb))
-                continue
-            """
+            await runInExecutor(self._applyMinimizedDistancesTo,
+                                original_pdb, minimized_pdb)
 
-            # Write recalculation control file
-            self._writeRecalculationControlFile(
-                self.settings.sp_control_file,
-                shifted_pdb,
-                self.path + co.SINGLE_POINT_CF_NAME.format(pid),
-                logfile_name=logfile_name)
+    async def _parallelPELERecalculatorLoop(self, general_path, model_names,
+                                            cwd=None):
+        pid = getWorkerId()
+        logfile_name = self.path + co.LOGFILE_NAME.format(pid)
 
-            # Run PELE and extract energy prediction
-            energies.append(self._getPELEEnergyPrediction(runner, pid))
+        # Get PELERunner
+        runner = self._getPELERunner()
 
-            # Calculate RMSD between original pdb and shifted one
-            rmsd = self._calculateRMSD(original_pdb, shifted_pdb)
-            rmsds.append(rmsd)
+        shifted_pdbs = [general_path + getFileFromPath(original_pdb)
+                        for original_pdb in model_names]
 
-        # Write trajectories and reports
-        write_energies_report(general_path, report_file, energies, rmsds)
-        join_splitted_models(general_path, "*-" + report_file.trajectory.name)
+        # Run PELE and extract energy predictions
+        energies = await self._calculateEnergies(runner, pid, shifted_pdbs,
+                                                 logfile_name, cwd=cwd)
 
-        # Clean temporal files
-        remove_splitted_models(general_path,
-                               "*-" + report_file.trajectory.name)
+        # Calculate RMSD between original pdbs and shifted ones
+        rmsds = await runInExecutor(self._calculateRMSDs, model_names,
+                                    shifted_pdbs)
 
-    def _getOriginalEnergies(self, path):
-        energies = []
+        return energies, rmsds
 
-        with open(path, 'r') as file:
-            file.readline()
-            for line in file:
-                energies.append(float(line.strip()))
+    def _copyModels(self, model_names, general_path):
+        for model_name in model_names:
+            copyFile(model_name, general_path)
 
-        return energies
+    def _calculateRMSDs(self, original_pdbs, shifted_pdbs):
+        return [self._calculateRMSD(original_pdb, shifted_pdb)
+                for original_pdb, shifted_pdb in zip(original_pdbs,
+                                                     shifted_pdbs)]
 
     def _writeRecalculationControlFile(self, template_path, pdb_name,
                                        output_path,
@@ -318,6 +989,126 @@ class dECalculation(Command):
 
             builder.write(output_path)
 
+    def _writeBatchedRecalculationControlFile(self, template_path, pdb_names,
+                                              output_path,
+                                              logfile_name=None):
+        builder = BatchedControlFileFromTemplateCreator(template_path)
+
+        builder.replaceFlag("SOLVENT_TYPE", self.settings.solvent_type)
+        if (logfile_name is not None):
+            builder.replaceFlag("LOG_PATH", logfile_name)
+
+        for pdb_name in pdb_names:
+            builder.addModel(pdb_name)
+
+        builder.write(output_path)
+
+    async def _calculateEnergies(self, runner, pid, pdb_names, logfile_name,
+                                 cwd=None):
+        # Structures already evaluated with the same template and control
+        # file are taken from the energy cache
+        keys, energies = await runInExecutor(self._getCachedEnergies,
+                                             pdb_names, cwd)
+
+        missing = [i for i, energy in enumerate(energies) if energy is None]
+
+        if (len(missing) > 0):
+            initial_time = time.time()
+
+            new_energies = await self._runEnergyCalculations(
+                runner, pid, [pdb_names[i] for i in missing], logfile_name,
+                cwd=cwd)
+
+            await runInExecutor(self.energyCache.addEnergies,
+                                [keys[i] for i in missing], new_energies,
+                                time.time() - initial_time)
+
+            for i, energy in zip(missing, new_energies):
+                energies[i] = energy
+
+        return energies
+
+    def _getCachedEnergies(self, pdb_names, cwd=None):
+        context = self._getEnergyCacheContext(cwd)
+        keys = [self.energyCache.getKey(context, pdb_name)
+                for pdb_name in pdb_names]
+
+        return keys, self.energyCache.getEnergies(keys)
+
+    def _getEnergyCacheContext(self, cwd=None):
+        if (cwd is None):
+            cwd = self.settings.general_path
+
+        template_path = cwd + pele_co.HETEROATOMS_TEMPLATE_PATH + \
+            self._getAlchemicalTemplateName()
+
+        return self.energyCache.getContext(
+            (template_path, self.settings.sp_control_file),
+            (self.settings.solvent_type, ))
+
+    async def _runEnergyCalculations(self, runner, pid, pdb_names,
+                                     logfile_name, cwd=None):
+        batch_size = self.settings.sp_batch_size
+        energies = []
+
+        for i in range(0, len(pdb_names), batch_size):
+            chunk = pdb_names[i:i + batch_size]
+
+            if (len(chunk) > 1):
+                batched_energies = await self._calculateBatchedEnergies(
+                    runner, pid, chunk, logfile_name, cwd=cwd)
+
+                if (batched_energies is not None):
+                    energies += batched_energies
+                    continue
+
+            for pdb_name in chunk:
+                # Write recalculation control file
+                await runInExecutor(
+                    self._writeRecalculationControlFile,
+                    self.settings.sp_control_file,
+                    pdb_name,
+                    self.path + co.SINGLE_POINT_CF_NAME.format(pid),
+                    logfile_name=logfile_name)
+
+                # Run PELE and extract energy prediction
+                energies.append(await self._getPELEEnergyPrediction(
+                    runner, pid, cwd=cwd))
+
+        return energies
+
+    async def _calculateBatchedEnergies(self, runner, pid, pdb_names,
+                                        logfile_name, cwd=None):
+        control_file = self.path + \
+            co.BATCHED_SINGLE_POINT_CF_NAME.format(pid)
+
+        try:
+            await runInExecutor(
+                self._writeBatchedRecalculationControlFile,
+                self.settings.sp_control_file, pdb_names, control_file,
+                logfile_name=logfile_name)
+        except NameError as exception:
+            print("  - Warning: " + str(exception) + ". Falling back to " +
+                  "one PELE call per model")
+            return None
+
+        # PELE failures are raised as PELEError and reported by the
+        # scheduler, so the workers are never killed
+        result = await runner.runAsync(control_file, cwd=cwd)
+
+        energies = result.getEnergies()
+
+        # Energies can only be mapped back to models when PELE reported
+        # exactly one energy per model
+        if (len(energies) != len(pdb_names)):
+            print("  - Warning: batched PELE run returned " +
+                  "{} energies for {} models. ".format(len(energies),
+                                                       len(pdb_names)) +
+                  "Falling back to one PELE call per model")
+            return None
+
+        return energies
+
     def _calculateRMSD(self, pdb_name, trajectory_name):
         linkId = self._getPerturbingLinkId()
 
@@ -338,18 +1129,21 @@ class dECalculation(Command):
 
         return general_path
 
-    def _getPELEEnergyPrediction(self, runner, pid):
-        try:
-            output = runner.run(self.path +
-                                co.SINGLE_POINT_CF_NAME.format(pid))
-        except SystemExit as exception:
-            print("dECalculation error: \n" + str(exception))
-            sys.exit(1)
-
-        for line in output.split('\n'):
-            if line.startswith(pele_co.ENERGY_RESULT_LINE):
-                return float(line.strip().split()[-1])
-
-        print("Error: energy calculation failed")
-        print(output)
-        sys.exit(1)
+    def _getModelsPath(self, lambda_, num):
+        models_path = self.path + co.MODELS_FOLDER
+        if (lambda_.type != Lambda.DUAL_LAMBDA):
+            models_path += str(num) + '_' + lambda_.type + "/"
+        models_path += lambda_.folder_name + "/"
+
+        return models_path
+
+    async def _getPELEEnergyPrediction(self, runner, pid, cwd=None):
+        result = await runner.runAsync(
+            self.path + co.SINGLE_POINT_CF_NAME.format(pid), cwd=cwd)
+
+        energies = result.getEnergies()
+
+        if (len(energies) == 0):
+            raise PELEError(result, "energy calculation failed")
+
+        return energies[0]
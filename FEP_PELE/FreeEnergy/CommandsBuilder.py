@@ -7,6 +7,8 @@ from .CommandTypes.LambdasSampling import LambdasSampling
 from .CommandTypes.dECalculation import dECalculation
 from .CommandTypes.SerialdECalculation import SerialdECalculation
 from .CommandTypes.ExponentialAveraging import ExponentialAveraging
+from .CommandTypes.LambdaScheduleOptimization import \
+    LambdaScheduleOptimization
 from .CommandTypes.UnbounddECalculation import UnbounddECalculation
 from .CommandTypes.SolvationFreeEnergyCalculation \
     import SolvationFreeEnergyCalculation
@@ -42,6 +44,9 @@ class CommandsBuilder(object):
             return SerialdECalculation(self.settings)
         elif (command_name == COMMAND_NAMES_DICT["EXPONENTIAL_AVERAGING"]):
             return ExponentialAveraging(self.settings)
+        elif (command_name == COMMAND_NAMES_DICT[
+                "LAMBDA_SCHEDULE_OPTIMIZATION"]):
+            return LambdaScheduleOptimization(self.settings)
         if (command_name == COMMAND_NAMES_DICT["UNBOUND_DE_CALCULATION"]):
             return UnbounddECalculation(self.settings)
         elif (command_name == COMMAND_NAMES_DICT[
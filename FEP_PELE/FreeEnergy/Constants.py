@@ -51,7 +51,25 @@ INPUT_FILE_KEYS = [
     # Input PDBs
     "InputPDB",
     "InitialLigandPDB",
-    "FinalLigandPDB"]
+    "FinalLigandPDB",
+    # Performance settings
+    "SinglePointBatchSize",
+    "PELELauncher",
+    "ExecutionEngine",
+    "EnergyCacheSize",
+    "ReuseSamplingEnergies",
+    "CoulombicReconstruction",
+    "DecorrelateModels",
+    "SamplingUncertaintyTarget",
+    "ConvergenceCheckInterval",
+    "MinEffectiveSamples",
+    # Analysis settings
+    "Estimator",
+    "BootstrapSamples",
+    "BootstrapBlockSize",
+    # Lambda schedule settings
+    "LambdaSchedule",
+    "ScheduleTargetDeviation"]
 
 # Input file dict
 CONTROL_FILE_DICT = {
@@ -91,7 +109,25 @@ CONTROL_FILE_DICT = {
     # Input PDB path
     "INPUT_PDB": INPUT_FILE_KEYS[25],
     "INITIAL_LIGAND_PDB": INPUT_FILE_KEYS[26],
-    "FINAL_LIGAND_PDB": INPUT_FILE_KEYS[27]}
+    "FINAL_LIGAND_PDB": INPUT_FILE_KEYS[27],
+    # Performance settings
+    "SP_BATCH_SIZE": INPUT_FILE_KEYS[28],
+    "PELE_LAUNCHER": INPUT_FILE_KEYS[29],
+    "EXECUTION_ENGINE": INPUT_FILE_KEYS[30],
+    "ENERGY_CACHE_SIZE": INPUT_FILE_KEYS[31],
+    "REUSE_SAMPLING_ENERGIES": INPUT_FILE_KEYS[32],
+    "COULOMBIC_RECONSTRUCTION": INPUT_FILE_KEYS[33],
+    "DECORRELATE_MODELS": INPUT_FILE_KEYS[34],
+    "SAMPLING_UNCERTAINTY_TARGET": INPUT_FILE_KEYS[35],
+    "CONVERGENCE_CHECK_INTERVAL": INPUT_FILE_KEYS[36],
+    "MIN_EFFECTIVE_SAMPLES": INPUT_FILE_KEYS[37],
+    # Analysis settings
+    "ESTIMATOR": INPUT_FILE_KEYS[38],
+    "BOOTSTRAP_SAMPLES": INPUT_FILE_KEYS[39],
+    "BOOTSTRAP_BLOCK_SIZE": INPUT_FILE_KEYS[40],
+    # Lambda schedule settings
+    "LAMBDA_SCHEDULE": INPUT_FILE_KEYS[41],
+    "SCHEDULE_TARGET_DEVIATION": INPUT_FILE_KEYS[42]}
 
 # List of Command names
 COMMAND_NAMES_LIST = [
@@ -101,6 +137,7 @@ COMMAND_NAMES_LIST = [
     "SerialdECalculation",
     # Analysis commands
     "ExponentialAveraging",
+    "LambdaScheduleOptimization",
     # Unbound state-related commands
     "Unbound-dECalculation",
     # Others
@@ -114,10 +151,11 @@ COMMAND_NAMES_DICT = {
     "SERIAL_DE_CALCULATION": COMMAND_NAMES_LIST[2],
     # Analysis commands
     "EXPONENTIAL_AVERAGING": COMMAND_NAMES_LIST[3],
+    "LAMBDA_SCHEDULE_OPTIMIZATION": COMMAND_NAMES_LIST[4],
     # Unbound state-related commands
-    "UNBOUND_DE_CALCULATION": COMMAND_NAMES_LIST[4],
+    "UNBOUND_DE_CALCULATION": COMMAND_NAMES_LIST[5],
     # Others
-    "SOLVATION_FREE_ENERGY_CALCULATION": COMMAND_NAMES_LIST[5]}
+    "SOLVATION_FREE_ENERGY_CALCULATION": COMMAND_NAMES_LIST[6]}
 
 # Dictionary of Command labels
 COMMAND_LABELS_DICT = {
@@ -127,6 +165,7 @@ COMMAND_LABELS_DICT = {
     "SERIAL_DE_CALCULATION": "dE Calculation",
     # Analysis commands
     "EXPONENTIAL_AVERAGING": "Exponential Averaging",
+    "LAMBDA_SCHEDULE_OPTIMIZATION": "Lambda Schedule Optimization",
     # Unbound state-related commands
     "UNBOUND_DE_CALCULATION": "Unbound dE Calculation",
     # Others
@@ -150,6 +189,28 @@ SAMPLING_METHODS_NAMES = {
     "OVERLAP": "overlap sampling [0 --> M <-- 1]",
     "DOUBLE_ENDED": "double-ended sampling [0 <--> 1]"}
 
+# List of execution engines
+EXECUTION_ENGINES_LIST = [
+    "Processes",
+    "AsyncIO"]
+
+# Dictionary of execution engines names
+EXECUTION_ENGINES_DICT = {
+    "PROCESSES": EXECUTION_ENGINES_LIST[0],
+    "ASYNCIO": EXECUTION_ENGINES_LIST[1]}
+
+# List of free energy estimators
+ESTIMATORS_LIST = [
+    "Zwanzig",
+    "BAR",
+    "MBAR"]
+
+# Dictionary of free energy estimators names
+ESTIMATORS_DICT = {
+    "ZWANZIG": ESTIMATORS_LIST[0],
+    "BAR": ESTIMATORS_LIST[1],
+    "MBAR": ESTIMATORS_LIST[2]}
+
 # Default settings
 DEF_SERIAL_PELE = None
 DEF_MPI_PELE = None
@@ -179,20 +240,73 @@ DEF_SOLVENT_TYPE = pele_co.SGBNP_TYPE_NAME
 DEF_LAMBDA_SPLITTING = False
 DEF_RESTART = False
 DEF_REMINIMIZE = True
+DEF_SP_BATCH_SIZE = 1
+DEF_PELE_LAUNCHER = pele_co.AUTO_LAUNCHER
+DEF_EXECUTION_ENGINE = EXECUTION_ENGINES_DICT["PROCESSES"]
+DEF_ENERGY_CACHE_SIZE = 100000
+DEF_REUSE_SAMPLING_ENERGIES = False
+DEF_COULOMBIC_RECONSTRUCTION = False
+DEF_DECORRELATE_MODELS = False
+DEF_SAMPLING_UNCERTAINTY_TARGET = None
+DEF_CONVERGENCE_CHECK_INTERVAL = 60
+DEF_MIN_EFFECTIVE_SAMPLES = 50
+DEF_ESTIMATOR = ESTIMATORS_DICT["ZWANZIG"]
+DEF_BOOTSTRAP_SAMPLES = 0
+DEF_BOOTSTRAP_BLOCK_SIZE = None
+DEF_LAMBDA_SCHEDULE = None
+DEF_SCHEDULE_TARGET_DEVIATION = 0.6
+
+# Convergence of the iterative free energy estimators
+ESTIMATORS_TOLERANCE = 1e-10
+ESTIMATORS_MAX_ITERATIONS = 10000
+ESTIMATORS_BRACKET_MARGIN = 50.
+ESTIMATORS_SINGULAR_TOLERANCE = 1e-10
+
+# Bootstrap error estimation
+BOOTSTRAP_CONFIDENCE_LEVEL = 95.
+BOOTSTRAP_CHUNK_ELEMENTS = 1000000
+BOOTSTRAP_SEED = 1
+
+# Consistency check of the energies reused from the sampling
+SAMPLING_ENERGIES_CHECK_SIZE = 5
+SAMPLING_ENERGIES_TOLERANCE = 0.01
+
+# Candidate origins tried when detecting the equilibration of a trajectory
+EQUILIBRATION_ORIGINS = 50
+
+# Convergence monitoring of the sampling, whose reports are tailed
+SAMPLING_REPORTS_PATTERN = "report_*"
+SAMPLING_TRAJECTORIES_PREFIX = "trajectory_"
+
+# Optimization of lambda schedules from a pilot run
+SCHEDULE_MIN_WINDOWS = 2
+SCHEDULE_MIN_DENSITY_FRACTION = 0.05
+SCHEDULE_DECIMALS = 4
+
+# Coulombic lambdas where energies are calculated to reconstruct the rest
+COULOMBIC_ANCHOR_LAMBDAS = (0.0, 0.5, 1.0)
 
 # Folder names
 MODELS_FOLDER = "models/"
+TEMPLATE_BANK_FOLDER = "template_bank/"
+WORKSPACES_FOLDER = "workspaces/"
 
 # File names
 LOGFILE_NAME = "logfile_{}.txt"
 PDB_OUT_NAME = "pele_out_{}.pdb"
 SINGLE_POINT_CF_NAME = "pele_sp_{}.conf"
+BATCHED_SINGLE_POINT_CF_NAME = "pele_sp_batch_{}.conf"
 POST_PROCESSING_CF_NAME = "pele_recal_{}.conf"
 MINIMIZATION_CF_NAME = "pele_min.conf"
 SINGLE_LOGFILE_NAME = "logfile.txt"
 SINGLE_REPORT_NAME = "report.out"
 SINGLE_TRAJECTORY_NAME = "trajectory.pdb"
 CHECKPOINT_NAME = ".FEP_PELE.ckp"
+TASK_COSTS_NAME = ".task_costs.json"
+ENERGY_CACHE_NAME = ".energy_cache.db"
+ENERGY_MATRIX_NAME = ".energy_matrix.db"
+SAMPLED_STEPS_NAME = ".sampled_steps"
+LAMBDA_SCHEDULE_NAME = "lambda_schedule.txt"
 
 # Direction definitions
 DIRECTION_NAMES = ['BACKWARDS', 'FORWARD']
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+
+
+# Python imports
+import glob
+import numpy as np
+
+
+# FEP_PELE imports
+from FEP_PELE.FreeEnergy import Constants as co
+from FEP_PELE.FreeEnergy.Analysis.Calculators import \
+    calculateStatisticalInefficiency
+
+from FEP_PELE.PELETools import PELEConstants as pele_co
+
+from FEP_PELE.Tools.LambdaFolder import getMultiplicities
+
+
+# Script information
+__author__ = "Marti Municoy"
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Marti Municoy"
+__email__ = "marti.municoy@bsc.es"
+
+
+# Class definitions
+class ConvergenceMonitor(object):
+    # It tails the reports that PELE is writing in a sampling folder and
+    # tells whether the mean sampled energy is already known within the
+    # uncertainty target. Uncertainties from fewer than min_effective_samples
+    # uncorrelated samples are not trusted, so nothing converges before
+    def __init__(self, path, uncertainty_target,
+                 interval=co.DEF_CONVERGENCE_CHECK_INTERVAL,
+                 min_effective_samples=co.DEF_MIN_EFFECTIVE_SAMPLES):
+        self._path = path
+        self._uncertainty_target = uncertainty_target
+        self._interval = interval
+        self._min_effective_samples = min_effective_samples
+        self._offsets = {}
+        self._steps = {}
+        self._energies = {}
+        self._uncertainty = None
+        self._effective_samples = 0.
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def uncertainty_target(self):
+        return self._uncertainty_target
+
+    @property
+    def interval(self):
+        return self._interval
+
+    @property
+    def min_effective_samples(self):
+        return self._min_effective_samples
+
+    @property
+    def uncertainty(self):
+        return self._uncertainty
+
+    @property
+    def effective_samples(self):
+        return self._effective_samples
+
+    @property
+    def steps(self):
+        return max([0, ] + [steps[-1] for steps in self._steps.values()
+                            if len(steps) > 0])
+
+    def update(self):
+        # Only the complete lines written since the previous update are
+        # parsed
+        for report_path in glob.glob(self.path + co.SAMPLING_REPORTS_PATTERN):
+            offset = self._offsets.get(report_path, 0)
+
+            with open(report_path, 'r') as report_file:
+                report_file.seek(offset)
+                data = report_file.read()
+
+            data = data[:data.rfind('\n') + 1]
+            self._offsets[report_path] = offset + len(data)
+
+            steps = self._steps.setdefault(report_path, [])
+            energies = self._energies.setdefault(report_path, [])
+
+            for line in data.split('\n'):
+                fields = line.split()
+
+                if ((len(fields) < pele_co.REPORT_TOTAL_ENERGY_COLUMN) or
+                        (line.startswith('#'))):
+                    continue
+
+                steps.append(int(fields[pele_co.REPORT_STEPS_COLUMN - 1]))
+                energies.append(float(
+                    fields[pele_co.REPORT_TOTAL_ENERGY_COLUMN - 1]))
+
+    def calculateUncertainty(self):
+        # Standard error of the mean energy over all the trajectories, each
+        # one corrected by its own statistical inefficiency
+        sizes = []
+        variances = []
+        effective_samples = 0.
+
+        for report_path, energies in self._energies.items():
+            # The last model is still being sampled, so it is left out
+            series = np.repeat(energies, getMultiplicities(
+                self._steps[report_path]))
+
+            if (len(series) < 2):
+                continue
+
+            inefficiency = calculateStatisticalInefficiency(series)
+
+            sizes.append(len(series))
+            variances.append(np.var(series, ddof=1) * inefficiency /
+                             len(series))
+            effective_samples += len(series) / inefficiency
+
+        self._effective_samples = effective_samples
+
+        if (len(sizes) == 0):
+            self._uncertainty = None
+        else:
+            fractions = np.array(sizes, dtype=float) / np.sum(sizes)
+            self._uncertainty = float(np.sqrt(np.sum(fractions ** 2 *
+                                                     variances)))
+
+        return self._uncertainty
+
+    def isConverged(self):
+        self.update()
+        self.calculateUncertainty()
+
+        return ((self.uncertainty is not None) and
+                (self.effective_samples >= self.min_effective_samples) and
+                (self.uncertainty <= self.uncertainty_target))
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+
+# Python imports
+import os
+import json
+
+
+# FEP_PELE imports
+from FEP_PELE.Utils.InOut import isThereAFile
+
+
+# Script information
+__author__ = "Marti Municoy"
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Marti Municoy"
+__email__ = "marti.municoy@bsc.es"
+
+
+# Class definitions
+class CostModel(object):
+    def __init__(self, path):
+        self._path = path
+        self._timings = {}
+
+        if (isThereAFile(self.path)):
+            try:
+                with open(self.path) as timings_file:
+                    self._timings = json.load(timings_file)
+            except ValueError:
+                print("  - CostModel Warning: ignoring corrupted timings " +
+                      "file {}".format(self.path))
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def timings(self):
+        return self._timings
+
+    def getKey(self, *labels):
+        return ':'.join([str(label) for label in labels])
+
+    def getExpectedCost(self, key, size=1):
+        # Timings are stored per unit of size, like the number of models of
+        # a task, so they can be used for tasks of any size
+        if (key in self.timings):
+            total_time, total_size = self.timings[key]
+            return total_time / total_size * size
+
+        # Unknown tasks are assumed to cost as much as the average one
+        if (len(self.timings) > 0):
+            total_time = sum([t for t, s in self.timings.values()])
+            total_size = sum([s for t, s in self.timings.values()])
+            return total_time / total_size * size
+
+        return float(size)
+
+    def record(self, key, size, elapsed_time):
+        if (size <= 0):
+            return
+
+        total_time, total_size = self.timings.get(key, (0., 0))
+        self.timings[key] = (total_time + elapsed_time, total_size + size)
+
+    def save(self):
+        temporary_path = self.path + ".{}.tmp".format(os.getpid())
+
+        with open(temporary_path, 'w') as timings_file:
+            json.dump(self.timings, timings_file, indent=1, sort_keys=True)
+
+        os.replace(temporary_path, self.path)
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+
+
+# Python imports
+import os
+import time
+import sqlite3
+import threading
+
+
+# FEP_PELE imports
+from FEP_PELE.Utils.InOut import getStructureHash
+from FEP_PELE.Utils.InOut import getFilesHash
+
+
+# Script information
+__author__ = "Marti Municoy"
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Marti Municoy"
+__email__ = "marti.municoy@bsc.es"
+
+
+# Constant definitions
+STATS_KEYS = ("hits", "misses", "seconds_saved")
+
+
+# Connections can not be shared between processes, nor threads, so each
+# thread opens its own ones
+_CONNECTIONS = {}
+
+
+# Class definitions
+class EnergyCache(object):
+    def __init__(self, path, max_size):
+        self._path = path
+        self._max_size = max_size
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def max_size(self):
+        return self._max_size
+
+    @property
+    def connection(self):
+        key = (self.path, os.getpid(), threading.get_ident())
+
+        if (key not in _CONNECTIONS):
+            connection = sqlite3.connect(self.path, timeout=60)
+            connection.execute("CREATE TABLE IF NOT EXISTS energies " +
+                               "(key TEXT PRIMARY KEY, energy REAL, " +
+                               "elapsed_time REAL, last_used REAL)")
+            connection.execute("CREATE TABLE IF NOT EXISTS stats " +
+                               "(name TEXT PRIMARY KEY, value REAL)")
+            connection.commit()
+            _CONNECTIONS[key] = connection
+
+        return _CONNECTIONS[key]
+
+    def getContext(self, paths, labels=()):
+        # Everything, apart from the structure, that the energy depends on
+        return getFilesHash(paths, labels)
+
+    def getKey(self, context, pdb_path):
+        return getStructureHash(pdb_path, seed=context)
+
+    def getEnergies(self, keys):
+        energies = []
+        seconds_saved = 0.
+
+        with self.connection as connection:
+            for key in keys:
+                row = connection.execute(
+                    "SELECT energy, elapsed_time FROM energies WHERE key = ?",
+                    (key, )).fetchone()
+
+                if (row is None):
+                    energies.append(None)
+                    continue
+
+                energies.append(row[0])
+                seconds_saved += row[1]
+                connection.execute(
+                    "UPDATE energies SET last_used = ? WHERE key = ?",
+                    (time.time(), key))
+
+            hits = len([e for e in energies if e is not None])
+            self._addToStats(connection, (hits, len(keys) - hits,
+                                          seconds_saved))
+
+        return energies
+
+    def addEnergies(self, keys, energies, elapsed_time):
+        if (len(keys) == 0):
+            return
+
+        # The time of a run is shared by all the structures it evaluated
+        elapsed_time /= len(keys)
+
+        with self.connection as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO energies VALUES (?, ?, ?, ?)",
+                [(key, energy, elapsed_time, time.time())
+                 for key, energy in zip(keys, energies)])
+
+            # Least recently used energies are evicted first
+            connection.execute(
+                "DELETE FROM energies WHERE key IN (SELECT key FROM " +
+                "energies ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_size, ))
+
+    def resetStats(self):
+        with self.connection as connection:
+            connection.execute("DELETE FROM stats")
+
+    def getStats(self):
+        stats = dict.fromkeys(STATS_KEYS, 0)
+
+        for name, value in self.connection.execute(
+                "SELECT name, value FROM stats"):
+            stats[name] = value
+
+        return stats
+
+    def printStats(self):
+        stats = self.getStats()
+
+        print(" - Energy cache: {:.0f} hits, ".format(stats["hits"]) +
+              "{:.0f} misses, ".format(stats["misses"]) +
+              "{:.1f} seconds saved".format(stats["seconds_saved"]))
+
+    def _addToStats(self, connection, values):
+        for name, value in zip(STATS_KEYS, values):
+            connection.execute("INSERT OR IGNORE INTO stats VALUES (?, 0)",
+                               (name, ))
+            connection.execute("UPDATE stats SET value = value + ? " +
+                               "WHERE name = ?", (value, name))
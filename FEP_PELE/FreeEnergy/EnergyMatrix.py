@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+
+
+# Python imports
+import os
+import zlib
+import sqlite3
+import threading
+
+
+# Script information
+__author__ = "Marti Municoy"
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Marti Municoy"
+__email__ = "marti.municoy@bsc.es"
+
+
+# Connections can not be shared between processes, nor threads, so each
+# thread opens its own ones
+_CONNECTIONS = {}
+
+
+# Function definitions
+def getLambdaKey(value):
+    # Lambdas are identified like their folders, so floating point noise
+    # does not split cells
+    return str(round(float(value), 5))
+
+
+# Class definitions
+class EnergyMatrix(object):
+    # There is one matrix per window type, whose rows are (sampled lambda,
+    # report, model) and whose columns are evaluated lambdas
+    def __init__(self, path):
+        self._path = path
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def connection(self):
+        key = (self.path, os.getpid(), threading.get_ident())
+
+        if (key not in _CONNECTIONS):
+            connection = sqlite3.connect(self.path, timeout=60)
+            connection.execute("CREATE TABLE IF NOT EXISTS matrices " +
+                               "(window TEXT PRIMARY KEY, context TEXT)")
+            connection.execute("CREATE TABLE IF NOT EXISTS samples " +
+                               "(window TEXT, sampled TEXT, report TEXT, " +
+                               "fingerprint TEXT, " +
+                               "PRIMARY KEY (window, sampled, report))")
+            connection.execute("CREATE TABLE IF NOT EXISTS cells " +
+                               "(window TEXT, sampled TEXT, report TEXT, " +
+                               "model INTEGER, evaluated TEXT, energy REAL, " +
+                               "rmsd REAL, PRIMARY KEY (window, sampled, " +
+                               "report, model, evaluated))")
+            connection.execute("CREATE TABLE IF NOT EXISTS structures " +
+                               "(window TEXT, sampled TEXT, report TEXT, " +
+                               "model INTEGER, evaluated TEXT, " +
+                               "structure BLOB, PRIMARY KEY (window, " +
+                               "sampled, report, model, evaluated))")
+            connection.commit()
+            _CONNECTIONS[key] = connection
+
+        return _CONNECTIONS[key]
+
+    def setContext(self, window, context):
+        # Cells computed with other templates or control files are dropped
+        with self.connection as connection:
+            row = connection.execute(
+                "SELECT context FROM matrices WHERE window = ?",
+                (window, )).fetchone()
+
+            if ((row is not None) and (row[0] == context)):
+                return
+
+            connection.execute("DELETE FROM cells WHERE window = ?",
+                               (window, ))
+            connection.execute("DELETE FROM structures WHERE window = ?",
+                               (window, ))
+            connection.execute("DELETE FROM samples WHERE window = ?",
+                               (window, ))
+            connection.execute("INSERT OR REPLACE INTO matrices " +
+                               "VALUES (?, ?)", (window, context))
+
+    def setFingerprint(self, window, sampled, report, fingerprint):
+        # Cells of a report that was sampled again are dropped
+        sampled = getLambdaKey(sampled)
+
+        with self.connection as connection:
+            row = connection.execute(
+                "SELECT fingerprint FROM samples WHERE window = ? AND " +
+                "sampled = ? AND report = ?",
+                (window, sampled, report)).fetchone()
+
+            if ((row is not None) and (row[0] == fingerprint)):
+                return
+
+            connection.execute("DELETE FROM cells WHERE window = ? AND " +
+                               "sampled = ? AND report = ?",
+                               (window, sampled, report))
+            connection.execute("DELETE FROM structures WHERE window = ? " +
+                               "AND sampled = ? AND report = ?",
+                               (window, sampled, report))
+            connection.execute("INSERT OR REPLACE INTO samples " +
+                               "VALUES (?, ?, ?, ?)",
+                               (window, sampled, report, fingerprint))
+
+    def getMissingModels(self, window, sampled, evaluated, report,
+                         number_of_models):
+        stored = set(model for model, in self.connection.execute(
+            "SELECT model FROM cells WHERE window = ? AND sampled = ? AND " +
+            "report = ? AND evaluated = ?",
+            (window, getLambdaKey(sampled), report,
+             getLambdaKey(evaluated))))
+
+        return [model for model in range(0, number_of_models)
+                if model not in stored]
+
+    def getCell(self, window, sampled, evaluated, report, model):
+        return self.connection.execute(
+            "SELECT energy, rmsd FROM cells WHERE window = ? AND " +
+            "sampled = ? AND report = ? AND model = ? AND evaluated = ?",
+            (window, getLambdaKey(sampled), report, model,
+             getLambdaKey(evaluated))).fetchone()
+
+    def getCells(self, window, sampled, evaluated, report):
+        energies = []
+        rmsds = []
+
+        for energy, rmsd in self.connection.execute(
+                "SELECT energy, rmsd FROM cells WHERE window = ? AND " +
+                "sampled = ? AND report = ? AND evaluated = ? " +
+                "ORDER BY model",
+                (window, getLambdaKey(sampled), report,
+                 getLambdaKey(evaluated))):
+            energies.append(energy)
+            rmsds.append(rmsd)
+
+        return energies, rmsds
+
+    def getCellsByModel(self, window, sampled, evaluated, report):
+        cells = {}
+
+        for model, energy, rmsd in self.connection.execute(
+                "SELECT model, energy, rmsd FROM cells WHERE window = ? AND " +
+                "sampled = ? AND report = ? AND evaluated = ?",
+                (window, getLambdaKey(sampled), report,
+                 getLambdaKey(evaluated))):
+            cells[model] = (energy, rmsd)
+
+        return cells
+
+    def addCells(self, window, sampled, evaluated, report, models, energies,
+                 rmsds=None):
+        if (rmsds is None):
+            rmsds = [None, ] * len(models)
+
+        with self.connection as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO cells VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(window, getLambdaKey(sampled), report, model,
+                  getLambdaKey(evaluated), energy, rmsd)
+                 for model, energy, rmsd in zip(models, energies, rmsds)])
+
+    def getStructure(self, window, sampled, evaluated, report, model):
+        row = self.connection.execute(
+            "SELECT structure FROM structures WHERE window = ? AND " +
+            "sampled = ? AND report = ? AND model = ? AND evaluated = ?",
+            (window, getLambdaKey(sampled), report, model,
+             getLambdaKey(evaluated))).fetchone()
+
+        if (row is None):
+            return None
+
+        return zlib.decompress(row[0]).decode()
+
+    def getStructuresByModel(self, window, sampled, evaluated, report):
+        structures = {}
+
+        for model, structure in self.connection.execute(
+                "SELECT model, structure FROM structures WHERE window = ? " +
+                "AND sampled = ? AND report = ? AND evaluated = ?",
+                (window, getLambdaKey(sampled), report,
+                 getLambdaKey(evaluated))):
+            structures[model] = zlib.decompress(structure).decode()
+
+        return structures
+
+    def addStructures(self, window, sampled, evaluated, report, models,
+                      structures):
+        # Structures are compressed, since PDB files are highly redundant
+        with self.connection as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO structures VALUES (?, ?, ?, ?, ?, ?)",
+                [(window, getLambdaKey(sampled), report, model,
+                  getLambdaKey(evaluated), zlib.compress(structure.encode()))
+                 for model, structure in zip(models, structures)])
+
+    def getEvaluatedLambdas(self, window, sampled):
+        rows = self.connection.execute(
+            "SELECT DISTINCT evaluated FROM cells WHERE window = ? AND " +
+            "sampled = ?", (window, getLambdaKey(sampled)))
+
+        return sorted(float(evaluated) for evaluated, in rows)
+
+    def getSampledLambdas(self, window):
+        rows = self.connection.execute(
+            "SELECT DISTINCT sampled FROM cells WHERE window = ?", (window, ))
+
+        return sorted(float(sampled) for sampled, in rows)
+
+    def getReports(self, window, sampled):
+        rows = self.connection.execute(
+            "SELECT DISTINCT report FROM cells WHERE window = ? AND " +
+            "sampled = ?", (window, getLambdaKey(sampled)))
+
+        return sorted(report for report, in rows)
@@ -37,6 +37,9 @@ class InputFileParser(object):
                     continue
                 settings.set(key, value)
 
+        # Lambdas from a schedule override the ones from the input file
+        settings.loadLambdaSchedule()
+
         return settings
 
 
@@ -0,0 +1,372 @@
+# -*- coding: utf-8 -*-
+
+
+# Python imports
+import os
+import sys
+import time
+import heapq
+import asyncio
+import functools
+import itertools
+import contextvars
+from multiprocessing import Pool
+from queue import Queue
+from concurrent.futures import ThreadPoolExecutor
+
+
+# FEP_PELE imports
+from . import Constants as co
+
+
+# Script information
+__author__ = "Marti Municoy"
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Marti Municoy"
+__email__ = "marti.municoy@bsc.es"
+
+
+# Identifier of the worker that runs the current task
+_WORKER_ID = contextvars.ContextVar("worker_id", default=None)
+
+# Executor that takes the blocking work of the tasks in the event loop
+_EXECUTOR = contextvars.ContextVar("executor", default=None)
+
+
+# Class definitions
+class Task(object):
+    def __init__(self, function, args=(), dependencies=None, local=False,
+                 cost_key=None, size=1):
+        if (dependencies is None):
+            dependencies = []
+
+        self._function = function
+        self._args = tuple(args)
+        self._dependencies = list(dependencies)
+        for arg in self._args:
+            if (isinstance(arg, Task) and (arg not in self._dependencies)):
+                self._dependencies.append(arg)
+        self._local = local
+        self._cost_key = cost_key
+        self._size = size
+        self._dependents = []
+        self._unfinished_dependencies = 0
+        self._result = None
+        self._done = False
+
+        for dependency in self.dependencies:
+            dependency.addDependent(self)
+            if (not dependency.done):
+                self._unfinished_dependencies += 1
+
+    @property
+    def function(self):
+        return self._function
+
+    @property
+    def args(self):
+        return self._args
+
+    @property
+    def dependencies(self):
+        return self._dependencies
+
+    @property
+    def dependents(self):
+        return self._dependents
+
+    @property
+    def local(self):
+        return self._local
+
+    @property
+    def cost_key(self):
+        return self._cost_key
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def result(self):
+        return self._result
+
+    @property
+    def done(self):
+        return self._done
+
+    @property
+    def ready(self):
+        return self._unfinished_dependencies == 0
+
+    def addDependent(self, task):
+        self._dependents.append(task)
+
+    def dependencyFinished(self):
+        self._unfinished_dependencies -= 1
+
+    def setResult(self, result):
+        self._result = result
+        self._done = True
+
+    def getArguments(self):
+        # Tasks given as arguments are replaced by their results
+        return tuple([arg.result if isinstance(arg, Task) else arg
+                      for arg in self.args])
+
+
+class Scheduler(object):
+    def __init__(self, number_of_processors, cost_model=None,
+                 engine=co.DEF_EXECUTION_ENGINE):
+        self._number_of_processors = number_of_processors
+        self._cost_model = cost_model
+        self._engine = engine
+        self._tasks = []
+        self._counter = itertools.count()
+
+    @property
+    def number_of_processors(self):
+        return self._number_of_processors
+
+    @property
+    def cost_model(self):
+        return self._cost_model
+
+    @property
+    def engine(self):
+        return self._engine
+
+    @property
+    def tasks(self):
+        return self._tasks
+
+    def addTask(self, function, args=(), dependencies=None, local=False,
+                cost_key=None, size=1):
+        task = Task(function, args, dependencies, local, cost_key, size)
+        self._tasks.append(task)
+        return task
+
+    def run(self):
+        if (self.engine == co.EXECUTION_ENGINES_DICT["ASYNCIO"]):
+            asyncio.run(self._runWithEventLoop())
+        else:
+            self._runWithPool()
+
+        self._saveCostModel()
+
+        self._tasks = []
+
+    def _runWithPool(self):
+        # Tasks are submitted as soon as all their dependencies are done,
+        # so there are no barriers between the stages of the graph
+        ready_tasks = self._getReadyTasks()
+
+        finished_tasks = Queue()
+        remaining_tasks = len(self.tasks)
+        running_tasks = 0
+
+        with Pool(self.number_of_processors) as pool:
+            while (remaining_tasks > 0):
+                while (len(ready_tasks) > 0):
+                    task = heapq.heappop(ready_tasks)[-1]
+
+                    # Local tasks are light and need the state of the main
+                    # process, like checkpoint updates
+                    if (task.local):
+                        self._runLocalTask(task, ready_tasks)
+                        remaining_tasks -= 1
+                        continue
+
+                    pool.apply_async(
+                        runTask, (task.function, task.getArguments()),
+                        callback=collectResult(finished_tasks, task, True),
+                        error_callback=collectResult(finished_tasks, task,
+                                                     False))
+                    running_tasks += 1
+
+                if (remaining_tasks == 0):
+                    break
+
+                if (running_tasks == 0):
+                    self._abortUnsatisfiable()
+
+                task, success, result = finished_tasks.get()
+                running_tasks -= 1
+                remaining_tasks -= 1
+
+                if (not success):
+                    pool.terminate()
+                    self._abort(result)
+
+                self._finishTask(task, result, ready_tasks)
+
+    async def _runWithEventLoop(self):
+        # All tasks share this process, PELE runs are awaited as
+        # subprocesses and the rest of the work goes to a small thread pool.
+        # Every running task takes one of the slots, so there are never
+        # more tasks in flight than processors
+        ready_tasks = self._getReadyTasks()
+
+        remaining_tasks = len(self.tasks)
+        free_slots = list(range(self.number_of_processors))
+        running_tasks = set()
+
+        with ThreadPoolExecutor(self.number_of_processors) as executor:
+            while (remaining_tasks > 0):
+                while ((len(ready_tasks) > 0) and
+                       ((len(free_slots) > 0) or ready_tasks[0][-1].local)):
+                    task = heapq.heappop(ready_tasks)[-1]
+
+                    if (task.local):
+                        self._runLocalTask(task, ready_tasks)
+                        remaining_tasks -= 1
+                        continue
+
+                    running_tasks.add(asyncio.ensure_future(
+                        runTaskInEventLoop(task, free_slots.pop(), executor)))
+
+                if (remaining_tasks == 0):
+                    break
+
+                if (len(running_tasks) == 0):
+                    self._abortUnsatisfiable()
+
+                finished_tasks, running_tasks = await asyncio.wait(
+                    running_tasks, return_when=asyncio.FIRST_COMPLETED)
+
+                for finished_task in finished_tasks:
+                    task, slot, success, result = finished_task.result()
+                    free_slots.append(slot)
+                    remaining_tasks -= 1
+
+                    if (not success):
+                        for running_task in running_tasks:
+                            running_task.cancel()
+                        self._abort(result)
+
+                    self._finishTask(task, result, ready_tasks)
+
+    def _getReadyTasks(self):
+        ready_tasks = []
+        for task in self.tasks:
+            if (task.ready):
+                self._pushReadyTask(task, ready_tasks)
+
+        return ready_tasks
+
+    def _runLocalTask(self, task, ready_tasks):
+        task.setResult(task.function(*task.getArguments()))
+        self._releaseDependents(task, ready_tasks)
+
+    def _finishTask(self, task, result, ready_tasks):
+        result, elapsed_time = result
+
+        if ((self.cost_model is not None) and (task.cost_key is not None)):
+            self.cost_model.record(task.cost_key, task.size, elapsed_time)
+
+        task.setResult(result)
+        self._releaseDependents(task, ready_tasks)
+
+    def _abort(self, exception):
+        print("Scheduler error: a task failed with: {}".format(exception))
+        self._saveCostModel()
+        sys.exit(1)
+
+    def _abortUnsatisfiable(self):
+        print("Scheduler error: some tasks have dependencies that can " +
+              "never be satisfied")
+        sys.exit(1)
+
+    def _getPriority(self, task):
+        # Tasks without a cost are the light ones that unlock the rest of
+        # the graph, like splitting trajectories, so they go first
+        if ((self.cost_model is None) or (task.cost_key is None)):
+            return float('inf')
+
+        return self.cost_model.getExpectedCost(task.cost_key, task.size)
+
+    def _pushReadyTask(self, task, ready_tasks):
+        # Longest expected tasks first, ties keep the submission order
+        heapq.heappush(ready_tasks, (-self._getPriority(task),
+                                     next(self._counter), task))
+
+    def _releaseDependents(self, task, ready_tasks):
+        for dependent in task.dependents:
+            dependent.dependencyFinished()
+            if (dependent.ready):
+                self._pushReadyTask(dependent, ready_tasks)
+
+    def _saveCostModel(self):
+        if (self.cost_model is not None):
+            self.cost_model.save()
+
+
+def collectResult(queue, task, success):
+    def put(result):
+        queue.put((task, success, result))
+    return put
+
+
+def runTask(function, args):
+    # A SystemExit raised inside a worker would kill it silently and leave
+    # the pool waiting forever, so it is reported as a regular error
+    initial_time = time.time()
+
+    try:
+        if (asyncio.iscoroutinefunction(function)):
+            result = asyncio.run(function(*args))
+        else:
+            result = function(*args)
+    except SystemExit as exception:
+        raise RuntimeError("PELE task exited: " + str(exception))
+
+    return result, time.time() - initial_time
+
+
+async def runTaskInEventLoop(task, slot, executor):
+    # Tasks in the event loop share the process, so the slot is what tells
+    # their files apart
+    _WORKER_ID.set("{}-{}".format(os.getpid(), slot))
+    _EXECUTOR.set(executor)
+
+    initial_time = time.time()
+
+    try:
+        if (asyncio.iscoroutinefunction(task.function)):
+            result = await task.function(*task.getArguments())
+        else:
+            result = await asyncio.get_running_loop().run_in_executor(
+                executor, task.function, *task.getArguments())
+    except SystemExit as exception:
+        return task, slot, False, RuntimeError("PELE task exited: " +
+                                               str(exception))
+    except Exception as exception:
+        return task, slot, False, exception
+
+    return task, slot, True, (result, time.time() - initial_time)
+
+
+async def runInExecutor(function, *args, **kwargs):
+    # Coroutines share the event loop with the rest of tasks, so their
+    # structure parsing, hashing and file copies are sent to the executor
+    # to keep the other PELE runs going. Process workers run one task at a
+    # time, so there the work is simply done in place
+    executor = _EXECUTOR.get()
+
+    if (executor is None):
+        return function(*args, **kwargs)
+
+    context = contextvars.copy_context()
+
+    return await asyncio.get_running_loop().run_in_executor(
+        executor, functools.partial(context.run, function, *args, **kwargs))
+
+
+def getWorkerId():
+    worker_id = _WORKER_ID.get()
+
+    if (worker_id is None):
+        return os.getpid()
+
+    return worker_id
@@ -3,6 +3,7 @@
 
 # Python imports
 import os
+import shutil
 
 
 # FEP_Pele imports
@@ -34,15 +35,15 @@ class Settings(object):
         self.__mpi_pele = co.DEF_MPI_PELE
         self.__initial_template = co.DEF_INITIAL_TEMPLATE
         self.__final_template = co.DEF_FINAL_TEMPLATE
-        self.__atom_links = co.DEF_ATOM_LINKS
-        self.__lambdas = co.DEF_LAMBDAS
-        self.__lj_lambdas = co.DEF_LJ_LAMBDAS
-        self.__c_lambdas = co.DEF_C_LAMBDAS
+        self.__atom_links = list(co.DEF_ATOM_LINKS)
+        self.__lambdas = list(co.DEF_LAMBDAS)
+        self.__lj_lambdas = list(co.DEF_LJ_LAMBDAS)
+        self.__c_lambdas = list(co.DEF_C_LAMBDAS)
         self.__sampling_method = co.DEF_SAMPLING_METHOD
         self.__number_of_processors = co.DEF_NUMBER_OF_PROCESSORS
         self.__total_pele_steps = co.DEF_TOTAL_PELE_STEPS
         self.__parallel_PELE_runs = co.DEF_PARALLEL_PELE_RUNS
-        self.__commands = co.DEF_COMMANDS
+        self.__commands = list(co.DEF_COMMANDS)
         self.__min_control_file = co.DEF_MIN_CONTROL_FILE
         self.__sim_control_file = co.DEF_SIM_CONTROL_FILE
         self.__pp_control_file = co.DEF_PP_CONTROL_FILE
@@ -61,6 +62,22 @@ class Settings(object):
         self.__splitted_lambdas = co.DEF_LAMBDA_SPLITTING
         self.__reminimize = co.DEF_REMINIMIZE
         self.__restart = co.DEF_RESTART
+        self.__sp_batch_size = co.DEF_SP_BATCH_SIZE
+        self.__pele_launcher = co.DEF_PELE_LAUNCHER
+        self.__execution_engine = co.DEF_EXECUTION_ENGINE
+        self.__energy_cache_size = co.DEF_ENERGY_CACHE_SIZE
+        self.__reuse_sampling_energies = co.DEF_REUSE_SAMPLING_ENERGIES
+        self.__coulombic_reconstruction = co.DEF_COULOMBIC_RECONSTRUCTION
+        self.__decorrelate_models = co.DEF_DECORRELATE_MODELS
+        self.__sampling_uncertainty_target = \
+            co.DEF_SAMPLING_UNCERTAINTY_TARGET
+        self.__convergence_check_interval = co.DEF_CONVERGENCE_CHECK_INTERVAL
+        self.__min_effective_samples = co.DEF_MIN_EFFECTIVE_SAMPLES
+        self.__estimator = co.DEF_ESTIMATOR
+        self.__bootstrap_samples = co.DEF_BOOTSTRAP_SAMPLES
+        self.__bootstrap_block_size = co.DEF_BOOTSTRAP_BLOCK_SIZE
+        self.__lambda_schedule = co.DEF_LAMBDA_SCHEDULE
+        self.__schedule_target_deviation = co.DEF_SCHEDULE_TARGET_DEVIATION
 
         # Other
         self.__default_lambdas = True
@@ -189,6 +206,66 @@ class Settings(object):
     def reminimize(self):
         return self.__reminimize
 
+    @property
+    def sp_batch_size(self):
+        return self.__sp_batch_size
+
+    @property
+    def pele_launcher(self):
+        return self.__pele_launcher
+
+    @property
+    def execution_engine(self):
+        return self.__execution_engine
+
+    @property
+    def energy_cache_size(self):
+        return self.__energy_cache_size
+
+    @property
+    def reuse_sampling_energies(self):
+        return self.__reuse_sampling_energies
+
+    @property
+    def coulombic_reconstruction(self):
+        return self.__coulombic_reconstruction
+
+    @property
+    def decorrelate_models(self):
+        return self.__decorrelate_models
+
+    @property
+    def sampling_uncertainty_target(self):
+        return self.__sampling_uncertainty_target
+
+    @property
+    def convergence_check_interval(self):
+        return self.__convergence_check_interval
+
+    @property
+    def min_effective_samples(self):
+        return self.__min_effective_samples
+
+    @property
+    def estimator(self):
+        return self.__estimator
+
+    @property
+    def bootstrap_samples(self):
+        return self.__bootstrap_samples
+
+    @property
+    def bootstrap_block_size(self):
+        return self.__bootstrap_block_size
+
+    @property
+    def lambda_schedule(self):
+        return self.__lambda_schedule
+
+    @property
+    def schedule_target_deviation(self):
+        return self.__schedule_target_deviation
+
     def set(self, key, value):
         if (key == co.CONTROL_FILE_DICT["GENERAL_PATH"]):
             value = self._getSingleValue(key, value)
@@ -323,15 +400,20 @@ class Settings(object):
 
         if (key == co.CONTROL_FILE_DICT["MIN_FOLDER"]):
             value = self._getSingleValue(key, value)
-            self.__minimization_path = asPath(str(value))
+            # Folders are relative to the general path, as PELE may not be
+            # running from it
+            self.__minimization_path = asPath(os.path.abspath(os.path.join(
+                self.general_path, str(value))))
 
         if (key == co.CONTROL_FILE_DICT["SIM_FOLDER"]):
             value = self._getSingleValue(key, value)
-            self.__simulation_path = asPath(str(value))
+            self.__simulation_path = asPath(os.path.abspath(os.path.join(
+                self.general_path, str(value))))
 
         if (key == co.CONTROL_FILE_DICT["CAL_FOLDER"]):
             value = self._getSingleValue(key, value)
-            self.__calculation_path = asPath(str(value))
+            self.__calculation_path = asPath(os.path.abspath(os.path.join(
+                self.general_path, str(value))))
 
         elif (key == co.CONTROL_FILE_DICT["SAFETY_CHECK"]):
             value = self._getSingleValue(key, value)
@@ -368,6 +450,82 @@ class Settings(object):
             self._checkSolventType(key, value)
             self.__solvent_type = str(value)
 
+        elif (key == co.CONTROL_FILE_DICT["SP_BATCH_SIZE"]):
+            value = self._getSingleValue(key, value)
+            self._checkPositiveInteger(key, value)
+            self.__sp_batch_size = int(value)
+
+        elif (key == co.CONTROL_FILE_DICT["PELE_LAUNCHER"]):
+            # Custom wrappers might come with their own arguments
+            value = ' '.join(value)
+            self._checkPELELauncher(key, value)
+            self.__pele_launcher = str(value)
+
+        elif (key == co.CONTROL_FILE_DICT["EXECUTION_ENGINE"]):
+            value = self._getSingleValue(key, value)
+            self._checkExecutionEngineName(key, value)
+            self.__execution_engine = str(value)
+
+        elif (key == co.CONTROL_FILE_DICT["ENERGY_CACHE_SIZE"]):
+            value = self._getSingleValue(key, value)
+            self._checkPositiveInteger(key, value)
+            self.__energy_cache_size = int(value)
+
+        elif (key == co.CONTROL_FILE_DICT["REUSE_SAMPLING_ENERGIES"]):
+            value = self._getSingleValue(key, value)
+            value = self._checkBool(key, value)
+            self.__reuse_sampling_energies = value
+
+        elif (key == co.CONTROL_FILE_DICT["COULOMBIC_RECONSTRUCTION"]):
+            value = self._getSingleValue(key, value)
+            value = self._checkBool(key, value)
+            self.__coulombic_reconstruction = value
+
+        elif (key == co.CONTROL_FILE_DICT["DECORRELATE_MODELS"]):
+            value = self._getSingleValue(key, value)
+            value = self._checkBool(key, value)
+            self.__decorrelate_models = value
+
+        elif (key == co.CONTROL_FILE_DICT["SAMPLING_UNCERTAINTY_TARGET"]):
+            value = self._getSingleValue(key, value)
+            self._checkPositiveFloat(key, value)
+            self.__sampling_uncertainty_target = float(value)
+
+        elif (key == co.CONTROL_FILE_DICT["CONVERGENCE_CHECK_INTERVAL"]):
+            value = self._getSingleValue(key, value)
+            self._checkPositiveInteger(key, value)
+            self.__convergence_check_interval = int(value)
+
+        elif (key == co.CONTROL_FILE_DICT["MIN_EFFECTIVE_SAMPLES"]):
+            value = self._getSingleValue(key, value)
+            self._checkNonNegativeInteger(key, value)
+            self.__min_effective_samples = int(value)
+
+        elif (key == co.CONTROL_FILE_DICT["ESTIMATOR"]):
+            value = self._getSingleValue(key, value)
+            self._checkEstimatorName(key, value)
+            self.__estimator = str(value)
+
+        elif (key == co.CONTROL_FILE_DICT["BOOTSTRAP_SAMPLES"]):
+            value = self._getSingleValue(key, value)
+            self._checkNonNegativeInteger(key, value)
+            self.__bootstrap_samples = int(value)
+
+        elif (key == co.CONTROL_FILE_DICT["BOOTSTRAP_BLOCK_SIZE"]):
+            value = self._getSingleValue(key, value)
+            self._checkPositiveInteger(key, value)
+            self.__bootstrap_block_size = int(value)
+
+        elif (key == co.CONTROL_FILE_DICT["LAMBDA_SCHEDULE"]):
+            value = self._getSingleValue(key, value)
+            value = self._checkFile(key, value)
+            self.__lambda_schedule = str(value)
+
+        elif (key == co.CONTROL_FILE_DICT["SCHEDULE_TARGET_DEVIATION"]):
+            value = self._getSingleValue(key, value)
+            self._checkPositiveFloat(key, value)
+            self.__schedule_target_deviation = float(value)
+
     def __str__(self):
         return str(self.general_path) + ';' + \
             str(self.serial_pele) + ';' + \
@@ -498,6 +656,39 @@ class Settings(object):
             print("Error while setting lambdas. They are not sorted.")
             exit(1)
 
+    def loadLambdaSchedule(self):
+        # Schedules are written like input files and their lambdas replace
+        # any other ones, so they need to be loaded once all settings are set
+        if (self.lambda_schedule is None):
+            return
+
+        key = co.CONTROL_FILE_DICT["LAMBDA_SCHEDULE"]
+        path = self.lambda_schedule
+
+        setters = {co.CONTROL_FILE_DICT["LAMBDAS"]: self.setLambdas,
+                   co.CONTROL_FILE_DICT["LJ_LAMBDAS"]: self.setStericLambdas,
+                   co.CONTROL_FILE_DICT["C_LAMBDAS"]:
+                   self.setCoulombicLambdas}
+
+        with open(path, 'r') as schedule_file:
+            for line in schedule_file:
+                line = line.strip()
+                if (line.startswith('#')) or (line == ''):
+                    continue
+
+                fields = line.split()
+                lambdas_key = fields[0].strip(':')
+
+                if ((lambdas_key not in setters) or (len(fields) < 2)):
+                    print("Error while setting \'{}\',\'{}\'".format(key,
+                                                                     path) +
+                          ": invalid line \'{}\'".format(line))
+                    exit(1)
+
+                values = self._getCommaSeparatedList(lambdas_key, fields[1:])
+                self._checkListOfLambdas(lambdas_key, values)
+                setters[lambdas_key]([float(v) for v in values])
+
     def _getSingleValue(self, key, value):
         if (len(value) != 1):
             raise NameError('Expected a single value in line with key' +
@@ -609,6 +800,44 @@ class Settings(object):
                   ": " + message)
             exit(1)
 
+    def _checkPositiveFloat(self, key, value):
+        okay = True
+        message = ""
+
+        try:
+            value = float(value)
+        except ValueError:
+            okay = False
+            message += "Input value is not a number. "
+
+        if (okay and (value <= 0)):
+            okay = False
+            message += "Input value is not a positive number. "
+
+        if (not okay):
+            print("Error while setting \'{}\',\'{}\'".format(key, value) +
+                  ": " + message)
+            exit(1)
+
+    def _checkNonNegativeInteger(self, key, value):
+        okay = True
+        message = ""
+
+        try:
+            value = int(value)
+        except ValueError:
+            okay = False
+            message += "Input value is not an integer. "
+
+        if (okay and (value < 0)):
+            okay = False
+            message += "Input value is a negative integer. "
+
+        if (not okay):
+            print("Error while setting \'{}\',\'{}\'".format(key, value) +
+                  ": " + message)
+            exit(1)
+
     def _checkSamplingMethodsNames(self, key, value):
         okay = True
         message = ""
@@ -622,6 +851,32 @@ class Settings(object):
                   ": " + message)
             exit(1)
 
+    def _checkExecutionEngineName(self, key, value):
+        okay = True
+        message = ""
+
+        if (value not in co.EXECUTION_ENGINES_LIST):
+            okay = False
+            message += "Execution engine not recogniced. "
+
+        if (not okay):
+            print("Error while setting \'{}\',\'{}\'".format(key, value) +
+                  ": " + message)
+            exit(1)
+
+    def _checkEstimatorName(self, key, value):
+        okay = True
+        message = ""
+
+        if (value not in co.ESTIMATORS_LIST):
+            okay = False
+            message += "Estimator not recogniced. "
+
+        if (not okay):
+            print("Error while setting \'{}\',\'{}\'".format(key, value) +
+                  ": " + message)
+            exit(1)
+
     def _checkCommandNames(self, key, value):
         okay = True
         message = ""
@@ -649,3 +904,19 @@ class Settings(object):
             print("Error while setting \'{}\',\'{}\'".format(key, value) +
                   ": " + message)
             exit(1)
+
+    def _checkPELELauncher(self, key, value):
+        okay = True
+        message = ""
+
+        if (value not in pele_co.PELE_LAUNCHERS):
+            wrapper = value.split()
+            if ((len(wrapper) == 0) or (shutil.which(wrapper[0]) is None)):
+                okay = False
+                message += "Launcher is neither a known one nor an " + \
+                    "executable wrapper. "
+
+        if (not okay):
+            print("Error while setting \'{}\',\'{}\'".format(key, value) +
+                  ": " + message)
+            exit(1)
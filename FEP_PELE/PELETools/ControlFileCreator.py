@@ -3,6 +3,7 @@
 
 # Python imports
 import sys
+import json
 
 
 # FEP_PELE imports
@@ -71,6 +72,14 @@ class ControlFileFromTemplateCreator(object):
 
         self._flags_to_replace = self.findFlags()
 
+    @property
+    def text(self):
+        return self._text
+
+    @property
+    def flags_to_replace(self):
+        return self._flags_to_replace
+
     def read(self):
         with open(self._template_path, 'r') as file:
             return file.read()
@@ -115,3 +124,87 @@ class ControlFileFromTemplateCreator(object):
 
         with open(output_path, 'w') as file:
             file.write(self._text)
+
+
+class BatchedControlFileFromTemplateCreator(object):
+    # The templatized Control File is rendered once per model and its
+    # commands are appended to a single list. Each command carries the
+    # Initialization block of its model, so PELE loads a new structure
+    # before running it and prints energies in the same order
+    def __init__(self, template_path):
+        try:
+            checkFile(template_path)
+        except NameError:
+            print("Error: invalid path to Control File template: " +
+                  "{}".format(template_path))
+            sys.exit(1)
+
+        self._template_path = template_path
+        self._common_flags = {}
+        self._models = []
+
+    @property
+    def number_of_models(self):
+        return len(self._models)
+
+    def replaceFlag(self, flag, value):
+        self._common_flags[flag] = value
+
+    def addModel(self, pdb_name):
+        self._models.append(pdb_name)
+
+    def _renderModel(self, pdb_name):
+        builder = ControlFileFromTemplateCreator(self._template_path)
+
+        builder.replaceFlag("INPUT_PDB_NAME", pdb_name)
+        for flag, value in self._common_flags.items():
+            builder.replaceFlag(flag, value)
+
+        if (len(builder.flags_to_replace) != 0):
+            print("Error: there are still flags that were not replaced in " +
+                  "the original templatized Control File: " +
+                  "{}".format(builder.flags_to_replace))
+            sys.exit(1)
+
+        try:
+            return json.loads(builder.text)
+        except ValueError as exception:
+            raise NameError("Control File template " +
+                            "{} ".format(self._template_path) +
+                            "cannot be batched: " + str(exception))
+
+    def write(self, output_path):
+        if (len(self._models) == 0):
+            raise NameError("No models were added to the batched Control " +
+                            "File")
+
+        try:
+            checkPath(getPathFromFile(output_path))
+        except NameError:
+            print("Error: invalid output path to write customized Control " +
+                  "File: {}".format(output_path))
+            sys.exit(1)
+
+        batch = None
+
+        for pdb_name in self._models:
+            data = self._renderModel(pdb_name)
+
+            if (("Initialization" not in data) or ("commands" not in data)):
+                raise NameError("Control File template " +
+                                "{} ".format(self._template_path) +
+                                "cannot be batched: Initialization or " +
+                                "commands sections are missing")
+
+            commands = data["commands"]
+
+            if (batch is None):
+                batch = data
+                batch["commands"] = []
+
+            for command in commands:
+                command["Initialization"] = data["Initialization"]
+                batch["commands"].append(command)
+
+        with open(output_path, 'w') as file:
+            json.dump(batch, file, indent=4)
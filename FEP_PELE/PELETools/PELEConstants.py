@@ -3,18 +3,30 @@
 # Constants regarding PELE standard output
 ENERGY_RESULT_LINE = "ENERGY VACUUM + SGB + CONSTRAINTS + SELF + NON POLAR:"
 ENERGY_RESULT_LINE_IN_VACUUM = "ENERGY VACUUM + CONSTRAINTS:"
+ENERGY_RESULT_LINES = (ENERGY_RESULT_LINE, ENERGY_RESULT_LINE_IN_VACUUM)
+OUTPUT_TAIL_LINES = 20
 
 # Constants regarding PELE report file
+REPORT_STEPS_COLUMN = 2
 REPORT_TOTAL_ENERGY_COLUMN = 4
 
 # Hardcoded PELE paths
 HETEROATOMS_TEMPLATE_PATH = "DataLocal/Templates/OPLS2005/HeteroAtoms/"
+SHARED_DATA_FOLDERS = ("Data", "Documents")
 
 # PELE executable types
 PELE_SERIAL_EXEC_TYPE = "SERIAL"
 PELE_MPI_EXEC_TYPE = "MPI"
 PELE_EXECUTABLE_TYPES = (PELE_SERIAL_EXEC_TYPE, PELE_MPI_EXEC_TYPE)
 
+# PELE launchers, any other value is taken as a custom wrapper command
+AUTO_LAUNCHER = "auto"
+SERIAL_LAUNCHER = "serial"
+SRUN_LAUNCHER = "srun"
+MPIRUN_LAUNCHER = "mpirun"
+PELE_LAUNCHERS = (AUTO_LAUNCHER, SERIAL_LAUNCHER, SRUN_LAUNCHER,
+                  MPIRUN_LAUNCHER)
+
 # PELE Control File flag names
 CONTROL_FILE_FLAG_NAMES = ["LICENSE_PATH",
                            "LOG_PATH",
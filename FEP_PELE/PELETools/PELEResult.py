@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+
+# Python imports
+from collections import deque
+
+
+# FEP_PELE imports
+from . import PELEConstants as pele_co
+
+
+# Script information
+__author__ = "Marti Municoy"
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Marti Municoy"
+__email__ = "marti.municoy@bsc.es"
+
+
+# Class definitions
+class PELEResult(object):
+    def __init__(self, args, tail_lines=pele_co.OUTPUT_TAIL_LINES):
+        self._args = list(args)
+        self._energy = None
+        self._energies = {}
+        self._tail = deque(maxlen=tail_lines)
+        self._return_code = None
+        self._elapsed_time = 0.
+        self._stopped = False
+
+    @property
+    def args(self):
+        return self._args
+
+    @property
+    def energy(self):
+        return self._energy
+
+    @property
+    def energies(self):
+        return self._energies
+
+    @property
+    def tail(self):
+        return '\n'.join(self._tail)
+
+    @property
+    def return_code(self):
+        return self._return_code
+
+    @property
+    def elapsed_time(self):
+        return self._elapsed_time
+
+    @property
+    def stopped(self):
+        return self._stopped
+
+    @property
+    def success(self):
+        # Runs stopped on purpose, once they converged, are not failures
+        return (self.return_code == 0) or self.stopped
+
+    def getEnergies(self, result_line=pele_co.ENERGY_RESULT_LINE):
+        return self.energies.get(result_line, [])
+
+    def parseLine(self, line):
+        # Only energy terms and the last lines of the output are kept, the
+        # rest of PELE's output is dropped as it is read
+        line = line.rstrip()
+
+        self._tail.append(line)
+
+        for result_line in pele_co.ENERGY_RESULT_LINES:
+            if (line.startswith(result_line)):
+                energy = float(line.split()[-1])
+
+                if (self._energy is None):
+                    self._energy = energy
+
+                self._energies.setdefault(result_line, []).append(energy)
+                break
+
+    def stop(self):
+        self._stopped = True
+
+    def finish(self, return_code, elapsed_time):
+        self._return_code = return_code
+        self._elapsed_time = elapsed_time
+
+
+class PELEError(Exception):
+    def __init__(self, result, message="PELE run failed"):
+        Exception.__init__(self, result, message)
+        self._result = result
+        self._message = message
+
+    @property
+    def result(self):
+        return self._result
+
+    @property
+    def message(self):
+        return self._message
+
+    def __str__(self):
+        return "Error while running PELE: \'" + ' '.join(self.result.args) + \
+            "\', " + self.message + \
+            " (return code {})".format(self.result.return_code) + \
+            "\n" + self.result.tail
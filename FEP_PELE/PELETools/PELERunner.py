@@ -3,11 +3,17 @@
 
 # Python imports
 import sys
-from subprocess import check_output, CalledProcessError, STDOUT
+import time
+import shlex
+import asyncio
+import shutil
+import threading
+from subprocess import Popen, PIPE, STDOUT
 
 
 # FEP_PELE imports
 from . import PELEConstants as pele_co
+from .PELEResult import PELEResult, PELEError
 from FEP_PELE.Utils.InOut import checkFile
 
 
@@ -19,14 +25,24 @@ __maintainer__ = "Marti Municoy"
 __email__ = "marti.municoy@bsc.es"
 
 
+# Process-wide caches, so executables and launchers are only checked once
+# no matter how many PELE runs each process launches
+_CHECKED_EXECUTABLES = set()
+_SRUN_AVAILABLE = None
+_RUNNERS = {}
+
+
 class PELERunner(object):
     def __init__(self, executable_path, number_of_processors=1,
-                 executable_type=pele_co.PELE_SERIAL_EXEC_TYPE):
-        try:
-            checkFile(executable_path)
-        except NameError as exception:
-            print("PELERunner error: " + str(exception))
-            sys.exit(1)
+                 executable_type=pele_co.PELE_SERIAL_EXEC_TYPE,
+                 launcher=pele_co.AUTO_LAUNCHER):
+        if (executable_path not in _CHECKED_EXECUTABLES):
+            try:
+                checkFile(executable_path)
+            except NameError as exception:
+                print("PELERunner error: " + str(exception))
+                sys.exit(1)
+            _CHECKED_EXECUTABLES.add(executable_path)
 
         if (executable_type not in pele_co.PELE_EXECUTABLE_TYPES):
             print("PELERunner error: invalid executable type " +
@@ -39,6 +55,7 @@ class PELERunner(object):
         self.__executable_path = executable_path
         self.__number_of_processors = number_of_processors
         self.__executable_type = executable_type
+        self.__launcher = launcher
 
         if (number_of_processors > 1):
             self.__executable_type = pele_co.PELE_MPI_EXEC_TYPE
@@ -47,54 +64,125 @@ class PELERunner(object):
     def srun(self):
         return self.__srun
 
+    @property
+    def launcher(self):
+        return self.__launcher
+
     def checkSRun(self):
-        try:
-            output = check_output(["which", "srun"],
-                                  stderr=STDOUT).decode('utf-8')
-        except Exception as e:
-            output = str(e.output)
-
-        if ('which: no srun in' in output):
-            return False
+        return isSRunAvailable()
+
+    def getArguments(self, control_file_path):
+        pele_args = [self.__executable_path, control_file_path]
+
+        if (self.launcher not in pele_co.PELE_LAUNCHERS):
+            return shlex.split(self.launcher) + pele_args
+
+        if ((self.__executable_type == pele_co.PELE_SERIAL_EXEC_TYPE) or
+                (self.launcher == pele_co.SERIAL_LAUNCHER)):
+            return pele_args
+
+        if ((self.launcher == pele_co.SRUN_LAUNCHER) or
+                ((self.launcher == pele_co.AUTO_LAUNCHER) and self.srun)):
+            launcher = "srun"
         else:
-            return True
+            launcher = "mpirun"
 
-    def run(self, control_file_path):
-        if (self.__executable_type == pele_co.PELE_SERIAL_EXEC_TYPE):
-            return self._serial_run(control_file_path)
-        if (self.__executable_type == pele_co.PELE_MPI_EXEC_TYPE):
-            return self._mpi_run(control_file_path)
-
-    def _serial_run(self, control_file_path):
-        try:
-            output = check_output([self.__executable_path,
-                                   control_file_path])
-
-        except CalledProcessError as exception:
-            print(exception.output.decode('utf-8').strip())
-            raise SystemExit(
-                "Error while running PELE: \'" + self.__executable_path + ' ' +
-                control_file_path + '\'')
-
-        return output.decode('utf-8').strip()
-
-    def _mpi_run(self, control_file_path):
-        print(self.srun)
-        if (self.srun):
-            args = ["srun", "-n", str(self.__number_of_processors),
-                    self.__executable_path, control_file_path]
+        return [launcher, "-n", str(self.__number_of_processors)] + pele_args
+
+    def run(self, control_file_path, cwd=None, monitor=None):
+        args = self.getArguments(control_file_path)
+        result = PELEResult(args)
+
+        initial_time = time.time()
+
+        # Output is parsed while PELE writes it instead of being buffered
+        with Popen(args, stdout=PIPE, stderr=self._getStdErr(), cwd=cwd,
+                   universal_newlines=True) as process:
+            finished = threading.Event()
+
+            if (monitor is not None):
+                watcher = threading.Thread(
+                    target=self._watch,
+                    args=(process, result, monitor, finished))
+                watcher.start()
+
+            for line in process.stdout:
+                result.parseLine(line)
+
+            process.wait()
+            finished.set()
+
+            if (monitor is not None):
+                watcher.join()
+
+        result.finish(process.returncode, time.time() - initial_time)
+
+        return self._checkResult(result)
+
+    def _watch(self, process, result, monitor, finished):
+        # The monitor is checked periodically and PELE is stopped as soon
+        # as it reports convergence
+        while (not finished.wait(monitor.interval)):
+            if (monitor.isConverged()):
+                result.stop()
+                process.terminate()
+                break
+
+    async def runAsync(self, control_file_path, cwd=None):
+        # Waiting for PELE does not block the event loop, so a single
+        # process can keep many PELE runs in flight
+        args = self.getArguments(control_file_path)
+        result = PELEResult(args)
+
+        initial_time = time.time()
+
+        if (self._getStdErr() is None):
+            stderr = None
         else:
-            args = ["mpirun", "-n", str(self.__number_of_processors),
-                    self.__executable_path, control_file_path]
+            stderr = asyncio.subprocess.STDOUT
+
+        process = await asyncio.create_subprocess_exec(
+            *args, stdout=asyncio.subprocess.PIPE, stderr=stderr, cwd=cwd)
+
+        async for line in process.stdout:
+            result.parseLine(line.decode('utf-8'))
+
+        await process.wait()
+
+        result.finish(process.returncode, time.time() - initial_time)
+
+        return self._checkResult(result)
+
+    def _getStdErr(self):
+        if (self.__executable_type == pele_co.PELE_MPI_EXEC_TYPE):
+            return STDOUT
+
+        return None
+
+    def _checkResult(self, result):
+        if (not result.success):
+            raise PELEError(result)
+
+        return result
+
+
+def isSRunAvailable():
+    global _SRUN_AVAILABLE
+
+    if (_SRUN_AVAILABLE is None):
+        _SRUN_AVAILABLE = shutil.which("srun") is not None
+
+    return _SRUN_AVAILABLE
+
 
-        try:
-            output = check_output(args, stderr=STDOUT)
+def getPELERunner(executable_path, number_of_processors=1,
+                  executable_type=pele_co.PELE_SERIAL_EXEC_TYPE,
+                  launcher=pele_co.AUTO_LAUNCHER):
+    # Runners hold no per-run state, so they are shared by all the PELE
+    # runs of a process with the same configuration
+    key = (executable_path, number_of_processors, executable_type, launcher)
 
-        except CalledProcessError as exception:
-            print(exception.output.decode('utf-8').strip())
-            raise SystemExit(
-                "Error while running PELE: \'" + "mpirun -n " +
-                str(self.__number_of_processors) + " " +
-                self.__executable_path + control_file_path + '\'')
+    if (key not in _RUNNERS):
+        _RUNNERS[key] = PELERunner(*key)
 
-        return output.decode('utf-8').strip()
+    return _RUNNERS[key]
@@ -6,6 +6,7 @@ from __future__ import unicode_literals
 import os
 import glob
 import sys
+import numpy as np
 
 
 # PELE imports
@@ -223,16 +224,20 @@ class Report:
             self.logfile = logfile
 
     def getReportInfo(self):
-        models = 0
+        # The whole report is parsed once into a models x metrics array
         with open(self.path + "/" + self.name) as report_file:
             labels = report_file.readline()
-            labels = labels.strip()
-            label_pairing = {}
-            for col, label in enumerate(labels.split("    ")):
-                label_pairing[label] = col
-            for line in report_file:
-                models += 1
-        return label_pairing, Models(models)
+            rows = [line.split() for line in report_file
+                    if line.strip() != '']
+
+        labels = labels.strip()
+        label_pairing = {}
+        for col, label in enumerate(labels.split("    ")):
+            label_pairing[label] = col
+
+        self.values = buildMetricsArray(rows, len(label_pairing))
+
+        return label_pairing, Models(len(rows))
 
     def getMetric(self, col_num=None, metric_name=None):
         if col_num is None and metric_name is None:
@@ -241,19 +246,11 @@ class Report:
             sys.exit(1)
 
         elif col_num is None:
-            col_num = self.metrics[metric_name]
+            col_num = self.metrics[metric_name] + 1
 
-        metric_values = []
+        active = np.array(self.models.active, dtype=bool)
 
-        with open(self.path + "/" + self.name) as report_file:
-            report_file.readline()
-            for i, line in enumerate(report_file):
-                if self.models.active[i]:
-                    line = line.strip()
-                    value = float(line.split("    ")[col_num - 1])
-                    metric_values.append(value)
-
-        return metric_values
+        return self.values[:, col_num - 1][active]
 
     def addMetric(self, metric_name, values):
         with open(self.path + "/" + self.name) as report_file:
@@ -292,6 +289,7 @@ class Trajectory:
         self.trajectory_id = trajectory_id
         self.models = models
         self.PDBHandler = self.report_file.PDBHandler
+        self.model_offsets = None
 
     def isAtomThere(self, atom_data):
         if (self.PDBHandler.system_size is None):
@@ -442,23 +440,81 @@ class Trajectory:
             file.readline()
         return file.readline()
 
+    def indexModels(self):
+        # Byte offsets of each model, from its MODEL line to the next one
+        model_offsets = []
+        model_start = None
+        offset = 0
+
+        with open(self.path + "/" + self.name, 'rb') as trajectory_file:
+            for line in trajectory_file:
+                if line.startswith(b"MODEL"):
+                    if (model_start is not None):
+                        model_offsets.append((model_start, offset))
+                    model_start = offset
+                offset += len(line)
+
+        if (model_start is None):
+            model_start = 0
+
+        model_offsets.append((model_start, offset))
+
+        self.model_offsets = model_offsets
+
+        return model_offsets
+
     def writeModel(self, model_id, output_path):
-        model_out = ""
-        with open(self.path + "/" + self.name) as trajectory_file:
-            i = int(0)
-            line = trajectory_file.readline()
-            while(i != int(model_id)):
-                line = self.goToNextModelLine(trajectory_file)
-                i += 1
+        if (self.model_offsets is None):
+            self.indexModels()
 
-            model_out += line
+        start, end = self.model_offsets[int(model_id)]
 
-            for i in range(0, self.PDBHandler.getSystemSize()):
-                model_out += trajectory_file.readline()
+        with open(self.path + "/" + self.name, 'rb') as trajectory_file:
+            trajectory_file.seek(start)
+            model_out = trajectory_file.read(end - start)
 
-        with open(output_path, 'w') as output_file:
+        with open(output_path, 'wb') as output_file:
             output_file.write(model_out)
 
+    def splitModels(self, output_paths):
+        # Writes each model to its output path reading the trajectory once
+        model_offsets = []
+        model_id = -1
+        model_start = 0
+        output_file = None
+        offset = 0
+
+        with open(self.path + "/" + self.name, 'rb') as trajectory_file:
+            for line in trajectory_file:
+                if line.startswith(b"MODEL"):
+                    if (model_id >= 0):
+                        model_offsets.append((model_start, offset))
+                    if (output_file is not None):
+                        output_file.close()
+                        output_file = None
+
+                    model_id += 1
+                    model_start = offset
+
+                    if (model_id < len(output_paths)):
+                        output_file = open(output_paths[model_id], 'wb')
+
+                if (output_file is not None):
+                    output_file.write(line)
+
+                offset += len(line)
+
+        if (output_file is not None):
+            output_file.close()
+
+        if (model_id >= 0):
+            model_offsets.append((model_start, offset))
+            self.model_offsets = model_offsets
+        elif (len(output_paths) > 0):
+            # Trajectories without MODEL lines hold a single model
+            self.model_offsets = [(0, offset), ]
+            self.writeModel(0, output_paths[0])
+
 
 class Logfile:
 
@@ -556,6 +612,21 @@ def parseReports(reports_to_parse, parser):
     return reports
 
 
+def buildMetricsArray(rows, number_of_labels=0):
+    # Reports with no models only have their header
+    if (len(rows) == 0):
+        return np.zeros((0, number_of_labels))
+
+    try:
+        return np.array(rows, dtype=float).reshape(len(rows), -1)
+    except ValueError:
+        # Rows with missing metrics are padded with NaNs
+        values = np.full((len(rows), max(map(len, rows))), np.nan)
+        for i, row in enumerate(rows):
+            values[i, :len(row)] = np.array(row, dtype=float)
+        return values
+
+
 def containsLink(line, link_data):
     if len(line) < 80:
         return False
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+
+# Python imports
+import os
+
+
+# FEP_PELE imports
+from . import PELEConstants as pele_co
+from FEP_PELE.Utils.InOut import create_directory
+
+
+# Script information
+__author__ = "Marti Municoy"
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Marti Municoy"
+__email__ = "marti.municoy@bsc.es"
+
+
+# Class definitions
+class PELEWorkspace(object):
+    def __init__(self, source_path, path):
+        self._source_path = os.path.abspath(source_path) + '/'
+        self._path = os.path.abspath(path) + '/'
+
+    @property
+    def source_path(self):
+        return self._source_path
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def templates_path(self):
+        return self.path + pele_co.HETEROATOMS_TEMPLATE_PATH
+
+    def build(self, private_templates=None):
+        if (private_templates is None):
+            private_templates = []
+
+        create_directory(self.path)
+
+        for folder in pele_co.SHARED_DATA_FOLDERS:
+            linkPath(self.source_path + folder, self.path + folder)
+
+        self._buildDataLocalOverlay(private_templates)
+
+    def _buildDataLocalOverlay(self, private_templates):
+        # Only the folders that lead to the heteroatom templates are real
+        # directories, the rest of DataLocal is linked to the shared one
+        folders = pele_co.HETEROATOMS_TEMPLATE_PATH.strip('/').split('/')
+
+        source = self.source_path
+        destination = self.path
+
+        for i, folder in enumerate(folders):
+            source += folder + '/'
+            destination += folder + '/'
+
+            create_directory(destination)
+
+            if (not os.path.isdir(source)):
+                continue
+
+            if (i + 1 < len(folders)):
+                excluded_entries = [folders[i + 1], ]
+            else:
+                excluded_entries = private_templates
+
+            for entry in os.listdir(source):
+                if (entry not in excluded_entries):
+                    linkPath(source + entry, destination + entry)
+
+
+def linkPath(source, destination):
+    if (not os.path.lexists(source)):
+        return
+
+    if (os.path.lexists(destination)):
+        return
+
+    # In case several parallel processes are building the same workspace
+    try:
+        os.symlink(os.path.abspath(source), destination)
+    except OSError:
+        pass
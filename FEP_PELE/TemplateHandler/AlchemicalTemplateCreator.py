@@ -1,12 +1,27 @@
 
 import sys
+import copy
 
 from .Templates import TemplateOPLS2005
-from .Combiner import CombineLinearly
+from .Combiner import ParametersVector
+from .Combiner import INITIAL_DUMMY_BOND_EQDIST
+from .Combiner import INITIAL_DUMMY_BOND_SPRING
+from .Combiner import INITIAL_DUMMY_THETA_SPRING
+from .Patterns import PATTERN_OPLS2005_NBON
+from .Patterns import PATTERN_OPLS2005_BOND
+from .Patterns import PATTERN_OPLS2005_THETA
 
 from .Lambda import DUAL_LAMBDA, STERIC_LAMBDA, COULOMBIC_LAMBDA
 
 
+# Constant definitions
+ATOM_PARAMETERS = ('sigma', 'epsilon', 'charge', 'radnpSGB', 'radnpType',
+                   'sgbnpGamma', 'sgbnpType')
+BOND_PARAMETERS = (('spring', INITIAL_DUMMY_BOND_SPRING),
+                   ('eq_dist', INITIAL_DUMMY_BOND_EQDIST))
+THETA_PARAMETERS = (('spring', INITIAL_DUMMY_THETA_SPRING), )
+
+
 # Class definitions
 class AlchemicalTemplateCreator:
     def __init__(self, initial_template_path, final_template_path,
@@ -17,7 +32,11 @@ class AlchemicalTemplateCreator:
         self.explicit_template, self.implicit_template = \
             self.detectExplicitAndImplicitTemplates()
 
-        self.alchemicalTemplate = self.explicit_template
+        self._atom_vectors = None
+        self._bond_vectors = None
+        self._theta_vectors = None
+        self._rendered_template = None
+        self._template_snapshot = None
 
     def detectExplicitAndImplicitTemplates(self, first_guess=True):
         explicit_guess = self.initial_template
@@ -53,17 +72,25 @@ class AlchemicalTemplateCreator:
                                      self.implicit_template)
 
     def reset(self):
-        self.alchemicalTemplate = self.explicit_template
+        self._template_snapshot = None
+
+        if (self._atom_vectors is None):
+            return
+
+        for vectors in (self._atom_vectors, self._bond_vectors,
+                        self._theta_vectors):
+            for vector in vectors.values():
+                vector.reset()
 
     def getFragmentElements(self):
-        fragment_atoms = detect_fragment_atoms(self.alchemicalTemplate,
+        fragment_atoms = detect_fragment_atoms(self.explicit_template,
                                                self.implicit_template)
 
         fragment_bonds = detect_fragment_bonds(fragment_atoms,
-                                               self.alchemicalTemplate)
+                                               self.explicit_template)
 
         fragment_thetas = detect_fragment_thetas(fragment_atoms,
-                                                 self.alchemicalTemplate)
+                                                 self.explicit_template)
 
         set_fragment_atoms(list_of_fragment_atoms=fragment_atoms)
         set_fragment_bonds(list_of_fragment_bonds=fragment_bonds)
@@ -79,7 +106,7 @@ class AlchemicalTemplateCreator:
 
             atoms_pairs.append(set_connecting_atoms(self.implicit_template,
                                                     name1,
-                                                    self.alchemicalTemplate,
+                                                    self.explicit_template,
                                                     name2))
 
         bonds_pairs = []
@@ -87,62 +114,218 @@ class AlchemicalTemplateCreator:
         for atoms_pair in atoms_pairs:
             bonds_pairs.append(set_connecting_bonds(atoms_pair,
                                                     self.implicit_template,
-                                                    self.alchemicalTemplate))
+                                                    self.explicit_template))
 
         thetas_pairs = []
 
         for bonds_pair in bonds_pairs:
             sub_thetas_pairs = set_connecting_thetas(bonds_pair,
                                                      self.implicit_template,
-                                                     self.alchemicalTemplate)
+                                                     self.explicit_template)
             for t1, t2 in sub_thetas_pairs:
                 thetas_pairs.append([t1, t2])
 
         return atoms_pairs, bonds_pairs, thetas_pairs
 
-    def applyLambda(self, _lambda, change_bonding_params=True):
+    def _buildParametersVectors(self):
+        # Fragment detection only depends on both end-point templates, so
+        # it is done once and stored as index and constant vectors
         atoms_pairs, bonds_pairs, thetas_pairs = self.getFragmentElements()
 
-        combiner = CombineLinearly(self.alchemicalTemplate,
-                                   _lambda.value, atoms_pairs, bonds_pairs,
-                                   thetas_pairs, self.explicit_is_final)
+        if (self.explicit_is_final):
+            pair_index = 1
+        else:
+            pair_index = 0
+
+        atoms = [self.explicit_template.list_of_atoms[n] for n in
+                 range(1, len(self.explicit_template.list_of_atoms) + 1)]
+        atom_positions = dict([(atom.atom_id, i)
+                               for i, atom in enumerate(atoms)])
+
+        read_indexes = []
+        write_indexes = []
+        paired_atoms = []
+        for atom_pair in atoms_pairs:
+            read_indexes.append(atom_positions[atom_pair[1].atom_id])
+            write_indexes.append(
+                atom_positions[atom_pair[pair_index].atom_id])
+            paired_atoms += list(atom_pair)
+
+        unpaired_atoms = [atom for key, atom in
+                          self.explicit_template.get_list_of_fragment_atoms()
+                          if atom not in paired_atoms]
+        for atom in unpaired_atoms:
+            read_indexes.append(atom_positions[atom.atom_id])
+            write_indexes.append(atom_positions[atom.atom_id])
+
+        self._atom_vectors = {}
+        for parameter in ATOM_PARAMETERS:
+            constants = [getattr(atom_pair[0], parameter)
+                         for atom_pair in atoms_pairs] + \
+                [0] * len(unpaired_atoms)
+            self._atom_vectors[parameter] = ParametersVector(
+                [getattr(atom, parameter) for atom in atoms], constants,
+                read_indexes, write_indexes, self.explicit_is_final)
+
+        self._bond_vectors = self._buildConnectionVectors(
+            self.explicit_template.list_of_bonds,
+            self.explicit_template.get_list_of_fragment_bonds(),
+            bonds_pairs, pair_index, BOND_PARAMETERS)
+
+        self._theta_vectors = self._buildConnectionVectors(
+            self.explicit_template.list_of_thetas,
+            self.explicit_template.get_list_of_fragment_thetas(),
+            thetas_pairs, pair_index, THETA_PARAMETERS)
+
+        self._renderStaticTemplate()
+
+    def _buildConnectionVectors(self, connections, fragment_connections,
+                                pairs, pair_index, parameters):
+        keys = list(connections.keys())
+        positions = dict([(key, i) for i, key in enumerate(keys)])
+
+        read_indexes = []
+        write_indexes = []
+        paired_connections = []
+        for pair in pairs:
+            read_indexes.append(positions[getConnectionKey(pair[1])])
+            write_indexes.append(
+                positions[getConnectionKey(pair[pair_index])])
+            paired_connections += list(pair)
+
+        unpaired_connections = [connection for key, connection in
+                                fragment_connections
+                                if connection not in paired_connections]
+        for connection in unpaired_connections:
+            read_indexes.append(positions[getConnectionKey(connection)])
+            write_indexes.append(positions[getConnectionKey(connection)])
+
+        vectors = {}
+        for parameter, dummy_value in parameters:
+            constants = [getattr(pair[0], parameter) for pair in pairs] + \
+                [dummy_value] * len(unpaired_connections)
+            vectors[parameter] = ParametersVector(
+                [getattr(connections[key], parameter) for key in keys],
+                constants, read_indexes, write_indexes,
+                self.explicit_is_final)
+
+        return vectors
+
+    def _renderStaticTemplate(self):
+        template = self.explicit_template
+
+        self._rendered_template = (
+            template.write_header() + template.write_xres() + "NBON\n",
+            "BOND\n",
+            "THET\n",
+            "PHI\n" + template.write_phis() + "IPHI\n" +
+            template.write_iphis() + "END")
+
+    def applyLambda(self, _lambda, change_bonding_params=True):
+        if (self._atom_vectors is None):
+            self._buildParametersVectors()
 
         # @TODO if DUAL_LAMBDA = 0 or both STERIC_LAMBDA and COULOMBIC_LAMBDA
         # = 0, do not combine parameters but apply original template
         # The same for the other boundary, lambda = 1. Apply either explicit
         # or implicit template depending on the case.
 
+        vectors = []
+
         if ((_lambda.type == DUAL_LAMBDA) or
                 (_lambda.type == STERIC_LAMBDA)):
             # Set up non bonding parameters
-            combiner.combine_sigmas()
-            combiner.combine_epsilons()
-            combiner.combine_radnpSGB()
-            combiner.combine_radnpType()
-            combiner.combine_SGBNPGamma()
-            combiner.combine_SGBNPType()
+            vectors += [self._atom_vectors[parameter] for parameter in
+                        ATOM_PARAMETERS if parameter != 'charge']
 
             # Set up bonding parameters
             if (change_bonding_params):
-                combiner.combine_BondSprings()
-                combiner.combine_BondEqDist()
-                combiner.combine_ThetaSprings()
+                vectors += list(self._bond_vectors.values())
+                vectors += list(self._theta_vectors.values())
 
         if ((_lambda.type == DUAL_LAMBDA) or
                 (_lambda.type == COULOMBIC_LAMBDA)):
-            combiner.combine_charges()
+            vectors.append(self._atom_vectors['charge'])
+
+        for vector in vectors:
+            vector.combine(_lambda.value)
 
-        self.alchemicalTemplate = combiner.get_resulting_template()
+        self._template_snapshot = None
 
     def writeAlchemicalTemplate(self, output_path):
-        self.alchemicalTemplate.write_template_to_file(
-            template_new_name=output_path)
+        with open(output_path, "w") as template:
+            template.write(self.renderAlchemicalTemplate())
+
+    def renderAlchemicalTemplate(self):
+        if (self._atom_vectors is None):
+            return self.explicit_template.write_template()
+
+        header, bond_header, theta_header, ending = self._rendered_template
+
+        nbon = [PATTERN_OPLS2005_NBON.format(atom_id, *values)
+                for atom_id, values in
+                zip(range(1, len(self.explicit_template.list_of_atoms) + 1),
+                    zip(*[self._atom_vectors[parameter].values
+                          for parameter in ATOM_PARAMETERS]))]
+
+        bonds = [PATTERN_OPLS2005_BOND.format(key[0], key[1], spring,
+                                              eq_dist)
+                 for key, spring, eq_dist in
+                 zip(self.explicit_template.list_of_bonds.keys(),
+                     self._bond_vectors['spring'].values,
+                     self._bond_vectors['eq_dist'].values)]
+
+        thetas = [PATTERN_OPLS2005_THETA.format(key[0], key[1], key[2],
+                                                spring, theta.eq_angle)
+                  for (key, theta), spring in
+                  zip(self.explicit_template.list_of_thetas.items(),
+                      self._theta_vectors['spring'].values)]
+
+        return header + "".join(nbon) + bond_header + "".join(bonds) + \
+            theta_header + "".join(thetas) + ending
+
+    @property
+    def alchemicalTemplate(self):
+        # Parameters live in the vectors, so this is a copy of the explicit
+        # template that is built again after every lambda change. It is
+        # meant to inspect the parameters, templates are written from the
+        # vectors. The copy must not be modified
+        if (self._atom_vectors is None):
+            return self.explicit_template
+
+        if (self._template_snapshot is not None):
+            return self._template_snapshot
+
+        template = copy.deepcopy(self.explicit_template)
+
+        for parameter, vector in self._atom_vectors.items():
+            for n, value in enumerate(vector.values):
+                setattr(template.list_of_atoms[n + 1], parameter,
+                        float(value))
+
+        for connections, vectors in ((template.list_of_bonds,
+                                      self._bond_vectors),
+                                     (template.list_of_thetas,
+                                      self._theta_vectors)):
+            for parameter, vector in vectors.items():
+                for key, value in zip(connections.keys(), vector.values):
+                    setattr(connections[key], parameter, float(value))
+
+        self._template_snapshot = template
+
+        return template
 
     @property
     def explicit_is_final(self):
         return self.explicit_template == self.final_template
 
 
+def getConnectionKey(connection):
+    if (hasattr(connection, 'atom3')):
+        return (connection.atom1, connection.atom2, connection.atom3)
+    return (connection.atom1, connection.atom2)
+
+
 def detect_fragment_atoms(explicit_template, implicit_template):
     fragment_atoms = []
     core_atoms = find_equal_pdb_atom_names(explicit_template,
@@ -1,5 +1,6 @@
 # Python imports
 import copy
+import numpy as np
 
 
 # Script information
@@ -281,3 +282,31 @@ class CombineLinearly(Combiner):
                            initial_value * self.lambda_parameter)
 
         return result
+
+
+class ParametersVector:
+    def __init__(self, values, constants, read_indexes, write_indexes,
+                 explicit_is_final=True):
+        self.initial_values = np.array(values, dtype=float)
+        self.values = np.array(values, dtype=float)
+        self.constants = np.array(constants, dtype=float)
+        self.read_indexes = np.array(read_indexes, dtype=int)
+        self.write_indexes = np.array(write_indexes, dtype=int)
+        self.explicit_is_final = explicit_is_final
+
+    def combine(self, lambda_parameter):
+        # Same arithmetic as CombineLinearly, applied to all the alchemical
+        # entries at once
+        explicit_values = self.values[self.read_indexes]
+
+        if (self.explicit_is_final):
+            result = self.constants * (1 - lambda_parameter) + \
+                explicit_values * lambda_parameter
+        else:
+            result = explicit_values * (1 - lambda_parameter) + \
+                self.constants * lambda_parameter
+
+        self.values[self.write_indexes] = result
+
+    def reset(self):
+        self.values = self.initial_values.copy()
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+
+
+# Python imports
+import os
+import json
+import hashlib
+
+
+# FEP_PELE imports
+from FEP_PELE.Utils.InOut import create_directory
+from FEP_PELE.Utils.InOut import isThereAFile
+
+
+# Script information
+__author__ = "Marti Municoy"
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Marti Municoy"
+__email__ = "marti.municoy@bsc.es"
+
+
+# Constant definitions
+INDEX_NAME = "index.json"
+
+
+# Class definitions
+class TemplateBank(object):
+    def __init__(self, alchemical_template_creator, path):
+        self._creator = alchemical_template_creator
+
+        # Each pair of end-point templates gets its own bank, so a restart
+        # with different input templates never reuses stale files
+        self._path = str(path) + self._getSourceHash() + '/'
+        self._index = {}
+
+        if (isThereAFile(self.path + INDEX_NAME)):
+            with open(self.path + INDEX_NAME) as index_file:
+                self._index = json.load(index_file)
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def index(self):
+        return self._index
+
+    def _getSourceHash(self):
+        source = hashlib.sha256()
+
+        for template in (self._creator.initial_template,
+                         self._creator.final_template):
+            with open(template.path_to_template, 'rb') as template_file:
+                source.update(template_file.read())
+
+        source.update(str(self._creator.pdb_atom_name_pairs).encode())
+
+        return source.hexdigest()[:16]
+
+    def getKey(self, lambda_, constant_lambda=None):
+        key = "{}_{!r}".format(lambda_.type, lambda_.value)
+
+        if (constant_lambda is not None):
+            key += "-{}_{!r}".format(constant_lambda.type,
+                                     constant_lambda.value)
+
+        return key
+
+    def generate(self, lambda_pairs):
+        missing_keys = 0
+
+        for lambda_, constant_lambda in lambda_pairs:
+            if (self._getBankedTemplate(lambda_, constant_lambda) is None):
+                self._render(lambda_, constant_lambda)
+                missing_keys += 1
+
+        if (missing_keys > 0):
+            self._writeIndex()
+
+    def getTemplatePath(self, lambda_, constant_lambda=None):
+        path = self._getBankedTemplate(lambda_, constant_lambda)
+
+        if (path is None):
+            path = self._render(lambda_, constant_lambda)
+            self._writeIndex()
+
+        return path
+
+    def activate(self, lambda_, constant_lambda, output_path):
+        template_path = self.getTemplatePath(lambda_, constant_lambda)
+
+        # The template is first copied next to its destination and then
+        # renamed, so PELE never reads a partially written file
+        temporary_path = output_path + ".{}.tmp".format(os.getpid())
+
+        with open(template_path, 'rb') as template_file:
+            with open(temporary_path, 'wb') as temporary_file:
+                temporary_file.write(template_file.read())
+
+        os.replace(temporary_path, output_path)
+
+    def _getBankedTemplate(self, lambda_, constant_lambda):
+        key = self.getKey(lambda_, constant_lambda)
+
+        if (key not in self.index):
+            return None
+
+        path = self.path + self.index[key]
+
+        if (not isThereAFile(path)):
+            return None
+
+        return path
+
+    def _render(self, lambda_, constant_lambda):
+        if (constant_lambda is not None):
+            self._creator.applyLambda(constant_lambda)
+
+        self._creator.applyLambda(lambda_)
+
+        content = self._creator.renderAlchemicalTemplate()
+
+        self._creator.reset()
+
+        content_hash = hashlib.sha256(content.encode()).hexdigest()
+
+        create_directory(self.path)
+
+        path = self.path + content_hash
+
+        if (not isThereAFile(path)):
+            temporary_path = path + ".{}.tmp".format(os.getpid())
+            with open(temporary_path, 'w') as template_file:
+                template_file.write(content)
+            os.replace(temporary_path, path)
+
+        self.index[self.getKey(lambda_, constant_lambda)] = content_hash
+
+        return path
+
+    def _writeIndex(self):
+        create_directory(self.path)
+
+        temporary_path = self.path + INDEX_NAME + \
+            ".{}.tmp".format(os.getpid())
+
+        with open(temporary_path, 'w') as index_file:
+            json.dump(self.index, index_file, indent=1, sort_keys=True)
+
+        os.replace(temporary_path, self.path + INDEX_NAME)
@@ -7,6 +7,8 @@ import numpy as np
 
 # FEP_PELE imports
 from FEP_PELE.Utils.InOut import checkPath
+from FEP_PELE.Utils.InOut import isThereAFile
+from FEP_PELE.Utils.InOut import getEnergiesSidecarPath
 from FEP_PELE.Utils.InOut import getLastFolderFromPath
 from FEP_PELE.Utils.InOut import getFileFromPath
 from FEP_PELE.Utils.InOut import getPathFromFile
@@ -25,7 +27,8 @@ __email__ = "marti.municoy@bsc.es"
 
 
 class LambdaFolder(object):
-    def __init__(self, path, lambda_type=None, total_PELE_steps=None):
+    def __init__(self, path, lambda_type=None, total_PELE_steps=None,
+                 energy_matrix=None, window=None):
         # Setting default values
         try:
             checkPath(path)
@@ -81,6 +84,8 @@ class LambdaFolder(object):
             print("  - LambdaFolder Warning: unknown total number of PELE " +
                   "steps")
         self.__total_PELE_steps = total_PELE_steps
+        self.__energy_matrix = energy_matrix
+        self.__window = window
 
     @property
     def path(self):
@@ -114,6 +119,14 @@ class LambdaFolder(object):
     def total_PELE_steps(self):
         return self.__total_PELE_steps
 
+    @property
+    def energy_matrix(self):
+        return self.__energy_matrix
+
+    @property
+    def window(self):
+        return self.__window
+
     def __lt__(self, other):
         if (self.initial_lambda != other.initial_lambda):
             return self.initial_lambda < other.initial_lambda
@@ -134,28 +147,43 @@ class LambdaFolder(object):
         return "Lambda Folder from {} to {}".format(self.initial_lambda,
                                                     self.final_lambda)
 
-    def _getEnergiesFrom(self, path):
-        report = Report(getPathFromFile(path), getFileFromPath(path),
-                        '_'.join(getFileFromPath(path).split('_')[:-1]) +
-                        '_', None)
+    def _getEnergiesFromMatrix(self, report_name, evaluated_lambda):
+        energies, rmsds = self.energy_matrix.getCells(
+            self.window, self.initial_lambda, evaluated_lambda, report_name)
+
+        return np.array(energies, dtype=float)
+
+    def _getDeltaEnergiesFromReport(self, path):
+        energies = np.zeros(0)
+        multiplicities = np.zeros(0, dtype=int)
+
+        report_name = getFileFromPath(path)
 
-        return report.getMetric(co.PP_ABSOLUTE_ENERGIES_COL)
+        steps, f_energies = getReportMetrics(path)
+        i_energies = None
 
-    def _getDeltaEnergiesFromReport(self, report):
-        energies = []
+        # Reports are only used when the matrix is missing or does not
+        # match them
+        if (self.energy_matrix is not None):
+            matrix_i_energies = self._getEnergiesFromMatrix(
+                report_name, self.initial_lambda)
+            matrix_f_energies = self._getEnergiesFromMatrix(
+                report_name, self.final_lambda)
 
-        steps = report.getMetric(co.PP_STEPS_COL)
-        i_energies = np.array(
-            self._getEnergiesFrom(self.path + '../' +
-                                  str(round(self.initial_lambda, 5)) +
-                                  '/' + report.name))
-        f_energies = np.array(
-            report.getMetric(co.PP_ABSOLUTE_ENERGIES_COL))
+            if ((len(matrix_i_energies) == len(steps)) and
+                    (len(matrix_f_energies) == len(steps))):
+                i_energies = matrix_i_energies
+                f_energies = matrix_f_energies
+
+        if (i_energies is None):
+            i_energies = getReportMetrics(
+                self.path + '../' + str(round(self.initial_lambda, 5)) +
+                '/' + report_name)[1]
 
         if (len(f_energies) == 0):
             print("  - LambdaFolder Warning: found an empty report file " +
-                  "{}".format(report.path))
-            return energies
+                  "{}".format(path))
+            return energies, multiplicities
 
         """
         if (len(report_energies) == 1):
@@ -168,60 +196,74 @@ class LambdaFolder(object):
         report_energies = report_energies[1:]
         """
 
-        last_accepted_step = int(steps[0])
-        last_accepted_dE = f_energies[0] - i_energies[0]
-
-        for step, e0, e1 in zip(map(int, steps[1:]),
-                                i_energies[1:],
-                                f_energies[1:]):
-            for i in range(0, step - last_accepted_step):
-                energies.append(last_accepted_dE)
+        n_models = min(len(steps), len(i_energies), len(f_energies))
+        steps = steps[:n_models].astype(int)
+        delta_energies = f_energies[:n_models] - i_energies[:n_models]
 
-            last_accepted_step = int(step)
-            last_accepted_dE = e1 - e0
+        multiplicities = getMultiplicities(steps, self.total_PELE_steps)
 
-        if (self.total_PELE_steps is not None):
-            for i in range(0, self.total_PELE_steps - last_accepted_step + 1):
-                energies.append(last_accepted_dE)
+        kept = multiplicities > 0
 
-        return energies
+        return delta_energies[kept], multiplicities[kept]
 
     def getDeltaEnergyValues(self):
+        # Delta energies are returned as (values, multiplicities) arrays
         if (self.__delta_energies is not None):
             return self.__delta_energies
 
+        values_by_file = self.getDeltaEnergyValuesByFile().values()
+
+        if (len(values_by_file) == 0):
+            self.__delta_energies = (np.zeros(0), np.zeros(0, dtype=int))
+        else:
+            energies, multiplicities = zip(*values_by_file)
+            self.__delta_energies = (np.concatenate(energies),
+                                     np.concatenate(multiplicities))
+
+        return self.__delta_energies
+
+    def getDeltaEnergyValuesByFile(self):
         files = get_all_files_from_with_extension(self.path, 'out')
 
-        energies = []
+        energies_by_file = {}
 
         for file in files:
-            report = Report(getPathFromFile(file), getFileFromPath(file),
-                            '_'.join(getFileFromPath(file).split('_')[:-1]) +
-                            '_',
-                            None)
+            energies_by_file[file] = self._getDeltaEnergiesFromReport(file)
 
-            energies += self._getDeltaEnergiesFromReport(report)
+        return energies_by_file
 
-        self.__delta_energies = energies
 
-        return energies
+def getReportMetrics(path):
+    # Steps and energies of an energies report. Full precision sidecars are
+    # memory-mapped, text reports are only parsed when they are missing
+    sidecar_path = getEnergiesSidecarPath(path)
 
-    def getDeltaEnergyValuesByFile(self):
-        files = get_all_files_from_with_extension(self.path, 'out')
+    if (isThereAFile(sidecar_path)):
+        values = np.load(sidecar_path, mmap_mode='r')
 
-        energies_by_file = {}
+        return values[:, co.PP_STEPS_COL - 1], \
+            values[:, co.PP_ABSOLUTE_ENERGIES_COL - 1]
 
-        for file in files:
-            report = Report(getPathFromFile(file), getFileFromPath(file),
-                            '_'.join(getFileFromPath(file).split('_')[:-1]) +
-                            '_',
-                            None)
+    report = Report(getPathFromFile(path), getFileFromPath(path),
+                    '_'.join(getFileFromPath(path).split('_')[:-1]) +
+                    '_', None)
 
-            dEs = self._getDeltaEnergiesFromReport(report)
+    return report.getMetric(co.PP_STEPS_COL), \
+        report.getMetric(co.PP_ABSOLUTE_ENERGIES_COL)
 
-            energies_by_file[file] = dEs
 
-        return energies_by_file
+def getMultiplicities(steps, total_PELE_steps=None):
+    # Each accepted model counts once per PELE step until the next
+    # accepted step
+    steps = np.asarray(steps).astype(int)
+
+    multiplicities = np.zeros(len(steps), dtype=int)
+    multiplicities[:-1] = np.diff(steps)
+
+    if ((total_PELE_steps is not None) and (len(steps) > 0)):
+        multiplicities[-1] = total_PELE_steps - steps[-1] + 1
+
+    return multiplicities
 
 
 def filterLambdaFoldersByInitialLambda(lambda_folders, initial_lambda):
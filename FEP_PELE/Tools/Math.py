@@ -22,3 +22,19 @@ def normalize(a, axis=-1, order=2):
 
 def norm(a, axis=-1, order=2):
     return np.atleast_1d(np.linalg.norm(a, order, axis))
+
+
+def lagrangeInterpolation(x_values, y_values, x):
+    # Evaluates at x the polynomial that passes through all the given points.
+    # Each row of y_values holds the values of one of the x_values
+    y_values = np.asarray(y_values, dtype=float)
+    result = np.zeros(y_values.shape[1:])
+
+    for k, x_k in enumerate(x_values):
+        basis = 1.
+        for j, x_j in enumerate(x_values):
+            if (j != k):
+                basis *= (x - x_j) / (x_k - x_j)
+        result += basis * y_values[k]
+
+    return result
@@ -377,7 +377,9 @@ class PDBHandler:
                 if line.startswith("ENDMDL"):
                     break
 
-        return size + 1
+        self.system_size = size + 1
+
+        return self.system_size
 
     def indexAtoms(self):
         self.indexedAtoms = {}
@@ -5,3 +5,4 @@ TRAJECTORY_NAME_FLAG = "$OUTPUT_TRAJECTORY_NAME$"
 REPORT_FIRST_LINE = "#Task    Step    " + \
     "numberOfAcceptedPeleSteps    currentEnergy" + \
     "    RMSD\n"
+ENERGIES_SIDECAR_EXTENSION = ".npy"
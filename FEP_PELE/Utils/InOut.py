@@ -2,8 +2,10 @@
 # Python imports
 import os
 import glob
+import hashlib
 import shutil
 import stat
+import numpy as np
 
 
 # FEP_PELE imports
@@ -184,6 +186,8 @@ def write_energies_report(output_path, report_file, energies,
     if (rmsds is None):
         first_line = first_line[:-8] + '\n'
 
+    rows = []
+
     with open(output_path + report_file.name, 'w') as file:
         file.write(first_line)
         for i, energy in enumerate(energies):
@@ -198,6 +202,48 @@ def write_energies_report(output_path, report_file, energies,
 
             file.write("\n")
 
+            if (rmsds is not None):
+                rows.append((tasks[i], steps[i], accepted_steps[i], energy,
+                             rmsds[i]))
+            else:
+                rows.append((tasks[i], steps[i], accepted_steps[i], energy,
+                             np.nan))
+
+    # Full precision copy of the report, with the same columns, that the
+    # analysis can memory-map instead of parsing the text
+    np.save(getEnergiesSidecarPath(output_path + report_file.name),
+            np.array(rows, dtype=float).reshape(-1, 5))
+
+
+def getEnergiesSidecarPath(report_path):
+    return os.path.splitext(report_path)[0] + co.ENERGIES_SIDECAR_EXTENSION
+
+
+def getStructureHash(pdb_path, seed=''):
+    # Only atom records are hashed, headers and remarks do not change the
+    # structure
+    structure_hash = hashlib.sha256(seed.encode())
+
+    with open(pdb_path, 'rb') as pdb_file:
+        for line in pdb_file:
+            if (line.startswith(b"ATOM") or line.startswith(b"HETATM")):
+                structure_hash.update(line.rstrip())
+
+    return structure_hash.hexdigest()
+
+
+def getFilesHash(paths, labels=()):
+    files_hash = hashlib.sha256()
+
+    for path in paths:
+        with open(path, 'rb') as hashed_file:
+            files_hash.update(hashed_file.read())
+
+    for label in labels:
+        files_hash.update(str(label).encode())
+
+    return files_hash.hexdigest()
+
 
 def join_splitted_models(path, trajectory_name):
     with open(path + trajectory_name.replace('*', "all"), 'w') as f:
@@ -231,6 +277,11 @@ def writeLambdaTitle(lambda_object):
     print()
 
 
+def writeLambdaStage(messages, lambda_object):
+    for message in messages:
+        print("{} ({})".format(message, lambda_object))
+
+
 def printCommandTitle(label):
     print()
     for i in range(0, len(str(label)) + 2):
@@ -10,6 +10,7 @@ from FreeEnergy.InputFileParser import InputFileParser
 from FreeEnergy.CommandTypes.EmptyCommand import EmptyCommand
 from FreeEnergy.Analysis import FEPAnalysis
 
+from FEP_PELE.FreeEnergy.Constants import ESTIMATORS_LIST
 from FEP_PELE.Utils.InOut import printCommandTitle
 
 
@@ -21,21 +22,44 @@ def parseArguments():
     parser.add_argument('-d', '--divisions', metavar='INTEGER', type=int,
                         default=1, help='Number of divisions to calculate ' +
                         'standard deviation')
+    parser.add_argument('-e', '--estimator', metavar='NAME', type=str,
+                        default=None, choices=ESTIMATORS_LIST,
+                        help='Free energy estimator, one of ' +
+                        '{}. '.format(', '.join(ESTIMATORS_LIST)) +
+                        'Defaults to the one in the input file')
+    parser.add_argument('-b', '--bootstrap', metavar='INTEGER', type=int,
+                        default=None, help='Number of bootstrap resamples ' +
+                        'to calculate confidence intervals, 0 disables ' +
+                        'them. Defaults to the one in the input file')
+    parser.add_argument('-p', '--processes', metavar='INTEGER', type=int,
+                        default=1, help='Number of processes that ' +
+                        'resample lambda windows in parallel')
 
     args = parser.parse_args()
 
     path_to_input_file = args.input_file[0]
     divisions = args.divisions
+    estimator = args.estimator
+    bootstrap_samples = args.bootstrap
+    processes = args.processes
 
-    return path_to_input_file, divisions
+    return path_to_input_file, divisions, estimator, bootstrap_samples, \
+        processes
 
 
 def main():
-    path_to_input_file, divisions = parseArguments()
+    path_to_input_file, divisions, estimator, bootstrap_samples, \
+        processes = parseArguments()
 
     inputFileParser = InputFileParser(path_to_input_file)
     settings = inputFileParser.createSettings()
 
+    if (estimator is None):
+        estimator = settings.estimator
+
+    if (bootstrap_samples is None):
+        bootstrap_samples = settings.bootstrap_samples
+
     printCommandTitle("FEP-PELE Analysis Script")
 
     com = EmptyCommand(settings, path=settings.calculation_path)
@@ -48,7 +72,10 @@ def main():
 
     analysis = FEPAnalysis.FEPAnalysis(
         lambda_folders, com.settings.sampling_method,
-        divisions=max(1, int((settings.parallel_PELE_runs - 1) / 2)))
+        divisions=max(1, int((settings.parallel_PELE_runs - 1) / 2)),
+        estimator=estimator, bootstrap_samples=bootstrap_samples,
+        block_size=settings.bootstrap_block_size, processes=processes,
+        sampled_steps=com._getSampledStepsByWindow(lambda_folders))
 
     print(" - Plotting energetic histogram")
 
@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+
+
+# Python imports
+import os
+import glob
+import json
+import random
+
+import pytest
+
+
+# FEP_PELE imports
+from FEP_PELE.FreeEnergy.InputFileParser import InputFileParser
+from FEP_PELE.FreeEnergy.CommandsBuilder import CommandsBuilder
+
+from FEP_PELE.TemplateHandler.AlchemicalTemplateCreator import \
+    AlchemicalTemplateCreator
+
+from FEP_PELE.TemplateHandler.Headers import HEADER_OPLS2005
+from FEP_PELE.TemplateHandler.Patterns import PATTERN_OPLS2005_RESX_HEADER
+from FEP_PELE.TemplateHandler.Patterns import PATTERN_OPLS2005_RESX_LINE
+from FEP_PELE.TemplateHandler.Patterns import PATTERN_OPLS2005_NBON
+from FEP_PELE.TemplateHandler.Patterns import PATTERN_OPLS2005_BOND
+from FEP_PELE.TemplateHandler.Patterns import PATTERN_OPLS2005_THETA
+
+
+# Script information
+__author__ = "Marti Municoy"
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Marti Municoy"
+__email__ = "marti.municoy@bsc.es"
+
+
+# Constant definitions
+FAKE_PELE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              "fakePELE.py")
+
+
+# Function definitions
+@pytest.fixture
+def fake_pele(monkeypatch):
+    monkeypatch.setenv("FAKE_PELE_STEP_TIME", "0.001")
+    monkeypatch.setenv("FAKE_PELE_TRAJECTORIES", "2")
+
+    return FAKE_PELE_PATH
+
+
+# Ligand atoms: name, parent, type, sigma, epsilon and charge
+INITIAL_LIGAND_ATOMS = [("_C1_", 0, "CT", 3.5, 0.066, -0.18),
+                        ("_C2_", 1, "CT", 3.5, 0.066, 0.12),
+                        ("_H1_", 2, "HC", 2.5, 0.030, 0.06)]
+FINAL_LIGAND_ATOMS = INITIAL_LIGAND_ATOMS[:2] + \
+    [("_H1_", 2, "HC", 2.5, 0.030, 0.08),
+     ("_C3_", 2, "CT", 3.5, 0.066, -0.02)]
+INITIAL_BONDS = [(1, 2, 268., 1.529), (2, 3, 340., 1.09)]
+FINAL_BONDS = INITIAL_BONDS + [(2, 4, 268., 1.529), ]
+INITIAL_THETAS = [(1, 2, 3, 37.5, 110.7), ]
+FINAL_THETAS = INITIAL_THETAS + [(1, 2, 4, 58.35, 112.7),
+                                 (3, 2, 4, 37.5, 110.7)]
+
+# PDB atoms: name, coordinates and element
+LIGAND_PDB_ATOMS = [(" C1 ", (0., 0., 0.), "C"), (" C2 ", (1.5, 0., 0.), "C"),
+                    (" H1 ", (2., 1., 0.), "H"), (" C3 ", (2., -1.4, 0.), "C")]
+PROTEIN_PDB_ATOMS = [(" N  ", (5., 5., 5.), "N"), (" CA ", (6., 5., 5.), "C"),
+                     (" C  ", (7., 5., 5.), "C")]
+PDB_ATOM_LINE = "{:6}{:5d} {:4} {:3} {:1}{:4d}    {:8.3f}{:8.3f}{:8.3f}" + \
+    "{:6.2f}{:6.2f}          {:>2}  \n"
+SAMPLING_REPORT_HEADER = "#Task    Step    numberOfAcceptedPeleSteps    " + \
+    "currentEnergy\n"
+
+PROJECT_LAMBDAS = (0.0, 0.5, 1.0)
+PROJECT_TRAJECTORIES = 2
+
+
+def getTemplate(atoms, bonds, thetas):
+    template = HEADER_OPLS2005 + PATTERN_OPLS2005_RESX_HEADER.format(
+        "LIG", len(atoms), len(bonds), len(thetas), 0, 0)
+
+    for i, (name, parent, atom_type, sigma, epsilon, charge) in \
+            enumerate(atoms):
+        template += PATTERN_OPLS2005_RESX_LINE.format(
+            i + 1, parent, 'M', atom_type, name, 0, 1.0, 0.0, 0.0)
+
+    template += "NBON\n"
+    for i, (name, parent, atom_type, sigma, epsilon, charge) in \
+            enumerate(atoms):
+        template += PATTERN_OPLS2005_NBON.format(
+            i + 1, sigma, epsilon, charge, 1.5, 0.5, 0.005, 1.0)
+
+    template += "BOND\n"
+    for bond in bonds:
+        template += PATTERN_OPLS2005_BOND.format(*bond)
+
+    template += "THET\n"
+    for theta in thetas:
+        template += PATTERN_OPLS2005_THETA.format(*theta)
+
+    return template + "PHI\nIPHI\nEND"
+
+
+def getAlchemicalTemplateCreator(path, explicit_is_final=True):
+    with open(path + "initial", 'w') as template_file:
+        template_file.write(getTemplate(INITIAL_LIGAND_ATOMS, INITIAL_BONDS,
+                                        INITIAL_THETAS))
+
+    with open(path + "final", 'w') as template_file:
+        template_file.write(getTemplate(FINAL_LIGAND_ATOMS, FINAL_BONDS,
+                                        FINAL_THETAS))
+
+    # The state with the unique atoms is the explicit one
+    if (explicit_is_final):
+        return AlchemicalTemplateCreator(path + "initial", path + "final")
+    return AlchemicalTemplateCreator(path + "final", path + "initial")
+
+
+def getPDB(ligand_atoms, number_of_ligand_atoms=4, protein=True):
+    pdb = ""
+
+    if (protein):
+        for i, (name, coords, element) in enumerate(PROTEIN_PDB_ATOMS):
+            pdb += PDB_ATOM_LINE.format("ATOM", i + 1, name, "ALA", 'A', 1,
+                                        *coords, 1.0, 0.0, element)
+        pdb += "TER\n"
+
+    for i, (name, coords, element) in \
+            enumerate(ligand_atoms[:number_of_ligand_atoms]):
+        pdb += PDB_ATOM_LINE.format("HETATM", i + 4, name, "LIG", 'L', 1,
+                                    *coords, 1.0, 0.0, element)
+
+    return pdb + "TER\n"
+
+
+def moveLigand(ligand_atoms, random_state):
+    return [(name, tuple(c + random_state.uniform(-0.2, 0.2)
+                         for c in coords), element)
+            for name, coords, element in ligand_atoms]
+
+
+def writeSampling(path, random_state, number_of_models=3):
+    # Every trajectory starts from the same structure and its third model
+    # repeats the second one, as if a step was rejected
+    for trajectory_id in range(1, PROJECT_TRAJECTORIES + 1):
+        report = SAMPLING_REPORT_HEADER
+        trajectory = ""
+        step = 0
+        ligand_atoms = LIGAND_PDB_ATOMS
+
+        for model_id in range(0, number_of_models + trajectory_id):
+            if ((model_id > 0) and (model_id != 2)):
+                ligand_atoms = moveLigand(LIGAND_PDB_ATOMS, random_state)
+
+            trajectory += "MODEL     {:4d}\n".format(model_id + 1) + \
+                getPDB(ligand_atoms) + "ENDMDL\nEND   \n"
+            report += "{}    {}    {}    {:.4f}\n".format(
+                trajectory_id, step, model_id,
+                -100 + random_state.uniform(-3, 3))
+            step += random_state.randint(1, 4)
+
+        with open(path + "report_{}.out".format(trajectory_id), 'w') as f:
+            f.write(report)
+
+        with open(path + "trajectory_{}.pdb".format(trajectory_id),
+                  'w') as f:
+            f.write(trajectory)
+
+
+def buildProject(path, lambdas=PROJECT_LAMBDAS, splitted=False,
+                 settings_lines=()):
+    # A minimal alchemical project whose samplings are already done, PELE
+    # is replaced by the fake one
+    for folder in ("DataLocal/Templates/OPLS2005/HeteroAtoms/", "Data/",
+                   "Documents/", "initial/", "final/"):
+        os.makedirs(path + folder)
+
+    with open(path + "initial/ligz", 'w') as template_file:
+        template_file.write(getTemplate(INITIAL_LIGAND_ATOMS, INITIAL_BONDS,
+                                        INITIAL_THETAS))
+
+    with open(path + "final/ligz", 'w') as template_file:
+        template_file.write(getTemplate(FINAL_LIGAND_ATOMS, FINAL_BONDS,
+                                        FINAL_THETAS))
+
+    for name, number_of_ligand_atoms, protein in (
+            ("complex.pdb", 4, True), ("initial_lig.pdb", 3, False),
+            ("final_lig.pdb", 4, False)):
+        with open(path + name, 'w') as pdb_file:
+            pdb_file.write(getPDB(LIGAND_PDB_ATOMS, number_of_ligand_atoms,
+                                  protein))
+
+    single_point = {
+        "simulationLogPath": "$LOG_PATH$",
+        "Initialization": {
+            "Complex": {"files": [{"path": "$INPUT_PDB_NAME$"}]},
+            "Solvent": {"solventType": "$SOLVENT_TYPE$"}},
+        "commands": [{"commandType": "peleSimulation",
+                      "PELE_Parameters": {"numberOfPeleSteps": 0}}]}
+
+    with open(path + "sp.conf", 'w') as control_file:
+        json.dump(single_point, control_file, indent=2)
+
+    single_point["commands"][0]["PELE_Output"] = {
+        "trajectoryPath": "$TRAJECTORY_PATH$"}
+    single_point["commands"][0]["selectionToPerturb"] = {
+        "atoms": {"ids": ["$ATOMS_TO_MINIMIZE$"]}}
+
+    with open(path + "pp.conf", 'w') as control_file:
+        control_file.write(json.dumps(single_point, indent=2).replace(
+            "\"$ATOMS_TO_MINIMIZE$\"", "$ATOMS_TO_MINIMIZE$"))
+
+    if (splitted):
+        folders = ["1_Steric/", "2_Coulombic/"]
+        lambdas_lines = ["StericLambdas " + ','.join(map(str, lambdas)),
+                         "CoulombicLambdas " + ','.join(map(str, lambdas))]
+    else:
+        folders = ["", ]
+        lambdas_lines = ["Lambdas " + ','.join(map(str, lambdas)), ]
+
+    random_state = random.Random(7)
+    for folder in folders:
+        for lambda_value in lambdas:
+            sampling_path = path + "simulation/" + folder + \
+                str(float(lambda_value)) + '/'
+            os.makedirs(sampling_path)
+            writeSampling(sampling_path, random_state)
+
+    lines = ["GeneralPath " + path,
+             "SerialPelePath " + FAKE_PELE_PATH,
+             "MPIPelePath " + FAKE_PELE_PATH,
+             "InitialTemplate " + path + "initial/ligz",
+             "FinalTemplate " + path + "final/ligz",
+             "SamplingMethod DoubleWide",
+             "NumberOfProcessors 2",
+             "TotalPELESteps 20",
+             "SinglePointControlFile " + path + "sp.conf",
+             "PostProcessingControlFile " + path + "pp.conf",
+             "InitialLigandPDB " + path + "initial_lig.pdb",
+             "FinalLigandPDB " + path + "final_lig.pdb",
+             "InputPDB " + path + "complex.pdb",
+             "Commands dECalculation"] + lambdas_lines + list(settings_lines)
+
+    with open(path + "input.conf", 'w') as input_file:
+        input_file.write('\n'.join(lines) + '\n')
+
+    return InputFileParser(path + "input.conf").createSettings()
+
+
+@pytest.fixture
+def fep_project(tmpdir, monkeypatch, fake_pele):
+    # Default folders are relative to the working directory, and commands
+    # move to the general path anyway. The original one is restored
+    # afterwards
+    def build(name="project", **kwargs):
+        path = str(tmpdir) + '/' + name + '/'
+        os.makedirs(path)
+        monkeypatch.chdir(path)
+
+        return buildProject(path, **kwargs)
+
+    return build
+
+
+def runCommands(settings):
+    for command in CommandsBuilder(settings).createCommands():
+        command.run()
+
+
+def getReports(path, pattern="**/report_*.out"):
+    # Report contents by their path relative to the calculation folder
+    reports = {}
+
+    for report_path in glob.glob(path + pattern, recursive=True):
+        with open(report_path, 'r') as report_file:
+            reports[os.path.relpath(report_path, path)] = \
+                report_file.read()
+
+    return reports
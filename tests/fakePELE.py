@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+# Python imports
+import os
+import sys
+import glob
+import json
+import math
+import time
+import random
+import argparse
+
+
+# Script information
+__author__ = "Marti Municoy"
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Marti Municoy"
+__email__ = "marti.municoy@bsc.es"
+
+
+# Constant definitions
+# Stand-in for the PELE executable, so workflows can be run locally without
+# it. Single points print an energy that depends on the ligand coordinates
+# and on the heteroatom template found in the working directory, so it
+# changes with lambda. Simulations write a Metropolis walk of the ligand to
+# their reports and trajectories while they run. The walk is restrained
+# harmonically and the reported energies are the ones single points give for
+# the written models
+ENERGY_LINE = "ENERGY VACUUM + SGB + CONSTRAINTS + SELF + NON POLAR: " + \
+    "{:.6f}"
+REPORT_FIRST_LINE = "#Task    Step    numberOfAcceptedPeleSteps    " + \
+    "currentEnergy\n"
+REPORT_LINE = "{}    {}    {}    {:.4f}\n"
+RANK_VARIABLES = ("OMPI_COMM_WORLD_RANK", "PMI_RANK", "SLURM_PROCID")
+HARMONIC_CONSTANT = 2.
+KBT = 0.5925
+TEMPLATES_PATH = "DataLocal/Templates/OPLS2005/HeteroAtoms/"
+
+
+# Function definitions
+def parseArguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('control_file', metavar='PATH', type=str, nargs=1,
+                        help='Path to PELE control file')
+    parser.add_argument('-t', '--step-time', metavar='SECONDS', type=float,
+                        default=float(os.environ.get("FAKE_PELE_STEP_TIME",
+                                                     0)),
+                        help='Time spent by each simulation step')
+    parser.add_argument('-n', '--trajectories', metavar='INTEGER', type=int,
+                        default=int(os.environ.get("FAKE_PELE_TRAJECTORIES",
+                                                   1)),
+                        help='Trajectories of each simulation, when it is ' +
+                        'not launched through MPI')
+
+    args = parser.parse_args()
+
+    return args.control_file[0], args.step_time, args.trajectories
+
+
+def getRank():
+    for variable in RANK_VARIABLES:
+        if (variable in os.environ):
+            return int(os.environ[variable])
+
+    return None
+
+
+def getOutputPath(path, trajectory_id):
+    # PELE appends the trajectory id to the name of its output files
+    root, extension = os.path.splitext(path)
+
+    return root + '_' + str(trajectory_id) + extension
+
+
+def readStructure(path):
+    with open(path, 'r') as pdb_file:
+        return [line for line in pdb_file
+                if line.startswith(("ATOM", "HETATM", "TER"))]
+
+
+def readTemplateParameters():
+    # Sigmas and charges of the first template, in the order of its atoms
+    templates = sorted(glob.glob(TEMPLATES_PATH + '*'))
+
+    if (len(templates) == 0):
+        return []
+
+    parameters = []
+    with open(templates[0], 'r') as template_file:
+        section = None
+        for line in template_file:
+            if (line[:4] in ("NBON", "BOND", "THET", "PHI", "IPHI", "END")):
+                section = line[:4]
+            elif (section == "NBON"):
+                fields = line.split()
+                parameters.append((float(fields[1]), float(fields[3])))
+
+    return parameters
+
+
+def calculateEnergy(structure, parameters=()):
+    energy = 0.
+
+    ligand_lines = [line for line in structure if line.startswith("HETATM")]
+
+    for i, line in enumerate(ligand_lines):
+        x, y, z = (float(line[30:38]), float(line[38:46]),
+                   float(line[46:54]))
+        energy += 0.3 * x + 0.2 * y + 0.1 * z + 0.01 * x * y * z
+
+        if (i < len(parameters)):
+            sigma, charge = parameters[i]
+            energy += 0.1 * sigma + 3. * charge * x
+
+    return energy
+
+
+def moveStructure(structure, displacement):
+    # Ligand atoms are displaced along the x axis
+    moved_structure = []
+
+    for line in structure:
+        if (line.startswith("HETATM")):
+            line = line[:30] + "{:8.3f}".format(
+                float(line[30:38]) + displacement) + line[38:]
+        moved_structure.append(line)
+
+    return moved_structure
+
+
+def runSinglePoint(command, input_path, parameters):
+    structure = readStructure(input_path)
+
+    output_path = command.get("PELE_Output", {}).get("trajectoryPath")
+    if (output_path is not None):
+        with open(output_path, 'w') as output_file:
+            output_file.writelines(structure)
+            output_file.write("END\n")
+
+    print(ENERGY_LINE.format(calculateEnergy(structure, parameters)))
+
+
+def runSimulation(command, input_path, parameters, number_of_steps,
+                  step_time, trajectory_ids, seed):
+    structure = readStructure(input_path)
+    output = command["PELE_Output"]
+
+    report_files = {}
+    trajectory_files = {}
+    states = {}
+
+    for trajectory_id in trajectory_ids:
+        report_files[trajectory_id] = open(
+            getOutputPath(output["reportPath"], trajectory_id), 'w')
+        report_files[trajectory_id].write(REPORT_FIRST_LINE)
+
+        trajectory_path = output.get("trajectoryPath")
+        if (trajectory_path is not None):
+            trajectory_files[trajectory_id] = open(
+                getOutputPath(trajectory_path, trajectory_id), 'w')
+
+        states[trajectory_id] = (random.Random(seed + trajectory_id), 0.,
+                                 calculateEnergy(structure, parameters), 0)
+
+    # Trajectories advance in lockstep, every accepted step is written
+    # right away as PELE does
+    for step in range(0, number_of_steps + 1):
+        for trajectory_id in trajectory_ids:
+            generator, position, energy, accepted = states[trajectory_id]
+
+            if (step == 0):
+                new_position = position
+            else:
+                new_position = round(position + generator.gauss(0., 0.5), 3)
+
+            new_structure = moveStructure(structure, new_position)
+            new_energy = calculateEnergy(new_structure, parameters)
+
+            delta = new_energy - energy + HARMONIC_CONSTANT * \
+                (new_position ** 2 - position ** 2)
+
+            if ((step > 0) and (delta > 0) and
+                    (generator.random() > math.exp(- delta / KBT))):
+                continue
+
+            report_files[trajectory_id].write(REPORT_LINE.format(
+                trajectory_id, step, accepted, new_energy))
+            report_files[trajectory_id].flush()
+
+            if (trajectory_id in trajectory_files):
+                trajectory_file = trajectory_files[trajectory_id]
+                trajectory_file.write("MODEL     {:4d}\n".format(accepted + 1))
+                trajectory_file.writelines(new_structure)
+                trajectory_file.write("ENDMDL\n")
+                trajectory_file.flush()
+
+            states[trajectory_id] = (generator, new_position, new_energy,
+                                     accepted + 1)
+
+        time.sleep(step_time)
+
+    for opened_file in list(report_files.values()) + \
+            list(trajectory_files.values()):
+        opened_file.close()
+
+
+def main():
+    control_file_path, step_time, number_of_trajectories = parseArguments()
+
+    # Tests count PELE calls through this file
+    if ("FAKE_PELE_CALLS" in os.environ):
+        with open(os.environ["FAKE_PELE_CALLS"], 'a') as calls_file:
+            calls_file.write(control_file_path + '\n')
+
+    with open(control_file_path, 'r') as control_file:
+        control = json.load(control_file)
+
+    rank = getRank()
+    if (rank is None):
+        trajectory_ids = range(1, number_of_trajectories + 1)
+    else:
+        trajectory_ids = [rank + 1, ]
+
+    parameters = readTemplateParameters()
+
+    for command in control["commands"]:
+        initialization = command.get("Initialization",
+                                     control.get("Initialization"))
+        input_path = initialization["Complex"]["files"][0]["path"]
+
+        number_of_steps = int(command.get("PELE_Parameters", {}).get(
+            "numberOfPeleSteps", 0))
+        seed = int(command.get("RandomGenerator", {}).get("seed", 0))
+
+        if ((number_of_steps > 0) and
+                ("reportPath" in command.get("PELE_Output", {}))):
+            runSimulation(command, input_path, parameters, number_of_steps,
+                          step_time, trajectory_ids, seed)
+        else:
+            runSinglePoint(command, input_path, parameters)
+
+    sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
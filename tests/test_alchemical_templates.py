@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+
+# Python imports
+import pytest
+
+
+# FEP_PELE imports
+from FEP_PELE.TemplateHandler import AlchemicalTemplateCreator as atc
+from FEP_PELE.TemplateHandler.Combiner import CombineLinearly
+from FEP_PELE.TemplateHandler.Lambda import Lambda
+from FEP_PELE.TemplateHandler.Lambda import DUAL_LAMBDA, STERIC_LAMBDA, \
+    COULOMBIC_LAMBDA
+
+from conftest import getAlchemicalTemplateCreator
+
+
+# Script information
+__author__ = "Marti Municoy"
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Marti Municoy"
+__email__ = "marti.municoy@bsc.es"
+
+
+# Constant definitions
+LAMBDA_PAIRS = [((DUAL_LAMBDA, 0.0), None),
+                ((DUAL_LAMBDA, 0.25), None),
+                ((DUAL_LAMBDA, 0.5), None),
+                ((DUAL_LAMBDA, 1.0), None),
+                ((STERIC_LAMBDA, 0.3), (COULOMBIC_LAMBDA, 0.0)),
+                ((STERIC_LAMBDA, 0.8), (COULOMBIC_LAMBDA, 1.0)),
+                ((COULOMBIC_LAMBDA, 0.6), (STERIC_LAMBDA, 1.0))]
+
+
+# Function definitions
+def combineLinearly(creator, template, _lambda):
+    # Parameter combination as it was done before ParametersVector
+    fragment_atoms = atc.detect_fragment_atoms(template,
+                                               creator.implicit_template)
+    atc.set_fragment_atoms(fragment_atoms)
+    atc.set_fragment_bonds(atc.detect_fragment_bonds(fragment_atoms,
+                                                     template))
+    atc.set_fragment_thetas(atc.detect_fragment_thetas(fragment_atoms,
+                                                       template))
+
+    combiner = CombineLinearly(template, _lambda.value, [], [], [],
+                               creator.explicit_is_final)
+
+    if (_lambda.type in (DUAL_LAMBDA, STERIC_LAMBDA)):
+        combiner.combine_sigmas()
+        combiner.combine_epsilons()
+        combiner.combine_radnpSGB()
+        combiner.combine_radnpType()
+        combiner.combine_SGBNPGamma()
+        combiner.combine_SGBNPType()
+        combiner.combine_BondSprings()
+        combiner.combine_BondEqDist()
+        combiner.combine_ThetaSprings()
+
+    if (_lambda.type in (DUAL_LAMBDA, COULOMBIC_LAMBDA)):
+        combiner.combine_charges()
+
+    return combiner.get_resulting_template()
+
+
+def getLambdas(lambda_pair):
+    (lambda_type, value), constant = lambda_pair
+    lambdas = [Lambda(value, lambda_type=lambda_type), ]
+
+    if (constant is not None):
+        lambdas.insert(0, Lambda(constant[1], lambda_type=constant[0]))
+
+    return lambdas
+
+
+def readFile(path):
+    with open(path, 'rb') as read_file:
+        return read_file.read()
+
+
+@pytest.mark.parametrize("explicit_is_final", [True, False])
+def test_vectors_match_linear_combiner(tmpdir, explicit_is_final):
+    path = str(tmpdir) + '/'
+    old_creator = getAlchemicalTemplateCreator(path, explicit_is_final)
+    new_creator = getAlchemicalTemplateCreator(path, explicit_is_final)
+
+    assert new_creator.explicit_is_final == explicit_is_final
+
+    for i, lambda_pair in enumerate(LAMBDA_PAIRS):
+        template = old_creator.explicit_template
+        for _lambda in getLambdas(lambda_pair):
+            template = combineLinearly(old_creator, template, _lambda)
+            new_creator.applyLambda(_lambda)
+
+        template.write_template_to_file(
+            template_new_name=path + "old_{}".format(i))
+        new_creator.writeAlchemicalTemplate(path + "new_{}".format(i))
+        new_creator.reset()
+
+        assert readFile(path + "new_{}".format(i)) == \
+            readFile(path + "old_{}".format(i))
+
+
+def test_alchemical_template_is_rebuilt_after_lambda_changes(tmpdir):
+    path = str(tmpdir) + '/'
+    creator = getAlchemicalTemplateCreator(path, True)
+
+    assert creator.alchemicalTemplate is creator.explicit_template
+
+    creator.applyLambda(Lambda(0.5))
+    template = creator.alchemicalTemplate
+
+    assert creator.alchemicalTemplate is template
+    assert template is not creator.explicit_template
+    assert template.write_template() == creator.renderAlchemicalTemplate()
+
+    creator.applyLambda(Lambda(0.25, lambda_type=COULOMBIC_LAMBDA))
+
+    assert creator.alchemicalTemplate is not template
+    assert creator.alchemicalTemplate.write_template() == \
+        creator.renderAlchemicalTemplate()
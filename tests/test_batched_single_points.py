@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+
+
+# Python imports
+import json
+import asyncio
+
+import pytest
+
+
+# FEP_PELE imports
+from FEP_PELE.FreeEnergy.CommandTypes.dECalculation import dECalculation
+
+from FEP_PELE.PELETools import PELEConstants as pele_co
+from FEP_PELE.PELETools.PELEResult import PELEResult
+from FEP_PELE.PELETools.ControlFileCreator import \
+    BatchedControlFileFromTemplateCreator
+
+from FEP_PELE.Utils.InOut import create_directory
+
+from conftest import runCommands
+from conftest import getReports
+
+
+# Script information
+__author__ = "Marti Municoy"
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Marti Municoy"
+__email__ = "marti.municoy@bsc.es"
+
+
+# Constant definitions
+SINGLE_POINT_TEMPLATE = {
+    "simulationLogPath": "$LOG_PATH$",
+    "Initialization": {
+        "Complex": {"files": [{"path": "$INPUT_PDB_NAME$"}]},
+        "Solvent": {"solventType": "$SOLVENT_TYPE$"}},
+    "commands": [{"commandType": "peleSimulation"}]}
+
+
+# Class definitions
+class WrongEnergiesRunner(object):
+    # It always prints a single energy, no matter how many models it gets
+    async def runAsync(self, control_file_path, cwd=None):
+        result = PELEResult([control_file_path, ])
+        result.parseLine(pele_co.ENERGY_RESULT_LINE + " 1.0")
+        result.finish(0, 0.)
+        return result
+
+
+# Function definitions
+def test_batched_control_file_has_one_command_per_model(tmpdir):
+    path = str(tmpdir) + '/'
+
+    with open(path + "sp.conf", 'w') as template_file:
+        json.dump(SINGLE_POINT_TEMPLATE, template_file)
+
+    builder = BatchedControlFileFromTemplateCreator(path + "sp.conf")
+    builder.replaceFlag("SOLVENT_TYPE", "VACUUM")
+    builder.replaceFlag("LOG_PATH", path + "logfile.txt")
+    for pdb_name in ("model_1.pdb", "model_2.pdb", "model_3.pdb"):
+        builder.addModel(path + pdb_name)
+
+    assert builder.number_of_models == 3
+
+    builder.write(path + "batch.conf")
+
+    with open(path + "batch.conf", 'r') as control_file:
+        control = json.load(control_file)
+
+    assert control["simulationLogPath"] == path + "logfile.txt"
+    assert len(control["commands"]) == 3
+
+    for command, pdb_name in zip(control["commands"],
+                                 ("model_1.pdb", "model_2.pdb",
+                                  "model_3.pdb")):
+        initialization = command["Initialization"]
+        assert initialization["Complex"]["files"][0]["path"] == \
+            path + pdb_name
+        assert initialization["Solvent"]["solventType"] == "VACUUM"
+
+
+def test_batched_control_file_requires_json_template(tmpdir):
+    path = str(tmpdir) + '/'
+
+    with open(path + "sp.conf", 'w') as template_file:
+        template_file.write("$INPUT_PDB_NAME$ is not JSON\n")
+
+    builder = BatchedControlFileFromTemplateCreator(path + "sp.conf")
+    builder.addModel(path + "model_1.pdb")
+
+    with pytest.raises(NameError):
+        builder.write(path + "batch.conf")
+
+
+def test_batched_energies_match_single_points(fep_project, tmpdir,
+                                              monkeypatch):
+    reports = []
+    calls = []
+
+    for batch_size in (1, 4):
+        calls_path = str(tmpdir) + "/calls_{}.txt".format(batch_size)
+        monkeypatch.setenv("FAKE_PELE_CALLS", calls_path)
+
+        settings = fep_project(
+            name="batch_{}".format(batch_size),
+            settings_lines=["SinglePointBatchSize {}".format(batch_size), ])
+
+        runCommands(settings)
+
+        reports.append(getReports(settings.calculation_path))
+
+        with open(calls_path, 'r') as calls_file:
+            calls.append(len(calls_file.readlines()))
+
+    assert len(reports[0]) > 0
+    assert reports[0] == reports[1]
+    assert calls[1] < calls[0]
+
+
+def test_batched_energies_fall_back_when_counts_differ(fep_project):
+    settings = fep_project()
+    command = dECalculation(settings)
+    create_directory(command.path)
+
+    pdb_names = [settings.general_path + "complex.pdb",
+                 settings.general_path + "final_lig.pdb"]
+
+    energies = asyncio.run(command._calculateBatchedEnergies(
+        WrongEnergiesRunner(), 0, pdb_names,
+        command.path + "logfile.txt"))
+
+    assert energies is None
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+
+# Python imports
+import numpy as np
+import pytest
+
+
+# FEP_PELE imports
+from FEP_PELE.FreeEnergy import Constants as co
+from FEP_PELE.FreeEnergy.Analysis.Calculators import exponentialAveraging
+from FEP_PELE.FreeEnergy.Analysis.Calculators import \
+    bootstrapExponentialAveraging
+
+
+# Script information
+__author__ = "Marti Municoy"
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Marti Municoy"
+__email__ = "marti.municoy@bsc.es"
+
+
+# Constant definitions
+TEMPERATURE = 300.
+NUMBER_OF_UNITS = 7
+NUMBER_OF_SAMPLES = 50
+SEED = 3
+
+
+# Function definitions
+@pytest.fixture
+def unit_energies():
+    random_state = np.random.default_rng(4)
+
+    energies = []
+    weights = []
+    for unit in range(0, NUMBER_OF_UNITS):
+        size = random_state.integers(5, 30)
+        energies.append(random_state.normal(unit * 0.1, 0.8, size))
+        weights.append(random_state.integers(1, 6, size))
+
+    return energies, weights
+
+
+def naiveBootstrap(energies, weights):
+    # Every resample concatenates the energies of its units
+    random_state = np.random.default_rng(SEED)
+    indices = random_state.integers(0, NUMBER_OF_UNITS,
+                                    (NUMBER_OF_SAMPLES, NUMBER_OF_UNITS))
+
+    return np.array([exponentialAveraging(
+        np.concatenate([energies[unit] for unit in resample]), TEMPERATURE,
+        np.concatenate([weights[unit] for unit in resample]))
+        for resample in indices])
+
+
+def runBootstrap(energies, weights):
+    units = np.concatenate([np.full(len(unit_energies), unit)
+                            for unit, unit_energies in enumerate(energies)])
+
+    return bootstrapExponentialAveraging(
+        np.concatenate(energies), units, NUMBER_OF_UNITS, NUMBER_OF_SAMPLES,
+        TEMPERATURE, weights=np.concatenate(weights), seed=SEED)
+
+
+def test_bootstrap_matches_naive_resampling(unit_energies):
+    energies, weights = unit_energies
+
+    assert runBootstrap(energies, weights) == \
+        pytest.approx(naiveBootstrap(energies, weights), abs=1e-10)
+
+
+def test_bootstrap_chunks_do_not_change_resamples(unit_energies,
+                                                  monkeypatch):
+    energies, weights = unit_energies
+
+    # Three resamples per chunk
+    monkeypatch.setattr(co, "BOOTSTRAP_CHUNK_ELEMENTS", 3 * NUMBER_OF_UNITS)
+
+    assert runBootstrap(energies, weights) == \
+        pytest.approx(naiveBootstrap(energies, weights), abs=1e-10)
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+
+# Python imports
+import os
+import json
+
+
+# FEP_PELE imports
+from FEP_PELE.FreeEnergy import Constants as co
+from FEP_PELE.FreeEnergy.CostModel import CostModel
+from FEP_PELE.FreeEnergy.Scheduler import Scheduler
+
+from conftest import runCommands
+
+
+# Script information
+__author__ = "Marti Municoy"
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Marti Municoy"
+__email__ = "marti.municoy@bsc.es"
+
+
+# Function definitions
+def test_expected_costs_scale_with_size(tmpdir):
+    cost_model = CostModel(str(tmpdir) + "/costs.json")
+    short_key = cost_model.getKey("dE", "Dual", "original")
+    long_key = cost_model.getKey("dE", "Dual", "shifted")
+
+    # Without timings, costs are the sizes themselves
+    assert cost_model.getExpectedCost(short_key, 3) == 3.
+
+    cost_model.record(short_key, 4, 2.)
+    cost_model.record(short_key, 4, 6.)
+    cost_model.record(long_key, 2, 10.)
+    cost_model.record(long_key, 0, 100.)
+
+    assert cost_model.getExpectedCost(short_key, 2) == 2.
+    assert cost_model.getExpectedCost(long_key, 2) == 10.
+
+    # Unknown tasks get the average cost per unit of size
+    assert cost_model.getExpectedCost("unknown", 5) == 9.
+
+
+def test_timings_are_saved_and_loaded(tmpdir):
+    path = str(tmpdir) + "/costs.json"
+    cost_model = CostModel(path)
+    cost_model.record("key", 2, 3.)
+    cost_model.save()
+
+    assert CostModel(path).getExpectedCost("key", 4) == 6.
+    assert [name for name in os.listdir(str(tmpdir))] == ["costs.json", ]
+
+    with open(path, 'w') as timings_file:
+        timings_file.write("{ not json")
+
+    assert CostModel(path).timings == {}
+
+
+def test_longest_tasks_run_first(tmpdir):
+    cost_model = CostModel(str(tmpdir) + "/costs.json")
+    cost_model.record("slow", 1, 10.)
+    cost_model.record("fast", 1, 1.)
+
+    engine = co.EXECUTION_ENGINES_DICT["ASYNCIO"]
+    scheduler = Scheduler(1, cost_model, engine=engine)
+    order = []
+
+    scheduler.addTask(order.append, ("fast_1", ), cost_key="fast", size=1)
+    scheduler.addTask(order.append, ("slow", ), cost_key="slow", size=1)
+    scheduler.addTask(order.append, ("fast_8", ), cost_key="fast", size=8)
+    scheduler.addTask(order.append, ("light", ))
+
+    scheduler.run()
+
+    # Tasks without a cost unlock the rest of the graph, so they go first
+    assert order == ["light", "slow", "fast_8", "fast_1"]
+    assert os.path.isfile(str(tmpdir) + "/costs.json")
+
+
+def test_timings_survive_the_calculation_cleanup(fep_project):
+    settings = fep_project()
+
+    runCommands(settings)
+
+    assert not os.path.exists(settings.calculation_path + co.TASK_COSTS_NAME)
+
+    with open(settings.general_path + co.TASK_COSTS_NAME) as timings_file:
+        timings = json.load(timings_file)
+
+    assert len(timings) > 0
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+
+# Python imports
+import os
+import glob
+
+import numpy as np
+
+
+# FEP_PELE imports
+from FEP_PELE.TemplateHandler import Lambda
+from FEP_PELE.Tools.Math import lagrangeInterpolation
+
+from conftest import runCommands
+
+
+# Script information
+__author__ = "Marti Municoy"
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Marti Municoy"
+__email__ = "marti.municoy@bsc.es"
+
+
+# Constant definitions
+# Sampled lambdas that are not anchors, so their energies are interpolated
+LAMBDAS = (0.0, 0.3, 0.8, 1.0)
+
+
+# Function definitions
+def getSidecars(path, lambda_type):
+    sidecars = {}
+
+    for sidecar_path in glob.glob(path + "?_" + lambda_type + "/*/*.npy"):
+        sidecars[os.path.relpath(sidecar_path, path)] = np.load(sidecar_path)
+
+    return sidecars
+
+
+def test_lagrange_interpolation_of_a_quadratic():
+    anchors = (0.0, 0.5, 1.0)
+    values = [[2. + 3. * x - 4. * x ** 2, -x ** 2] for x in anchors]
+
+    for x in (0.0, 0.3, 0.8, 1.0):
+        assert np.allclose(lagrangeInterpolation(anchors, values, x),
+                           [2. + 3. * x - 4. * x ** 2, -x ** 2])
+
+
+def test_reconstruction_matches_explicit_energies(fep_project):
+    sidecars = []
+
+    for reconstruction in (False, True):
+        settings = fep_project(
+            name="reconstruction_{}".format(reconstruction), lambdas=LAMBDAS,
+            splitted=True,
+            settings_lines=["CoulombicReconstruction {}".format(
+                reconstruction), ])
+
+        runCommands(settings)
+
+        sidecars.append(getSidecars(settings.calculation_path,
+                                    Lambda.COULOMBIC_LAMBDA))
+
+    explicit_sidecars, reconstructed_sidecars = sidecars
+
+    # Shifted lambdas that are not anchors are reconstructed too
+    assert "2_Coulombic/0.8_0.55/report_1.npy" in explicit_sidecars
+    assert explicit_sidecars.keys() == reconstructed_sidecars.keys()
+
+    for name, rows in explicit_sidecars.items():
+        assert np.allclose(rows[:, :4], reconstructed_sidecars[name][:, :4])
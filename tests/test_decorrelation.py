@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+
+# Python imports
+import numpy as np
+
+
+# FEP_PELE imports
+from FEP_PELE.FreeEnergy.Analysis.Calculators import getDecorrelatedIndices
+from FEP_PELE.FreeEnergy.CommandTypes.dECalculation import dECalculation
+
+from conftest import runCommands
+from conftest import getReports
+
+
+# Script information
+__author__ = "Marti Municoy"
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Marti Municoy"
+__email__ = "marti.municoy@bsc.es"
+
+
+# Function definitions
+def getCorrelatedSeries(size, seed=3):
+    # First order autoregressive series, whose values are correlated along
+    # a few models
+    random_state = np.random.default_rng(seed)
+    noise = random_state.normal(size=size)
+
+    values = np.zeros(size)
+    for index in range(1, size):
+        values[index] = 0.9 * values[index - 1] + noise[index]
+
+    return values
+
+
+def test_uncorrelated_models_are_mostly_kept():
+    values = np.random.default_rng(5).normal(size=100)
+
+    indices = getDecorrelatedIndices(values, np.ones(100, dtype=int))
+
+    # Inefficiencies of finite series are slightly above one
+    assert len(indices) >= 90
+    assert len(np.unique(indices)) == len(indices)
+
+
+def test_correlated_models_are_strided():
+    values = getCorrelatedSeries(1000)
+
+    indices = getDecorrelatedIndices(values, np.ones(1000, dtype=int))
+
+    assert 0 < len(indices) < 500
+    assert np.all(np.diff(indices) > 1)
+
+    # Models that last the same number of steps are picked alike
+    assert getDecorrelatedIndices(values, np.full(1000, 7)).tolist() == \
+        indices.tolist()
+
+
+def test_long_lived_models_are_not_expanded():
+    # Expanding these models into their time series would not fit in
+    # memory
+    values = getCorrelatedSeries(1000)
+    multiplicities = np.full(1000, 10 ** 12)
+    multiplicities[::2] = 0
+
+    indices = getDecorrelatedIndices(values, multiplicities)
+
+    assert len(indices) > 0
+    assert np.all(multiplicities[indices] > 0)
+    assert getDecorrelatedIndices([], []).tolist() == []
+
+
+def test_sampled_steps_are_only_read_to_decorrelate(fep_project,
+                                                    monkeypatch):
+    def getSampledSteps(command, simulation_path):
+        raise AssertionError("Models are not decorrelated")
+
+    monkeypatch.setattr(dECalculation, "_getSampledSteps", getSampledSteps)
+
+    # Patched methods can not be sent to process workers
+    settings = fep_project(settings_lines=["ExecutionEngine AsyncIO", ])
+    runCommands(settings)
+
+    assert len(getReports(settings.calculation_path)) > 0
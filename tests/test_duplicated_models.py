@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+
+
+# Python imports
+import os
+import random
+
+
+# FEP_PELE imports
+from FEP_PELE.FreeEnergy.EnergyCache import EnergyCache
+from FEP_PELE.FreeEnergy.CommandTypes.dECalculation import dECalculation
+from FEP_PELE.PELETools.SimulationParser import Simulation
+
+from conftest import runCommands
+from conftest import getReports
+from conftest import writeSampling
+
+
+# Script information
+__author__ = "Marti Municoy"
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Marti Municoy"
+__email__ = "marti.municoy@bsc.es"
+
+
+# Constant definitions
+# Both trajectories start from the same structure and repeat their second
+# model, so only 6 out of their 9 models are unique
+PROJECT_MODELS = 9
+UNIQUE_MODELS = 6
+
+
+# Function definitions
+def getModelNames(path):
+    simulation = Simulation(path, sim_type="PELE", report_name="report_",
+                            trajectory_name="trajectory_",
+                            logfile_name="logFile_")
+    simulation.getOutputFiles()
+
+    model_names = []
+    for report in simulation.iterateOverReports:
+        names = [path + "{}-{}".format(model_id, report.trajectory.name)
+                 for model_id in range(report.trajectory.models.number)]
+        report.trajectory.splitModels(names)
+        model_names += names
+
+    return sorted(model_names)
+
+
+def countCalls(calls_path):
+    with open(calls_path, 'r') as calls_file:
+        return len(calls_file.readlines())
+
+
+def test_duplicates_point_to_their_first_model(fep_project, tmpdir):
+    command = dECalculation(fep_project())
+    path = str(tmpdir) + '/models/'
+    os.makedirs(path)
+    writeSampling(path, random.Random(1))
+
+    model_names = getModelNames(path)
+    duplicates = command._findDuplicatedModels(model_names)
+
+    assert len(model_names) == PROJECT_MODELS
+    assert len(model_names) - len(duplicates) == UNIQUE_MODELS
+    assert duplicates[path + "2-trajectory_1.pdb"] == \
+        path + "1-trajectory_1.pdb"
+    assert duplicates[path + "0-trajectory_2.pdb"] == \
+        path + "0-trajectory_1.pdb"
+    assert set(duplicates.values()).isdisjoint(duplicates)
+
+
+def test_duplicates_are_evaluated_once(fep_project, tmpdir, monkeypatch):
+    # Without the energy cache, every model that is not a duplicate is sent
+    # to PELE
+    monkeypatch.setattr(EnergyCache, "getEnergies",
+                        lambda cache, keys: [None, ] * len(keys))
+
+    outputs = []
+    calls = []
+
+    for name in ("deduplicated", "all_models"):
+        if (name == "all_models"):
+            monkeypatch.setattr(dECalculation, "_findDuplicatedModels",
+                                lambda command, model_names: {})
+
+        calls_path = str(tmpdir) + "/calls_{}.txt".format(name)
+        monkeypatch.setenv("FAKE_PELE_CALLS", calls_path)
+
+        # Patched methods can not be sent to process workers
+        settings = fep_project(
+            name=name, settings_lines=["SinglePointBatchSize 1",
+                                       "ExecutionEngine AsyncIO"])
+
+        runCommands(settings)
+
+        outputs.append((getReports(settings.calculation_path),
+                        getReports(settings.calculation_path,
+                                   "**/*trajectory_*.pdb")))
+        calls.append(countCalls(calls_path))
+
+    # Duplicated models get the energies and the shifted structures of
+    # their representatives
+    assert len(outputs[0][0]) > 0
+    assert len(outputs[0][1]) > 0
+    assert outputs[0] == outputs[1]
+    assert calls[0] * PROJECT_MODELS == calls[1] * UNIQUE_MODELS
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+
+# Python imports
+import types
+import itertools
+
+
+# FEP_PELE imports
+from FEP_PELE.FreeEnergy import EnergyCache as cache_module
+from FEP_PELE.FreeEnergy.EnergyCache import EnergyCache
+
+from conftest import getPDB
+from conftest import LIGAND_PDB_ATOMS
+
+
+# Script information
+__author__ = "Marti Municoy"
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Marti Municoy"
+__email__ = "marti.municoy@bsc.es"
+
+
+# Function definitions
+def getCache(tmpdir, monkeypatch, max_size=2):
+    # Every access happens one second after the previous one
+    clock = itertools.count()
+    monkeypatch.setattr(cache_module, "time",
+                        types.SimpleNamespace(time=lambda: next(clock)))
+
+    return EnergyCache(str(tmpdir) + "/cache.db", max_size)
+
+
+def test_least_recently_used_energies_are_evicted(tmpdir, monkeypatch):
+    cache = getCache(tmpdir, monkeypatch)
+
+    cache.addEnergies(["a", "b"], [1., 2.], 4.)
+
+    # Reading an energy makes it the most recently used one
+    assert cache.getEnergies(["a", ]) == [1., ]
+
+    cache.addEnergies(["c", ], [3., ], 1.)
+
+    assert cache.getEnergies(["a", "b", "c"]) == [1., None, 3.]
+
+
+def test_stats(tmpdir, monkeypatch):
+    cache = getCache(tmpdir, monkeypatch, max_size=10)
+
+    # The elapsed time of a run is shared by all its structures
+    cache.addEnergies(["a", "b"], [1., 2.], 4.)
+    cache.getEnergies(["a", "b", "c"])
+    cache.getEnergies(["b", "d"])
+
+    assert cache.getStats() == {"hits": 3, "misses": 2,
+                                "seconds_saved": 6.}
+
+    cache.resetStats()
+
+    assert cache.getStats() == {"hits": 0, "misses": 0,
+                                "seconds_saved": 0}
+
+    # Stats are kept in the database, so every connection shares them
+    cache.getEnergies(["a", ])
+
+    assert EnergyCache(cache.path, 10).getStats()["hits"] == 1
+
+
+def test_keys_depend_on_structure_and_context(tmpdir):
+    path = str(tmpdir) + '/'
+    cache = EnergyCache(path + "cache.db", 10)
+
+    for name, pdb in (("ligand", getPDB(LIGAND_PDB_ATOMS)),
+                      ("same_ligand", getPDB(LIGAND_PDB_ATOMS)),
+                      ("smaller_ligand", getPDB(LIGAND_PDB_ATOMS, 3))):
+        with open(path + name + ".pdb", 'w') as pdb_file:
+            pdb_file.write(pdb)
+
+    with open(path + "template", 'w') as template_file:
+        template_file.write("template")
+
+    context = cache.getContext((path + "template", ), ("VACUUM", ))
+    other_context = cache.getContext((path + "template", ), ("OBC", ))
+
+    assert cache.getKey(context, path + "ligand.pdb") == \
+        cache.getKey(context, path + "same_ligand.pdb")
+    assert cache.getKey(context, path + "ligand.pdb") != \
+        cache.getKey(context, path + "smaller_ligand.pdb")
+    assert cache.getKey(context, path + "ligand.pdb") != \
+        cache.getKey(other_context, path + "ligand.pdb")
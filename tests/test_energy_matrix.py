@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+
+# Python imports
+import types
+import threading
+
+
+# FEP_PELE imports
+from FEP_PELE.FreeEnergy import EnergyMatrix as matrix_module
+from FEP_PELE.FreeEnergy.EnergyMatrix import EnergyMatrix
+
+
+# Script information
+__author__ = "Marti Municoy"
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Marti Municoy"
+__email__ = "marti.municoy@bsc.es"
+
+
+# Function definitions
+def getConnectionFromThread(matrix):
+    connections = []
+    thread = threading.Thread(
+        target=lambda: connections.append(matrix.connection))
+    thread.start()
+    thread.join()
+
+    return connections[0]
+
+
+def test_connections_are_keyed_by_path_pid_and_thread(tmpdir, monkeypatch):
+    path = str(tmpdir) + '/'
+    matrix = EnergyMatrix(path + "matrix.db")
+    connection = matrix.connection
+
+    assert EnergyMatrix(path + "matrix.db").connection is connection
+    assert EnergyMatrix(path + "other_matrix.db").connection is not \
+        connection
+    assert getConnectionFromThread(matrix) is not connection
+
+    # Forked workers can not reuse the connections of their parent
+    monkeypatch.setattr(matrix_module, "os", types.SimpleNamespace(
+        getpid=lambda: -1))
+
+    assert matrix.connection is not connection
+
+
+def test_structures_are_dropped_with_their_cells(tmpdir):
+    matrix = EnergyMatrix(str(tmpdir) + "/matrix.db")
+    matrix.setContext("window", "context")
+
+    for report in ("report_1", "report_2"):
+        matrix.setFingerprint("window", 0.5, report, "sampling")
+        matrix.addCells("window", 0.5, 0.0, report, [0, 1], [1., 2.],
+                        [0., 0.])
+        matrix.addStructures("window", 0.5, 0.0, report, [0, 1],
+                             ["MODEL 0", "MODEL 1"])
+
+    assert matrix.getStructure("window", 0.5, 0.0, "report_1", 1) == \
+        "MODEL 1"
+
+    # A resampled report loses its structures
+    matrix.setFingerprint("window", 0.5, "report_1", "resampling")
+
+    assert matrix.getStructuresByModel("window", 0.5, 0.0,
+                                       "report_1") == {}
+    assert matrix.getStructuresByModel("window", 0.5, 0.0,
+                                       "report_2") == {0: "MODEL 0",
+                                                       1: "MODEL 1"}
+
+    # And so do all the reports of a window whose context changes
+    matrix.setContext("window", "other_context")
+
+    assert matrix.getStructure("window", 0.5, 0.0, "report_2", 0) is None
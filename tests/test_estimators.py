@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+
+
+# Python imports
+import math
+
+import numpy as np
+import pytest
+
+
+# FEP_PELE imports
+from FEP_PELE.FreeEnergy import Constants as co
+from FEP_PELE.FreeEnergy.Analysis.Calculators import exponentialAveraging
+from FEP_PELE.FreeEnergy.Analysis.Calculators import \
+    calculateThermodynamicAverage
+from FEP_PELE.FreeEnergy.Analysis.Calculators import zwanzigEquation
+from FEP_PELE.FreeEnergy.Analysis.Calculators import bennettAcceptanceRatio
+from FEP_PELE.FreeEnergy.Analysis.Calculators import \
+    multistateBennettAcceptanceRatio
+
+
+# Script information
+__author__ = "Marti Municoy"
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Marti Municoy"
+__email__ = "marti.municoy@bsc.es"
+
+
+# Constant definitions
+TEMPERATURE = 300.
+KBT = co.BOLTZMANN_CONSTANT_IN_KCAL_MOL * TEMPERATURE
+
+# Harmonic states U(x) = k / 2 x^2 + c, whose free energy differences are
+# kBT / 2 log(k1 / k0) + c1 - c0
+HARMONIC_STATES = [(1., 0.), (2., 0.35), (4., 0.7)]
+SAMPLES_PER_STATE = 5000
+
+
+# Function definitions
+def getHarmonicEnergy(state, positions):
+    constant, offset = HARMONIC_STATES[state]
+
+    return constant / 2. * positions ** 2 + offset
+
+
+def getExactFreeEnergy(initial_state, final_state):
+    initial_constant, initial_offset = HARMONIC_STATES[initial_state]
+    final_constant, final_offset = HARMONIC_STATES[final_state]
+
+    return KBT / 2. * math.log(final_constant / initial_constant) + \
+        final_offset - initial_offset
+
+
+def sampleHarmonicState(state, random_state):
+    constant = HARMONIC_STATES[state][0]
+
+    return random_state.normal(0., math.sqrt(KBT / constant),
+                               SAMPLES_PER_STATE)
+
+
+@pytest.fixture
+def harmonic_samples():
+    random_state = np.random.default_rng(1)
+
+    return [sampleHarmonicState(state, random_state)
+            for state in range(0, len(HARMONIC_STATES))]
+
+
+def getBARWorks(samples, initial_state, final_state):
+    initial_positions = samples[initial_state]
+    final_positions = samples[final_state]
+
+    forward_works = getHarmonicEnergy(final_state, initial_positions) - \
+        getHarmonicEnergy(initial_state, initial_positions)
+    reverse_works = getHarmonicEnergy(initial_state, final_positions) - \
+        getHarmonicEnergy(final_state, final_positions)
+
+    return forward_works, reverse_works
+
+
+def getMBARData(samples):
+    positions = np.concatenate(samples)
+    states = np.concatenate([np.full(len(state_samples), state)
+                             for state, state_samples in enumerate(samples)])
+    energies = np.transpose([getHarmonicEnergy(state, positions)
+                             for state in range(0, len(samples))])
+
+    return energies, states
+
+
+def test_bar_recovers_harmonic_free_energy(harmonic_samples):
+    forward_works, reverse_works = getBARWorks(harmonic_samples, 0, 2)
+
+    energy, stdev = bennettAcceptanceRatio(forward_works, reverse_works,
+                                           TEMPERATURE)
+
+    assert 0 < stdev < 0.05
+    assert energy == pytest.approx(getExactFreeEnergy(0, 2),
+                                   abs=4 * stdev)
+
+
+def test_mbar_recovers_harmonic_free_energy(harmonic_samples):
+    energies, states = getMBARData(harmonic_samples)
+
+    energy, stdev = multistateBennettAcceptanceRatio(energies, states,
+                                                     TEMPERATURE)
+
+    assert 0 < stdev < 0.05
+    assert energy == pytest.approx(getExactFreeEnergy(0, 2),
+                                   abs=4 * stdev)
+
+
+def test_bar_and_mbar_agree_for_two_states(harmonic_samples):
+    samples = [harmonic_samples[0], harmonic_samples[2]]
+    forward_works, reverse_works = getBARWorks(harmonic_samples, 0, 2)
+
+    bar_energy = bennettAcceptanceRatio(forward_works, reverse_works,
+                                        TEMPERATURE)[0]
+
+    energies = np.transpose([getHarmonicEnergy(0, np.concatenate(samples)),
+                             getHarmonicEnergy(2, np.concatenate(samples))])
+    states = np.repeat([0, 1], SAMPLES_PER_STATE)
+
+    mbar_energy = multistateBennettAcceptanceRatio(energies, states,
+                                                   TEMPERATURE)[0]
+
+    # Their asymptotic deviations come from different expressions, so only
+    # the free energies are compared
+    assert mbar_energy == pytest.approx(bar_energy, abs=1e-6)
+
+
+def test_weighted_estimators_match_expanded_ones(harmonic_samples):
+    random_state = np.random.default_rng(2)
+    forward_works, reverse_works = getBARWorks(harmonic_samples, 0, 1)
+    forward_weights = random_state.integers(1, 5, len(forward_works))
+    reverse_weights = random_state.integers(1, 5, len(reverse_works))
+
+    weighted = bennettAcceptanceRatio(
+        forward_works, reverse_works, TEMPERATURE,
+        forward_weights=forward_weights, reverse_weights=reverse_weights)
+    expanded = bennettAcceptanceRatio(
+        np.repeat(forward_works, forward_weights),
+        np.repeat(reverse_works, reverse_weights), TEMPERATURE)
+
+    assert weighted == pytest.approx(expanded, abs=1e-8)
+
+    energies, states = getMBARData(harmonic_samples)
+    weights = random_state.integers(1, 5, len(states))
+
+    weighted = multistateBennettAcceptanceRatio(energies, states,
+                                                TEMPERATURE, weights)
+    expanded = multistateBennettAcceptanceRatio(
+        np.repeat(energies, weights, axis=0), np.repeat(states, weights),
+        TEMPERATURE)
+
+    assert weighted == pytest.approx(expanded, abs=1e-8)
+
+    weighted = exponentialAveraging(forward_works, TEMPERATURE,
+                                    forward_weights)
+    expanded = exponentialAveraging(
+        np.repeat(forward_works, forward_weights), TEMPERATURE)
+
+    assert weighted == pytest.approx(expanded, abs=1e-10)
+
+
+def test_exponential_averaging_does_not_overflow():
+    energies = [-1000., -995., 10.]
+    weights = [1., 2., 0.]
+
+    # exp(1000 / kBT) is far beyond the float range
+    assert math.isinf(calculateThermodynamicAverage(energies, TEMPERATURE,
+                                                    weights))
+    assert exponentialAveraging(energies, TEMPERATURE, weights) == \
+        pytest.approx(-1000. - KBT * math.log(
+            (1. + 2. * math.exp(- 5. / KBT)) / 3.))
+
+    # Within the float range, the Zwanzig equation of the average matches
+    energies = [-1., 0.5, 2.]
+
+    assert zwanzigEquation(calculateThermodynamicAverage(
+        energies, TEMPERATURE), TEMPERATURE) == \
+        pytest.approx(exponentialAveraging(energies, TEMPERATURE))
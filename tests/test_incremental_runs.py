@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+
+# Python imports
+import os
+import re
+import glob
+import random
+
+import pytest
+
+
+# FEP_PELE imports
+from conftest import runCommands
+from conftest import writeSampling
+
+
+# Script information
+__author__ = "Marti Municoy"
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Marti Municoy"
+__email__ = "marti.municoy@bsc.es"
+
+
+# Constant definitions
+LAMBDAS = (0.0, 0.3, 0.7, 1.0)
+
+
+# Function definitions
+def countModels(path):
+    # Reports have one line per model, after their header, and
+    # trajectories one MODEL record per model. Models that are copied from
+    # the sampling keep their own records, which are not counted
+    counts = {}
+
+    for report_path in glob.glob(path + "**/report_*.out", recursive=True):
+        folder = os.path.dirname(report_path)
+
+        # Only shifted lambdas have trajectories
+        if ("_" not in os.path.basename(folder)):
+            continue
+
+        trajectory_path = folder + "/all-trajectory_" + \
+            report_path.split('_')[-1].replace(".out", ".pdb")
+
+        with open(report_path, 'r') as report_file:
+            report_models = len(report_file.readlines()) - 1
+
+        trajectory_models = 0
+        if (os.path.isfile(trajectory_path)):
+            with open(trajectory_path, 'r') as trajectory_file:
+                trajectory_models = sum(
+                    re.match(r"MODEL \d+$", line) is not None
+                    for line in trajectory_file.readlines())
+
+        counts[os.path.relpath(report_path, path)] = (report_models,
+                                                      trajectory_models)
+
+    return counts
+
+
+@pytest.mark.parametrize("splitted, settings_lines", [
+    (False, []), (True, ["CoulombicReconstruction True", ])])
+def test_trajectories_match_reports_in_incremental_runs(
+        fep_project, splitted, settings_lines):
+    settings = fep_project(lambdas=LAMBDAS, splitted=splitted,
+                           settings_lines=settings_lines)
+    runCommands(settings)
+
+    # Only the models of the resampled lambda are calculated again, the
+    # rest of them come from the energy matrix
+    for sampling_path in glob.glob(settings.simulation_path + "**/0.3/",
+                                   recursive=True):
+        writeSampling(sampling_path, random.Random(3), number_of_models=4)
+
+    for run in range(0, 2):
+        runCommands(settings)
+        counts = countModels(settings.calculation_path)
+
+        assert len(counts) > 0
+        for report_models, trajectory_models in counts.values():
+            assert report_models == trajectory_models
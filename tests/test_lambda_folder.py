@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+
+
+# Python imports
+import os
+
+import numpy as np
+
+
+# FEP_PELE imports
+from FEP_PELE.Tools.LambdaFolder import LambdaFolder
+from FEP_PELE.FreeEnergy.EnergyMatrix import EnergyMatrix
+from FEP_PELE.FreeEnergy.Analysis.Calculators import exponentialAveraging
+
+
+# Script information
+__author__ = "Marti Municoy"
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Marti Municoy"
+__email__ = "marti.municoy@bsc.es"
+
+
+# Constant definitions
+REPORT_HEADER = "#Task    Step    numberOfAcceptedPeleSteps    " + \
+    "currentEnergy    RMSD\n"
+TOTAL_PELE_STEPS = 12
+
+# Steps, initial energies and final energies of the models of each report.
+# The last two models of the second report were accepted at the same step
+REPORTS = {"report_1.out": ([0, 3, 4, 9], [-10., -11., -9.5, -10.5],
+                            [-9., -10.5, -9., -11.]),
+           "report_2.out": ([0, 6, 6], [-12., -11.5, -11.],
+                            [-11., -12., -10.])}
+
+
+# Function definitions
+def writeReport(path, report_name, steps, energies):
+    os.makedirs(path, exist_ok=True)
+
+    with open(path + report_name, 'w') as report_file:
+        report_file.write(REPORT_HEADER)
+        for model_id, (step, energy) in enumerate(zip(steps, energies)):
+            report_file.write("1    {}    {}    {}    0.0\n".format(
+                step, model_id, energy))
+
+
+def buildLambdaFolder(path, energy_matrix=None):
+    for report_name, (steps, i_energies, f_energies) in REPORTS.items():
+        for folder, energies in (("0.0/", i_energies),
+                                 ("0.0_0.5/", f_energies)):
+            writeReport(path + folder, report_name, steps, energies)
+
+    return LambdaFolder(path + "0.0_0.5/", total_PELE_steps=TOTAL_PELE_STEPS,
+                        energy_matrix=energy_matrix, window="window")
+
+
+def getExpandedDeltaEnergies():
+    # Every PELE step repeats the last accepted model
+    delta_energies = []
+
+    for steps, i_energies, f_energies in REPORTS.values():
+        for model_id, step in enumerate(steps):
+            if (model_id + 1 < len(steps)):
+                next_step = steps[model_id + 1]
+            else:
+                next_step = TOTAL_PELE_STEPS + 1
+
+            delta_energies += [f_energies[model_id] -
+                               i_energies[model_id]] * (next_step - step)
+
+    return delta_energies
+
+
+def test_delta_energies_are_weighted_by_multiplicity(tmpdir):
+    path = str(tmpdir) + '/'
+    lambda_folder = buildLambdaFolder(path)
+
+    values, multiplicities = lambda_folder.getDeltaEnergyValuesByFile()[
+        path + "0.0_0.5/report_2.out"]
+
+    # Models that were replaced at the same step are dropped, and the last
+    # one lasts until the end of the sampling
+    assert values.tolist() == [1., 1.]
+    assert multiplicities.tolist() == [6, 7]
+
+    values, multiplicities = lambda_folder.getDeltaEnergyValues()
+
+    assert len(values) == len(multiplicities) == 6
+    assert np.sum(multiplicities) == 2 * (TOTAL_PELE_STEPS + 1)
+    assert sorted(np.repeat(values, multiplicities).tolist()) == \
+        sorted(getExpandedDeltaEnergies())
+
+    # Weighted averages match the ones of the expanded time series
+    assert np.isclose(exponentialAveraging(values, weights=multiplicities),
+                      exponentialAveraging(getExpandedDeltaEnergies()))
+
+
+def test_delta_energies_from_energy_matrix(tmpdir):
+    path = str(tmpdir) + '/'
+    energy_matrix = EnergyMatrix(path + "matrix.db")
+    lambda_folder = buildLambdaFolder(path, energy_matrix)
+
+    # Full precision energies of the matrix are preferred to the reports
+    steps, i_energies, f_energies = REPORTS["report_1.out"]
+    model_ids = list(range(0, len(steps)))
+    energy_matrix.addCells("window", 0.0, 0.0, "report_1.out", model_ids,
+                           [energy + 0.001 for energy in i_energies])
+    energy_matrix.addCells("window", 0.0, 0.5, "report_1.out", model_ids,
+                           [energy + 0.003 for energy in f_energies])
+
+    # Matrices that miss some of the models of a report are ignored
+    energy_matrix.addCells("window", 0.0, 0.0, "report_2.out", [0, ],
+                           [0., ])
+    energy_matrix.addCells("window", 0.0, 0.5, "report_2.out", [0, ],
+                           [0., ])
+
+    values_by_file = lambda_folder.getDeltaEnergyValuesByFile()
+
+    values, multiplicities = values_by_file[path + "0.0_0.5/report_1.out"]
+
+    assert np.allclose(values, np.array(f_energies) - np.array(i_energies) +
+                       0.002)
+    assert multiplicities.tolist() == [3, 1, 5, 4]
+
+    values, multiplicities = values_by_file[path + "0.0_0.5/report_2.out"]
+
+    assert values.tolist() == [1., 1.]
+    assert multiplicities.tolist() == [6, 7]
+
+
+def test_delta_energies_of_an_empty_folder(tmpdir):
+    path = str(tmpdir) + '/'
+    os.makedirs(path + "0.0_0.5/")
+
+    values, multiplicities = LambdaFolder(
+        path + "0.0_0.5/", total_PELE_steps=TOTAL_PELE_STEPS
+    ).getDeltaEnergyValues()
+
+    assert len(values) == len(multiplicities) == 0
+    assert multiplicities.dtype == int
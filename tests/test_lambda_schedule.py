@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+
+# Python imports
+import numpy as np
+import pytest
+
+
+# FEP_PELE imports
+from FEP_PELE.FreeEnergy.InputFileParser import InputFileParser
+from FEP_PELE.FreeEnergy.Analysis.ScheduleOptimizer import ScheduleOptimizer
+from FEP_PELE.TemplateHandler import Lambda
+
+
+# Script information
+__author__ = "Marti Municoy"
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Marti Municoy"
+__email__ = "marti.municoy@bsc.es"
+
+
+# Constant definitions
+SCHEDULE_LAMBDAS = [0.0, 0.2, 0.45, 0.7, 1.0]
+PILOT_LAMBDAS = [0.0, 0.25, 0.5, 0.75, 1.0]
+
+# dE deviation of each pilot window, whose overlap is poor from lambda 0.5
+PILOT_DEVIATIONS = [0.2, 0.2, 1.2, 1.2]
+
+
+# Class definitions
+class SyntheticLambdaFolder(object):
+    # Gaussian dEs of a pilot window, each sampled model lasts one step
+    def __init__(self, initial_lambda, final_lambda, deviation, seed):
+        self.initial_lambda = initial_lambda
+        self.final_lambda = final_lambda
+        self.type = Lambda.DUAL_LAMBDA
+        self.name = "{}_{}".format(initial_lambda, final_lambda)
+        self.path = self.name + '/'
+        self.energies = np.random.default_rng(seed).normal(
+            0., deviation, 2000)
+
+    def __lt__(self, other):
+        return self.initial_lambda < other.initial_lambda
+
+    def getDeltaEnergyValues(self):
+        return self.energies, np.ones(len(self.energies), dtype=int)
+
+
+# Function definitions
+@pytest.mark.parametrize("schedule_first", [True, False])
+def test_schedule_does_not_depend_on_key_order(tmpdir, schedule_first):
+    path = str(tmpdir) + '/'
+
+    with open(path + "lambda_schedule.txt", 'w') as schedule_file:
+        schedule_file.write("# Lambda schedule\n")
+        schedule_file.write("Lambdas {}\n".format(
+            ','.join(str(v) for v in SCHEDULE_LAMBDAS)))
+
+    lines = ["LambdaSchedule lambda_schedule.txt\n",
+             "Lambdas 0.0,0.5,1.0\n"]
+    if (not schedule_first):
+        lines.reverse()
+
+    with open(path + "input.conf", 'w') as input_file:
+        input_file.write("GeneralPath {}\n".format(path))
+        input_file.writelines(lines)
+
+    settings = InputFileParser(path + "input.conf").createSettings()
+
+    assert settings.lambdas == SCHEDULE_LAMBDAS
+
+
+def getOptimizer(skipped_windows=(), target_deviation=0.6):
+    lambda_folders = [
+        SyntheticLambdaFolder(initial_lambda, final_lambda, deviation, seed)
+        for seed, (initial_lambda, final_lambda, deviation) in enumerate(
+            zip(PILOT_LAMBDAS[:-1], PILOT_LAMBDAS[1:], PILOT_DEVIATIONS))
+        if seed not in skipped_windows]
+
+    return ScheduleOptimizer(lambda_folders,
+                             target_deviation=target_deviation)
+
+
+def test_windows_are_denser_where_overlap_is_poor():
+    optimizer = getOptimizer()
+
+    overlaps = [optimizer.statistics[lambda_folder][1]
+                for lambda_folder in sorted(optimizer.statistics)]
+
+    assert max(overlaps[2:]) < min(overlaps[:2])
+
+    lambdas, error = optimizer.getOptimizedLambdas(PILOT_LAMBDAS,
+                                                   Lambda.DUAL_LAMBDA)
+
+    assert lambdas[0] == 0.0
+    assert lambdas[-1] == 1.0
+    assert len([value for value in lambdas if value > 0.5]) > \
+        2 * len([value for value in lambdas if value < 0.5])
+
+    # Descending schedules are optimized alike
+    assert optimizer.getOptimizedLambdas(
+        PILOT_LAMBDAS[::-1], Lambda.DUAL_LAMBDA)[0] == lambdas[::-1]
+
+
+def test_error_estimate_decreases_with_more_windows():
+    lambdas, error = getOptimizer().getOptimizedLambdas(
+        PILOT_LAMBDAS, Lambda.DUAL_LAMBDA)
+    dense_lambdas, dense_error = getOptimizer(
+        target_deviation=0.3).getOptimizedLambdas(
+        PILOT_LAMBDAS, Lambda.DUAL_LAMBDA)
+
+    assert len(dense_lambdas) > len(lambdas)
+    assert 0. < dense_error < error
+
+
+def test_uncovered_intervals_keep_their_pilot_spacing(capsys):
+    # The window with the worst overlap is missing
+    lambdas, error = getOptimizer(skipped_windows=(2, )).getOptimizedLambdas(
+        PILOT_LAMBDAS, Lambda.DUAL_LAMBDA)
+
+    assert "no {} window covers lambdas from 0.5 to 0.75".format(
+        Lambda.DUAL_LAMBDA) in capsys.readouterr().out
+    assert 0.5 in lambdas
+    assert 0.75 in lambdas
+    assert not any(0.5 < value < 0.75 for value in lambdas)
+    assert any(0.75 < value < 1.0 for value in lambdas)
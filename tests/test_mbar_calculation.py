@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+
+
+# Python imports
+import pytest
+
+
+# FEP_PELE imports
+from FEP_PELE.FreeEnergy.Analysis import FEPAnalysis
+
+from conftest import runCommands
+
+
+# Script information
+__author__ = "Marti Municoy"
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Marti Municoy"
+__email__ = "marti.municoy@bsc.es"
+
+
+# Constant definitions
+LAMBDAS = (0.0, 0.3, 0.7, 1.0)
+
+
+# Function definitions
+@pytest.mark.parametrize("splitted, settings_lines", [
+    (False, []), (True, []), (True, ["CoulombicReconstruction True", ])])
+def test_mbar_gets_a_complete_energy_matrix(fep_project, monkeypatch,
+                                            splitted, settings_lines):
+    solved_states = []
+
+    def multistateBennettAcceptanceRatio(energies, states, *args):
+        solved_states.append(energies.shape[1])
+        return 0., 0.
+
+    def BARResults(analysis, lambda_folders=None):
+        raise AssertionError("BAR was used instead of MBAR")
+
+    monkeypatch.setattr(FEPAnalysis, "multistateBennettAcceptanceRatio",
+                        multistateBennettAcceptanceRatio)
+    monkeypatch.setattr(FEPAnalysis.FEPAnalysis, "_BARResults", BARResults)
+
+    settings = fep_project(
+        lambdas=LAMBDAS, splitted=splitted,
+        settings_lines=["Estimator MBAR",
+                        "Commands ExponentialAveraging"] + settings_lines)
+
+    runCommands(settings)
+
+    # Every window type is solved at once with all its sampled lambdas
+    if (splitted):
+        assert solved_states == [len(LAMBDAS), len(LAMBDAS)]
+    else:
+        assert solved_states == [len(LAMBDAS), ]
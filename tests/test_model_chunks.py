@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+
+# Python imports
+from collections import defaultdict
+
+
+# FEP_PELE imports
+from FEP_PELE.FreeEnergy.Scheduler import Scheduler
+from FEP_PELE.FreeEnergy.CommandTypes.dECalculation import dECalculation
+
+from conftest import runCommands
+from conftest import getReports
+from conftest import PROJECT_LAMBDAS, PROJECT_TRAJECTORIES
+
+
+# Script information
+__author__ = "Marti Municoy"
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Marti Municoy"
+__email__ = "marti.municoy@bsc.es"
+
+
+# Constant definitions
+# Trajectories of the test project have 4 and 5 models
+PROJECT_MODELS = 9
+
+
+# Function definitions
+def test_chunks_keep_every_model_in_order(fep_project):
+    settings = fep_project(settings_lines=["SinglePointBatchSize 3", ])
+    command = dECalculation(settings)
+    model_names = ["model_{}".format(i) for i in range(8)]
+
+    chunks = command._getModelChunks(model_names)
+
+    assert [len(chunk) for chunk in chunks] == [3, 3, 2]
+    assert sum(chunks, []) == model_names
+    assert command._getModelChunks([]) == []
+
+
+def test_tasks_are_split_by_models(fep_project, monkeypatch):
+    settings = fep_project(settings_lines=["SinglePointBatchSize 2", ])
+    sizes = defaultdict(list)
+    run = Scheduler.run
+
+    def recordTasks(scheduler):
+        for task in scheduler.tasks:
+            if (task.cost_key is not None):
+                sizes[task.function.__name__].append(task.size)
+        run(scheduler)
+
+    monkeypatch.setattr(Scheduler, "run", recordTasks)
+
+    runCommands(settings)
+
+    original_sizes = sizes["_parallelOriginalEnergiesCalculator"]
+
+    # Parallelism depends on the number of models, not on the number of
+    # trajectories
+    assert max(original_sizes) == 2
+    assert len(original_sizes) > len(PROJECT_LAMBDAS) * PROJECT_TRAJECTORIES
+    assert sum(original_sizes) == len(PROJECT_LAMBDAS) * PROJECT_MODELS
+    assert max(sizes["_parallelShiftedLambdaLoop"]) == 2
+
+    # Results are gathered back by report
+    reports = getReports(settings.calculation_path)
+
+    assert len(reports) == \
+        (len(PROJECT_LAMBDAS) + 2) * PROJECT_TRAJECTORIES
+    for report_path, content in reports.items():
+        trajectory_id = int(report_path.split('_')[-1].split('.')[0])
+        # The header and one line per model of the trajectory
+        assert len(content.strip().split('\n')) == 1 + 3 + trajectory_id
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+
+# Python imports
+import pytest
+
+
+# FEP_PELE imports
+from FEP_PELE.FreeEnergy import Constants as co
+from FEP_PELE.FreeEnergy.Settings import Settings
+
+from FEP_PELE.PELETools import PELERunner as runners
+from FEP_PELE.PELETools import PELEConstants as pele_co
+
+from conftest import FAKE_PELE_PATH
+
+
+# Script information
+__author__ = "Marti Municoy"
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Marti Municoy"
+__email__ = "marti.municoy@bsc.es"
+
+
+# Function definitions
+@pytest.fixture
+def clean_runners(monkeypatch):
+    # Process-wide caches start empty for every test
+    monkeypatch.setattr(runners, "_CHECKED_EXECUTABLES", set())
+    monkeypatch.setattr(runners, "_SRUN_AVAILABLE", None)
+    monkeypatch.setattr(runners, "_RUNNERS", {})
+
+
+def setSRun(monkeypatch, available):
+    calls = []
+
+    def which(name):
+        calls.append(name)
+        if (available):
+            return "/usr/bin/" + name
+        return None
+
+    monkeypatch.setattr(runners.shutil, "which", which)
+
+    return calls
+
+
+@pytest.mark.parametrize("launcher, srun, expected_launcher", [
+    (pele_co.AUTO_LAUNCHER, True, ["srun", "-n", "4"]),
+    (pele_co.AUTO_LAUNCHER, False, ["mpirun", "-n", "4"]),
+    (pele_co.SRUN_LAUNCHER, False, ["srun", "-n", "4"]),
+    (pele_co.MPIRUN_LAUNCHER, True, ["mpirun", "-n", "4"]),
+    (pele_co.SERIAL_LAUNCHER, True, []),
+    ("taskset -c 0-3", True, ["taskset", "-c", "0-3"])])
+def test_launchers(clean_runners, monkeypatch, launcher, srun,
+                   expected_launcher):
+    setSRun(monkeypatch, srun)
+
+    runner = runners.PELERunner(FAKE_PELE_PATH, number_of_processors=4,
+                                launcher=launcher)
+
+    assert runner.getArguments("pele.conf") == \
+        expected_launcher + [FAKE_PELE_PATH, "pele.conf"]
+
+
+def test_serial_runs_ignore_the_launcher(clean_runners, monkeypatch):
+    setSRun(monkeypatch, True)
+
+    runner = runners.PELERunner(FAKE_PELE_PATH,
+                                launcher=pele_co.SRUN_LAUNCHER)
+
+    assert runner.getArguments("pele.conf") == [FAKE_PELE_PATH, "pele.conf"]
+
+
+def test_launcher_is_detected_once(clean_runners, monkeypatch):
+    calls = setSRun(monkeypatch, True)
+    checked_files = []
+    monkeypatch.setattr(runners, "checkFile", checked_files.append)
+
+    for number_of_processors in (1, 2, 2):
+        runners.PELERunner(FAKE_PELE_PATH,
+                           number_of_processors=number_of_processors)
+
+    assert calls == ["srun", ]
+    assert checked_files == [FAKE_PELE_PATH, ]
+
+
+def test_runners_are_reused(clean_runners, monkeypatch):
+    setSRun(monkeypatch, False)
+
+    runner = runners.getPELERunner(FAKE_PELE_PATH)
+
+    assert runners.getPELERunner(FAKE_PELE_PATH) is runner
+    assert runners.getPELERunner(FAKE_PELE_PATH,
+                                 number_of_processors=2) is not runner
+    assert runners.getPELERunner(
+        FAKE_PELE_PATH, launcher=pele_co.MPIRUN_LAUNCHER) is not runner
+
+
+def test_missing_executable(clean_runners, tmpdir):
+    with pytest.raises(SystemExit):
+        runners.PELERunner(str(tmpdir) + "/missing_PELE")
+
+
+def test_launcher_setting():
+    settings = Settings()
+    key = co.CONTROL_FILE_DICT["PELE_LAUNCHER"]
+
+    settings.set(key, ["python", "-u"])
+
+    assert settings.pele_launcher == "python -u"
+
+    with pytest.raises(SystemExit):
+        settings.set(key, ["not_a_launcher_executable", ])
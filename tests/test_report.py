@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+
+
+# Python imports
+import os
+
+import numpy as np
+
+
+# FEP_PELE imports
+from FEP_PELE.PELETools import PELEConstants as pele_co
+from FEP_PELE.PELETools.SimulationParser import Report
+from FEP_PELE.Utils.InOut import write_energies_report
+from FEP_PELE.Utils.InOut import getEnergiesSidecarPath
+from FEP_PELE.Tools.LambdaFolder import getReportMetrics
+
+
+# Script information
+__author__ = "Marti Municoy"
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Marti Municoy"
+__email__ = "marti.municoy@bsc.es"
+
+
+# Constant definitions
+REPORT = "#Task    Step    numberOfAcceptedPeleSteps    currentEnergy    " + \
+    "RMSD\n" + \
+    "1    0    0    -10.5    0.0\n" + \
+    "1    3    1    -11.25    0.4\n" + \
+    "1    4    2    -9.75    0.7\n" + \
+    "1    9    3    -10.0    1.1\n"
+
+
+# Function definitions
+def getReport(path, content=REPORT):
+    with open(path + "report_1.out", 'w') as report_file:
+        report_file.write(content)
+
+    return Report(path, "report_1.out", "report_", None)
+
+
+def test_metric_by_column_number(tmpdir):
+    report = getReport(str(tmpdir) + '/')
+
+    steps = report.getMetric(pele_co.REPORT_STEPS_COLUMN)
+    energies = report.getMetric(pele_co.REPORT_TOTAL_ENERGY_COLUMN)
+
+    assert isinstance(energies, np.ndarray)
+    assert steps.tolist() == [0, 3, 4, 9]
+    assert energies.tolist() == [-10.5, -11.25, -9.75, -10.0]
+
+
+def test_metric_by_name_matches_its_column(tmpdir):
+    report = getReport(str(tmpdir) + '/')
+
+    assert report.getMetric(metric_name="currentEnergy").tolist() == \
+        report.getMetric(pele_co.REPORT_TOTAL_ENERGY_COLUMN).tolist()
+    assert report.getMetric(metric_name="#Task").tolist() == [1, 1, 1, 1]
+    assert report.getMetric(metric_name="RMSD").tolist() == \
+        [0.0, 0.4, 0.7, 1.1]
+
+
+def test_metric_skips_inactive_models(tmpdir):
+    report = getReport(str(tmpdir) + '/')
+    report.models.inactivate(1)
+
+    assert report.getMetric(2).tolist() == [0, 4, 9]
+    assert report.getMetric(metric_name="RMSD").tolist() == [0.0, 0.7, 1.1]
+
+
+def test_report_with_only_its_header(tmpdir):
+    report = getReport(str(tmpdir) + '/', REPORT.split('\n')[0] + '\n')
+
+    assert report.models.number == 0
+    assert report.getMetric(pele_co.REPORT_TOTAL_ENERGY_COLUMN).tolist() == \
+        []
+
+
+def test_sidecar_keeps_full_precision(tmpdir):
+    path = str(tmpdir) + '/'
+    report = getReport(path)
+    output_path = path + "energies/"
+    os.makedirs(output_path)
+
+    # Models without energy are skipped by both the report and its sidecar
+    energies = [-10.123456789, None, -9.987654321, -11.5]
+    rmsds = [0.0123456, None, 0.4567891, 1.0]
+    write_energies_report(output_path, report, energies, rmsds)
+
+    sidecar_path = getEnergiesSidecarPath(output_path + "report_1.out")
+    values = np.load(sidecar_path)
+
+    assert sidecar_path == output_path + "report_1.npy"
+    assert values.tolist() == [[1, 0, 0, -10.123456789, 0.0123456],
+                               [1, 4, 2, -9.987654321, 0.4567891],
+                               [1, 9, 3, -11.5, 1.0]]
+
+    with open(output_path + "report_1.out", 'r') as report_file:
+        assert len(report_file.readlines()) == len(values) + 1
+
+
+def test_sidecar_without_rmsds(tmpdir):
+    path = str(tmpdir) + '/'
+    report = getReport(path)
+
+    write_energies_report(path + "energies_", report, [-1., -2., -3., -4.])
+    values = np.load(getEnergiesSidecarPath(path + "energies_report_1.out"))
+
+    assert values.shape == (4, 5)
+    assert values[:, 3].tolist() == [-1., -2., -3., -4.]
+    assert np.isnan(values[:, 4]).all()
+
+    # Empty reports still have the columns of their sidecar
+    write_energies_report(path + "empty_", report, [None, ] * 4)
+
+    assert np.load(getEnergiesSidecarPath(
+        path + "empty_report_1.out")).shape == (0, 5)
+
+
+def test_metrics_come_from_sidecar_when_available(tmpdir):
+    path = str(tmpdir) + '/'
+    report = getReport(path)
+    output_path = path + "energies/"
+    os.makedirs(output_path)
+
+    write_energies_report(output_path, report, [-10.123456789, ] * 4,
+                          [0., ] * 4)
+
+    steps, energies = getReportMetrics(output_path + "report_1.out")
+
+    assert list(steps) == [0, 3, 4, 9]
+    assert list(energies) == [-10.123456789, ] * 4
+
+    # Text reports, which are rounded, are parsed without their sidecar
+    os.remove(getEnergiesSidecarPath(output_path + "report_1.out"))
+
+    steps, energies = getReportMetrics(output_path + "report_1.out")
+
+    assert list(steps) == [0, 3, 4, 9]
+    assert list(energies) == [-10.12, ] * 4
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+
+
+# Python imports
+import os
+import json
+
+
+# FEP_PELE imports
+from FEP_PELE.FreeEnergy import Constants as co
+from FEP_PELE.FreeEnergy.Settings import Settings
+from FEP_PELE.FreeEnergy.ConvergenceMonitor import ConvergenceMonitor
+from FEP_PELE.FreeEnergy.CommandTypes.LambdasSampling import LambdasSampling
+
+from FEP_PELE.PELETools.PELERunner import getPELERunner
+
+from FEP_PELE.TemplateHandler import Lambda
+
+
+# Script information
+__author__ = "Marti Municoy"
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Marti Municoy"
+__email__ = "marti.municoy@bsc.es"
+
+
+# Constant definitions
+PDB_LINE = "HETATM{:5d} {:4s} LIG L   1    {:8.3f}{:8.3f}{:8.3f}  1.00  " + \
+    "0.00           C\n"
+REPORT_HEADER = "#Task    Step    numberOfAcceptedPeleSteps    " + \
+    "currentEnergy\n"
+SIMULATION_STEPS = 20000
+
+
+# Function definitions
+def writePDB(path):
+    with open(path, 'w') as pdb_file:
+        for index, coords in enumerate([(1.0, 2.0, 3.0), (2.4, 2.1, 3.2),
+                                        (3.1, 0.9, 2.7)]):
+            pdb_file.write(PDB_LINE.format(index + 1, " C{}".format(index),
+                                           *coords))
+        pdb_file.write("TER\n")
+
+
+def getSimulationControl(input_path="$INPUT_PDB_NAME$",
+                         report_path="$REPORT_PATH$",
+                         trajectory_path="$TRAJECTORY_PATH$", seed="$SEED$",
+                         steps="$TOTAL_PELE_STEPS$"):
+    return {
+        "Initialization": {"Complex": {"files": [{"path": input_path}]}},
+        "commands": [{
+            "commandType": "peleSimulation",
+            "RandomGenerator": {"seed": seed},
+            "PELE_Output": {
+                "reportPath": report_path,
+                "trajectoryPath": trajectory_path},
+            "PELE_Parameters": {"numberOfPeleSteps": steps}}]}
+
+
+def writeModel(trajectory_file, model_id):
+    trajectory_file.write("MODEL     {:4d}\n".format(model_id))
+    trajectory_file.write(PDB_LINE.format(1, " C0", 1.0, 2.0, 3.0))
+    trajectory_file.write("ENDMDL\n")
+
+
+def test_runner_is_stopped_by_monitor(tmpdir, fake_pele):
+    path = str(tmpdir) + '/'
+    writePDB(path + "complex.pdb")
+
+    with open(path + "pele.conf", 'w') as control_file:
+        json.dump(getSimulationControl(
+            path + "complex.pdb", path + co.SINGLE_REPORT_NAME,
+            path + co.SINGLE_TRAJECTORY_NAME, seed=1,
+            steps=SIMULATION_STEPS), control_file)
+
+    monitor = ConvergenceMonitor(path, uncertainty_target=10., interval=0.5)
+
+    result = getPELERunner(fake_pele).run(path + "pele.conf",
+                                          monitor=monitor)
+
+    assert result.stopped
+    assert monitor.uncertainty <= 10.
+    assert 0 < monitor.steps < SIMULATION_STEPS
+
+
+def test_monitor_requires_effective_samples(tmpdir):
+    path = str(tmpdir) + '/'
+
+    with open(path + "report_1.out", 'w') as report_file:
+        report_file.write(REPORT_HEADER)
+        for step, energy in enumerate((1.0, 1.1, 0.9, 1.0, 1.05, 0.95)):
+            report_file.write("1    {}    {}    {}\n".format(step, step,
+                                                             energy))
+
+    monitor = ConvergenceMonitor(path, uncertainty_target=10.)
+
+    assert monitor.min_effective_samples == co.DEF_MIN_EFFECTIVE_SAMPLES
+    assert not monitor.isConverged()
+    assert monitor.uncertainty <= 10.
+
+    monitor = ConvergenceMonitor(path, uncertainty_target=10.,
+                                 min_effective_samples=2)
+
+    assert monitor.isConverged()
+
+
+def test_sampling_records_its_steps(tmpdir, fake_pele):
+    general_path = str(tmpdir) + '/'
+    os.makedirs(general_path + "minimization/")
+    os.makedirs(general_path + "simulation/")
+    writePDB(general_path + "complex.pdb")
+    writePDB(general_path + "minimization/complex.pdb")
+
+    with open(general_path + "sim.conf", 'w') as control_file:
+        json.dump(getSimulationControl(), control_file)
+
+    settings = Settings()
+    for key, value in (("GeneralPath", general_path),
+                       ("SerialPelePath", fake_pele),
+                       ("MPIPelePath", fake_pele),
+                       ("InputPDB", general_path + "complex.pdb"),
+                       ("SimulationControlFile", general_path + "sim.conf"),
+                       ("MinimizationFolder", "minimization/"),
+                       ("SimulationFolder", "simulation/"),
+                       ("NumberOfProcessors", "1"),
+                       ("TotalPELESteps", str(SIMULATION_STEPS)),
+                       ("SamplingUncertaintyTarget", "10"),
+                       ("ConvergenceCheckInterval", "1"),
+                       ("MinEffectiveSamples", "10")):
+        settings.set(key, [value, ])
+
+    # Only the sampling is run, so the command is not fully initialized
+    sampling = LambdasSampling.__new__(LambdasSampling)
+    sampling._settings = settings
+    sampling._path = settings.simulation_path
+
+    sampling._simulate(Lambda.Lambda(0.5), 0)
+
+    path = settings.simulation_path + "0.5/"
+
+    with open(path + co.SAMPLED_STEPS_NAME, 'r') as steps_file:
+        sampled_steps = int(steps_file.read())
+
+    assert 0 < sampled_steps < SIMULATION_STEPS
+
+    for report_id in (1, 2):
+        with open(path + "report_{}.out".format(report_id), 'r') as report:
+            last_step = int(report.readlines()[-1].split()[1])
+
+        assert last_step <= sampled_steps
+
+
+def test_trim_sampling_output(tmpdir):
+    path = str(tmpdir) + '/'
+
+    # The first trajectory was stopped while writing its third model
+    with open(path + "report_1.out", 'w') as report_file:
+        report_file.write(REPORT_HEADER)
+        report_file.write("1    0    0    1.5000\n")
+        report_file.write("1    3    1    1.2000\n")
+        report_file.write("1    4    2    1.3000\n")
+        report_file.write("1    7    3    1.")
+
+    with open(path + "trajectory_1.pdb", 'w') as trajectory_file:
+        writeModel(trajectory_file, 1)
+        writeModel(trajectory_file, 2)
+        trajectory_file.write("MODEL        3\n")
+        trajectory_file.write(PDB_LINE.format(1, " C0", 1.0, 2.0, 3.0))
+
+    # The second one had not completed any model yet
+    with open(path + "report_2.out", 'w') as report_file:
+        report_file.write(REPORT_HEADER)
+        report_file.write("2    0    0    1.5000\n")
+
+    with open(path + "trajectory_2.pdb", 'w') as trajectory_file:
+        trajectory_file.write("MODEL        1\n")
+
+    sampling = LambdasSampling.__new__(LambdasSampling)
+
+    assert sampling._trimSamplingOutput(path) == 3
+
+    with open(path + "report_1.out", 'r') as report_file:
+        assert report_file.readlines()[1:] == ["1    0    0    1.5000\n",
+                                               "1    3    1    1.2000\n"]
+
+    with open(path + "trajectory_1.pdb", 'r') as trajectory_file:
+        lines = trajectory_file.readlines()
+
+    assert len([line for line in lines if line.startswith("ENDMDL")]) == 2
+    assert lines[-1] == "ENDMDL\n"
+
+    assert not os.path.exists(path + "report_2.out")
+    assert not os.path.exists(path + "trajectory_2.pdb")
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+
+# Python imports
+import glob
+
+import numpy as np
+
+
+# FEP_PELE imports
+from FEP_PELE.Utils.InOut import getEnergiesSidecarPath
+
+from conftest import runCommands
+from conftest import getReports
+from conftest import PROJECT_LAMBDAS
+
+
+# Script information
+__author__ = "Marti Municoy"
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Marti Municoy"
+__email__ = "marti.municoy@bsc.es"
+
+
+# Function definitions
+def runProject(fep_project, tmpdir, monkeypatch, name, reuse,
+               sampling_energies_from=None):
+    calls_path = str(tmpdir) + "/calls_{}.txt".format(name)
+    monkeypatch.setenv("FAKE_PELE_CALLS", calls_path)
+
+    settings = fep_project(
+        name=name, settings_lines=["ReuseSamplingEnergies {}".format(reuse),
+                                   "SinglePointBatchSize 1"])
+
+    if (sampling_energies_from is not None):
+        copySamplingEnergies(sampling_energies_from, settings)
+
+    runCommands(settings)
+
+    with open(calls_path, 'r') as calls_file:
+        calls = len(calls_file.readlines())
+
+    return settings, getReports(settings.calculation_path), calls
+
+
+def copySamplingEnergies(source_settings, settings):
+    # Samplings get the energies that single points give to their models
+    for lambda_value in PROJECT_LAMBDAS:
+        folder = str(float(lambda_value)) + '/'
+
+        for report_path in glob.glob(settings.simulation_path + folder +
+                                     "report_*.out"):
+            report_name = report_path.split('/')[-1]
+            energies = np.load(getEnergiesSidecarPath(
+                source_settings.calculation_path + folder + report_name))[:, 3]
+
+            with open(report_path, 'r') as report_file:
+                lines = report_file.readlines()
+
+            with open(report_path, 'w') as report_file:
+                report_file.write(lines[0])
+                for line, energy in zip(lines[1:], energies):
+                    fields = line.split()
+                    fields[3] = repr(float(energy))
+                    report_file.write("    ".join(fields) + '\n')
+
+
+def test_reused_sampling_energies(fep_project, tmpdir, monkeypatch):
+    settings, reports, calls = runProject(fep_project, tmpdir, monkeypatch,
+                                          "single_points", False)
+
+    # Samplings that reproduce single points skip the original energies
+    _, reused_reports, reused_calls = runProject(
+        fep_project, tmpdir, monkeypatch, "reused", True, settings)
+
+    assert len(reports) > 0
+    assert reused_reports == reports
+    assert reused_calls < calls
+
+    # Samplings that do not reproduce them are recalculated, and the
+    # single points of the check come from the energy cache
+    _, checked_reports, checked_calls = runProject(
+        fep_project, tmpdir, monkeypatch, "checked", True)
+
+    assert checked_reports == reports
+    assert checked_calls == calls
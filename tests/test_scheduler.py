@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+
+# Python imports
+import asyncio
+import threading
+
+import pytest
+
+
+# FEP_PELE imports
+from FEP_PELE.FreeEnergy import Constants as co
+from FEP_PELE.FreeEnergy.Scheduler import Task
+from FEP_PELE.FreeEnergy.Scheduler import Scheduler
+from FEP_PELE.FreeEnergy.Scheduler import runInExecutor
+from FEP_PELE.FreeEnergy.Scheduler import getWorkerId
+
+from conftest import runCommands
+from conftest import getReports
+
+
+# Script information
+__author__ = "Marti Municoy"
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Marti Municoy"
+__email__ = "marti.municoy@bsc.es"
+
+
+# Constant definitions
+ENGINES = [co.EXECUTION_ENGINES_DICT["PROCESSES"],
+           co.EXECUTION_ENGINES_DICT["ASYNCIO"]]
+
+
+# Function definitions
+def add(*values):
+    return sum(values)
+
+
+async def asyncAdd(*values):
+    await asyncio.sleep(0)
+    return sum(values)
+
+
+def getThread():
+    return threading.get_ident(), getWorkerId()
+
+
+async def offload():
+    return threading.get_ident(), getWorkerId(), \
+        await runInExecutor(getThread)
+
+
+def fail():
+    raise ValueError("broken task")
+
+
+def test_tasks_do_not_share_dependencies():
+    first = Task(add, (1, ))
+    second = Task(add, (first, ))
+    third = Task(add, (2, ))
+
+    assert first.dependencies == []
+    assert second.dependencies == [first, ]
+    assert third.dependencies == []
+    assert first.dependents == [second, ]
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_results_flow_through_dependencies(engine):
+    scheduler = Scheduler(2, engine=engine)
+    order = []
+
+    first = scheduler.addTask(add, (1, 2))
+    second = scheduler.addTask(asyncAdd, (first, 3))
+    third = scheduler.addTask(add, (first, second))
+    last = scheduler.addTask(order.append, (third, ),
+                             dependencies=[second, ], local=True)
+
+    scheduler.run()
+
+    assert first.result == 3
+    assert second.result == 6
+    assert third.result == 9
+    assert last.done
+    assert order == [9, ]
+    assert scheduler.tasks == []
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_failed_tasks_abort(engine):
+    scheduler = Scheduler(2, engine=engine)
+    scheduler.addTask(fail)
+
+    with pytest.raises(SystemExit):
+        scheduler.run()
+
+
+def test_coroutines_offload_blocking_work():
+    engine = co.EXECUTION_ENGINES_DICT["ASYNCIO"]
+    scheduler = Scheduler(2, engine=engine)
+    task = scheduler.addTask(offload)
+
+    scheduler.run()
+
+    loop_thread, worker_id, (thread, executor_worker_id) = task.result
+
+    assert thread != loop_thread
+    assert executor_worker_id == worker_id
+
+    # Without an event loop engine the work is done in place
+    loop_thread, worker_id, (thread, executor_worker_id) = \
+        asyncio.run(offload())
+
+    assert thread == loop_thread
+
+
+def test_engines_write_equal_reports(fep_project):
+    reports = []
+
+    for engine in ENGINES:
+        settings = fep_project(
+            name=engine, settings_lines=["ExecutionEngine " + engine, ])
+        assert settings.execution_engine == engine
+
+        runCommands(settings)
+
+        reports.append(getReports(settings.calculation_path))
+
+    assert len(reports[0]) > 0
+    assert reports[0] == reports[1]
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+
+# Python imports
+import pytest
+
+
+# FEP_PELE imports
+from FEP_PELE.FreeEnergy.CommandTypes.SolvationFreeEnergyCalculation import \
+    SolvationFreeEnergyCalculation
+
+from FEP_PELE.PELETools import PELEConstants as pele_co
+from FEP_PELE.PELETools.PELEResult import PELEResult
+
+
+# Script information
+__author__ = "Marti Municoy"
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Marti Municoy"
+__email__ = "marti.municoy@bsc.es"
+
+
+# Class definitions
+class OutputRunner(object):
+    # Each run prints the next of the given outputs
+    def __init__(self, outputs):
+        self.outputs = list(outputs)
+
+    def run(self, control_file_path, cwd=None, monitor=None):
+        result = PELEResult([control_file_path, ])
+        for line in self.outputs.pop(0):
+            result.parseLine(line)
+        result.finish(0, 0.)
+        return result
+
+
+# Function definitions
+def getCommand(settings, monkeypatch):
+    command = SolvationFreeEnergyCalculation(settings)
+
+    # The control file of the test project is meant for dE calculations
+    monkeypatch.setattr(command, "_writeControlFile",
+                        lambda pdb_path, solvent_type: None)
+
+    return command
+
+
+def test_solvation_free_energy(fep_project, monkeypatch):
+    command = getCommand(fep_project(), monkeypatch)
+    runner = OutputRunner(
+        [[pele_co.ENERGY_RESULT_LINE_IN_VACUUM + " -5.5", ],
+         [pele_co.ENERGY_RESULT_LINE + " -8.0", ]])
+
+    energy = command._calculateSolvationFreeEnergy(
+        runner, command.settings.initial_ligand_pdb)
+
+    assert energy == -2.5
+
+
+def test_missing_energy_exits(fep_project, monkeypatch):
+    command = getCommand(fep_project(), monkeypatch)
+    runner = OutputRunner(
+        [[pele_co.ENERGY_RESULT_LINE_IN_VACUUM + " -5.5", ],
+         ["PELE finished without energies", ]])
+
+    with pytest.raises(SystemExit):
+        command._calculateSolvationFreeEnergy(
+            runner, command.settings.initial_ligand_pdb)
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+
+# Python imports
+import os
+import glob
+import json
+
+
+# FEP_PELE imports
+from FEP_PELE.TemplateHandler.TemplateBank import TemplateBank
+from FEP_PELE.TemplateHandler.TemplateBank import INDEX_NAME
+from FEP_PELE.TemplateHandler.Lambda import Lambda
+from FEP_PELE.TemplateHandler.Lambda import STERIC_LAMBDA, COULOMBIC_LAMBDA
+
+from conftest import getAlchemicalTemplateCreator
+
+
+# Script information
+__author__ = "Marti Municoy"
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Marti Municoy"
+__email__ = "marti.municoy@bsc.es"
+
+
+# Function definitions
+def getBank(path):
+    creator = getAlchemicalTemplateCreator(path)
+
+    return creator, TemplateBank(creator, path + "bank_")
+
+
+def readFile(path):
+    with open(path, 'rb') as read_file:
+        return read_file.read()
+
+
+def test_equal_templates_share_their_file(tmpdir):
+    path = str(tmpdir) + '/'
+    creator, bank = getBank(path)
+
+    dual = Lambda(0.0)
+    steric = Lambda(0.0, lambda_type=STERIC_LAMBDA)
+    coulombic = Lambda(0.0, lambda_type=COULOMBIC_LAMBDA)
+    other = Lambda(0.5)
+
+    bank.generate([(dual, None), (steric, coulombic), (other, None)])
+
+    assert len(bank.index) == 3
+    assert bank.getTemplatePath(dual) == \
+        bank.getTemplatePath(steric, coulombic)
+    assert bank.getTemplatePath(dual) != bank.getTemplatePath(other)
+    assert len(glob.glob(bank.path + "*")) == 3
+
+    creator.applyLambda(other)
+    assert readFile(bank.getTemplatePath(other)) == \
+        creator.renderAlchemicalTemplate().encode()
+
+
+def test_index_is_reused_by_a_new_bank(tmpdir):
+    path = str(tmpdir) + '/'
+    _, bank = getBank(path)
+    bank.generate([(Lambda(0.5), None), ])
+
+    with open(bank.path + INDEX_NAME) as index_file:
+        assert json.load(index_file) == bank.index
+
+    _, new_bank = getBank(path)
+
+    assert new_bank.path == bank.path
+    assert new_bank.index == bank.index
+
+    # A banked template that went missing is rendered again
+    os.remove(bank.getTemplatePath(Lambda(0.5)))
+    template_path = new_bank.getTemplatePath(Lambda(0.5))
+
+    assert os.path.isfile(template_path)
+
+
+def test_source_changes_create_a_new_bank(tmpdir):
+    path = str(tmpdir) + '/'
+    creator, bank = getBank(path)
+
+    with open(path + "initial", 'a') as template_file:
+        template_file.write("\n")
+
+    new_bank = TemplateBank(creator, path + "bank_")
+
+    assert new_bank.path != bank.path
+    assert new_bank.index == {}
+
+
+def test_activate_replaces_the_template(tmpdir):
+    path = str(tmpdir) + '/'
+    _, bank = getBank(path)
+    output_path = path + "LIG"
+
+    with open(output_path, 'w') as output_file:
+        output_file.write("previous template")
+
+    for value in (0.25, 0.75):
+        bank.activate(Lambda(value), None, output_path)
+
+        assert readFile(output_path) == \
+            readFile(bank.getTemplatePath(Lambda(value)))
+
+    assert glob.glob(path + "*.tmp") == []
+    assert glob.glob(bank.path + "*.tmp") == []
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+
+# Python imports
+import random
+
+
+# FEP_PELE imports
+from FEP_PELE.PELETools.SimulationParser import Simulation
+
+from conftest import writeSampling
+
+
+# Script information
+__author__ = "Marti Municoy"
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Marti Municoy"
+__email__ = "marti.municoy@bsc.es"
+
+
+# Function definitions
+def getReport(path, trajectory_id=1):
+    simulation = Simulation(path, sim_type="PELE", report_name="report_",
+                            trajectory_name="trajectory_",
+                            logfile_name="logFile_")
+    simulation.getOutputFiles()
+
+    for report in simulation.iterateOverReports:
+        if (report.trajectory_id == trajectory_id):
+            return report
+
+
+def getModelBlocks(trajectory_path):
+    # Models as the bytes from their MODEL line to the next one
+    with open(trajectory_path, 'rb') as trajectory_file:
+        data = trajectory_file.read()
+
+    blocks = data.split(b"MODEL")[1:]
+
+    return [b"MODEL" + block for block in blocks]
+
+
+def readFile(path):
+    with open(path, 'rb') as read_file:
+        return read_file.read()
+
+
+def test_split_models_writes_every_model(tmpdir):
+    path = str(tmpdir) + '/'
+    writeSampling(path, random.Random(1))
+
+    trajectory = getReport(path).trajectory
+    blocks = getModelBlocks(path + trajectory.name)
+    output_paths = [path + "{}.pdb".format(i) for i in range(len(blocks))]
+
+    trajectory.splitModels(output_paths)
+
+    assert len(blocks) == trajectory.models.number == 4
+    assert [readFile(output_path) for output_path in output_paths] == blocks
+    assert len(trajectory.model_offsets) == len(blocks)
+
+
+def test_split_models_only_writes_requested_models(tmpdir):
+    path = str(tmpdir) + '/'
+    writeSampling(path, random.Random(1))
+
+    trajectory = getReport(path, trajectory_id=2).trajectory
+    blocks = getModelBlocks(path + trajectory.name)
+
+    trajectory.splitModels([path + "0.pdb", path + "1.pdb"])
+
+    assert readFile(path + "0.pdb") == blocks[0]
+    assert readFile(path + "1.pdb") == blocks[1]
+
+    # The whole trajectory is still indexed
+    trajectory.writeModel(len(blocks) - 1, path + "last.pdb")
+
+    assert readFile(path + "last.pdb") == blocks[-1]
+
+
+def test_write_model_seeks_any_model(tmpdir):
+    path = str(tmpdir) + '/'
+    writeSampling(path, random.Random(1))
+
+    trajectory = getReport(path).trajectory
+    blocks = getModelBlocks(path + trajectory.name)
+
+    for model_id in reversed(range(0, len(blocks))):
+        trajectory.writeModel(model_id, path + "model.pdb")
+
+        assert readFile(path + "model.pdb") == blocks[model_id]
+
+
+def test_split_trajectory_without_model_lines(tmpdir):
+    path = str(tmpdir) + '/'
+    structure = b"HETATM    1  C1  LIG L   1       0.000   0.000   0.000\n" + \
+        b"TER\n"
+
+    with open(path + "report_1.out", 'w') as report_file:
+        report_file.write("#Task    Step    numberOfAcceptedPeleSteps    " +
+                          "currentEnergy\n")
+        report_file.write("1    0    0    -1.0\n")
+
+    with open(path + "trajectory_1.pdb", 'wb') as trajectory_file:
+        trajectory_file.write(structure)
+
+    trajectory = getReport(path).trajectory
+    trajectory.splitModels([path + "0.pdb", ])
+
+    assert readFile(path + "0.pdb") == structure
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+
+# Python imports
+import os
+
+
+# FEP_PELE imports
+from FEP_PELE.PELETools import PELEConstants as pele_co
+from FEP_PELE.PELETools.Workspace import PELEWorkspace
+
+
+# Script information
+__author__ = "Marti Municoy"
+__license__ = "GPL"
+__version__ = "1.0.1"
+__maintainer__ = "Marti Municoy"
+__email__ = "marti.municoy@bsc.es"
+
+
+# Function definitions
+def writeFile(path, content):
+    with open(path, 'w') as output_file:
+        output_file.write(content)
+
+
+def buildSource(path):
+    for folder in pele_co.SHARED_DATA_FOLDERS:
+        os.makedirs(path + folder)
+        writeFile(path + folder + "/file.txt", folder)
+
+    os.makedirs(path + pele_co.HETEROATOMS_TEMPLATE_PATH)
+    os.makedirs(path + "DataLocal/Conformations")
+    writeFile(path + "DataLocal/Conformations/lig.conformation", "conf")
+
+    for template_name in ("hoh", "lig", "ligz"):
+        writeFile(path + pele_co.HETEROATOMS_TEMPLATE_PATH + template_name,
+                  template_name)
+
+
+def test_workspace_links_shared_data(tmp_path):
+    source_path = str(tmp_path) + "/source/"
+    buildSource(source_path)
+
+    workspace = PELEWorkspace(source_path, str(tmp_path) + "/workspace")
+    workspace.build()
+
+    for folder in pele_co.SHARED_DATA_FOLDERS:
+        assert os.path.islink(workspace.path + folder)
+        assert os.path.realpath(workspace.path + folder) == \
+            os.path.realpath(source_path + folder)
+
+    # Folders leading to the templates are real, their siblings are links
+    assert not os.path.islink(workspace.path + "DataLocal")
+    assert not os.path.islink(workspace.templates_path)
+    assert os.path.islink(workspace.path + "DataLocal/Conformations")
+
+    for template_name in ("hoh", "lig", "ligz"):
+        assert os.path.islink(workspace.templates_path + template_name)
+
+
+def test_private_template_is_isolated(tmp_path):
+    source_path = str(tmp_path) + "/source/"
+    buildSource(source_path)
+
+    workspaces = [PELEWorkspace(source_path,
+                                str(tmp_path) + "/workspace_{}".format(i))
+                  for i in range(2)]
+
+    for i, workspace in enumerate(workspaces):
+        workspace.build(private_templates=["ligz", ])
+
+        assert not os.path.lexists(workspace.templates_path + "ligz")
+        assert os.path.islink(workspace.templates_path + "lig")
+
+        writeFile(workspace.templates_path + "ligz", str(i))
+
+    # Building again keeps the private template in place
+    workspaces[0].build(private_templates=["ligz", ])
+
+    for i, workspace in enumerate(workspaces):
+        with open(workspace.templates_path + "ligz") as template_file:
+            assert template_file.read() == str(i)
+
+    with open(source_path + pele_co.HETEROATOMS_TEMPLATE_PATH +
+              "ligz") as template_file:
+        assert template_file.read() == "ligz"